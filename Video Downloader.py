@@ -1,34 +1,432 @@
 import os
-import tkinter as tk
-from tkinter import messagebox, filedialog
-from tkinter import ttk
 import threading
-import yt_dlp
+import queue
+import random
 import subprocess
 import sys
-from pprint import pprint
+import argparse
+import contextlib
+import heapq
+import importlib
+import itertools
+import collections
+import concurrent.futures
+import html
+import io
+import re
+import shutil
+import functools
+import hashlib
+import json
+import logging
+import sqlite3
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import uuid
+import weakref
+
+# yt-dlp, Tk and Pillow are imported when first needed, see load_yt_dlp and load_tkinter
+yt_dlp = None
+tk = messagebox = filedialog = ttk = None
+
+
+log = logging.getLogger('horizon')
+
+_yt_dlp_lock = threading.Lock()
+
+
+def load_yt_dlp():
+    # Importing yt-dlp and its extractors takes longer than starting everything else, so the first
+    # job pays for it instead of the window. The classes built on yt-dlp's are created here as well.
+    global yt_dlp, HorizonYoutubeDL, SegmentedHttpDownloader, PooledExtractAudioPP
+    with _yt_dlp_lock:
+        if yt_dlp is not None:
+            return yt_dlp
+        module = importlib.import_module('yt_dlp')
+        for name in ('yt_dlp.downloader.http', 'yt_dlp.networking', 'yt_dlp.networking.exceptions',
+                     'yt_dlp.postprocessor', 'yt_dlp.utils'):
+            importlib.import_module(name)
+
+        class SegmentedHttpDownloader(SegmentedHttpDownloaderMixin, module.downloader.http.HttpFD):
+            pass
+
+        class HorizonYoutubeDL(HorizonYoutubeDLMixin, module.YoutubeDL):
+            pass
+
+        class PooledExtractAudioPP(PooledExtractAudioMixin, module.postprocessor.FFmpegExtractAudioPP):
+            pass
+
+        yt_dlp = module
+        return yt_dlp
+
+
+def load_tkinter():
+    # Only the GUI needs Tk, the batch mode runs on headless boxes without it
+    global tk, messagebox, filedialog, ttk
+    import tkinter as tk
+    from tkinter import messagebox, filedialog, ttk
+
+
+def load_pillow():
+    # Pillow is optional, thumbnails are converted with ffmpeg when it is missing
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+class MessageBoxReporter:
+    def error(self, message):
+        messagebox.showerror("Error", message)
+
+    def info(self, message):
+        messagebox.showinfo("Success", message)
+
+
+class YtdlpLogger:
+    # Routes yt-dlp output into our logger and counts its retries for the job metrics
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+
+    def debug(self, message):
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("yt-dlp: %s", message)
+
+    def info(self, message):
+        log.info("yt-dlp: %s", message)
+
+    def warning(self, message):
+        if self.metrics and 'Retrying' in message:
+            self.metrics.count_retry()
+        log.warning("yt-dlp: %s", message)
+
+    def error(self, message):
+        log.error("yt-dlp: %s", message)
+
+
+class JobMetrics:
+    # Timing spans of one job. Transfers and yt-dlp's own postprocessors are measured through
+    # its hooks, every other stage through span(). With aggregate_spans the job keeps one running
+    # total per stage instead of a span per event, so a playlist's record doesn't grow with its size.
+    def __init__(self, recorder, kind, url, aggregate_spans=False):
+        self.recorder = recorder
+        self.kind = kind
+        self.url = url
+        self.aggregate_spans = aggregate_spans
+        self.started_at = time.time()
+        self.first_download_at = None
+        self.spans = []
+        self.stage_totals = {}
+        self.entries = None
+        self.retries = 0
+        self.transfers = {}
+        self.postprocessors = {}
+        self.audio_copies = 0
+        self.audio_encodes = 0
+        self.cpu_seconds_saved = 0.0
+        self.plan = None
+        self.entry_retries = collections.Counter()
+        self.requeued = 0
+        self.recovered = 0
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(stage, time.perf_counter() - start)
+
+    def add_span(self, stage, duration, size=0, peak_speed=None, cpu_seconds=None):
+        span = {'stage': stage, 'duration': round(duration, 4)}
+        if cpu_seconds is not None:
+            span['cpu_seconds'] = round(cpu_seconds, 4)
+        if size:
+            span.update({
+                'bytes': size,
+                'avg_speed': round(size / duration) if duration > 0 else None,
+                'peak_speed': round(peak_speed) if peak_speed else None,
+            })
+        with self.lock:
+            if self.aggregate_spans:
+                self._add_to_stage_total(span)
+            else:
+                self.spans.append(span)
+
+    def _add_to_stage_total(self, span):
+        total = self.stage_totals.setdefault(span['stage'], {'stage': span['stage'], 'count': 0, 'duration': 0.0})
+        total['count'] += 1
+        total['duration'] = round(total['duration'] + span['duration'], 4)
+        for field in ('bytes', 'cpu_seconds'):
+            if field in span:
+                total[field] = round(total.get(field, 0) + span[field], 4)
+        if span.get('peak_speed'):
+            total['peak_speed'] = max(total.get('peak_speed') or 0, span['peak_speed'])
+
+    def _stage_total_spans(self):
+        spans = []
+        for total in self.stage_totals.values():
+            if total.get('bytes'):
+                total = dict(total, avg_speed=round(total['bytes'] / total['duration']) if total['duration'] > 0 else None)
+            spans.append(total)
+        return spans
+
+    def count_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def count_entry_retry(self, kind):
+        with self.lock:
+            self.entry_retries[kind] += 1
+
+    def count_requeue(self, requeued, recovered):
+        with self.lock:
+            self.requeued += requeued
+            self.recovered += recovered
+
+    def count_audio_conversion(self, copied, cpu_seconds_saved=0.0):
+        with self.lock:
+            if copied:
+                self.audio_copies += 1
+                self.cpu_seconds_saved += cpu_seconds_saved
+            else:
+                self.audio_encodes += 1
+
+    def instrument(self, ydl_opts):
+        ydl_opts['progress_hooks'] = list(ydl_opts.get('progress_hooks') or []) + [self.progress_hook]
+        ydl_opts['postprocessor_hooks'] = list(ydl_opts.get('postprocessor_hooks') or []) + [self.postprocessor_hook]
+        ydl_opts['logger'] = YtdlpLogger(self)
+        return ydl_opts
+
+    def progress_hook(self, d):
+        # Called for every chunk, so it only keeps a few numbers per file
+        key = d.get('filename')
+        with self.lock:
+            if d['status'] == 'finished' and key not in self.transfers:
+                return  # Already on disk, nothing was transferred
+            if self.first_download_at is None:
+                self.first_download_at = time.time()
+            state = self.transfers.setdefault(key, [time.perf_counter(), 0, 0])
+            state[1] = d.get('downloaded_bytes') or state[1]
+            state[2] = max(state[2], d.get('speed') or 0)
+            if d['status'] != 'finished':
+                return
+            del self.transfers[key]
+        self.add_span('transfer', time.perf_counter() - state[0], d.get('total_bytes') or state[1], state[2])
+
+    def postprocessor_hook(self, d):
+        key = (d.get('postprocessor'), (d.get('info_dict') or {}).get('id'))
+        if d['status'] == 'started':
+            with self.lock:
+                self.postprocessors[key] = time.perf_counter()
+        elif d['status'] == 'finished':
+            with self.lock:
+                start = self.postprocessors.pop(key, None)
+            if start is not None:
+                stage = 'merge' if d.get('postprocessor') == 'Merger' else f"ytdlp_{str(d.get('postprocessor')).lower()}"
+                self.add_span(stage, time.perf_counter() - start)
+
+    def finish(self, status):
+        record = {
+            'kind': self.kind,
+            'url': self.url,
+            'status': status,
+            'started_at': round(self.started_at, 3),
+            'duration': round(time.time() - self.started_at, 4),
+            'retries': self.retries,
+            'time_to_first_download': round(self.first_download_at - self.started_at, 4) if self.first_download_at else None,
+            'spans': self._stage_total_spans() if self.aggregate_spans else self.spans,
+        }
+        if self.plan:
+            record['plan'] = self.plan
+        if self.entries:
+            record['entries'] = self.entries
+        if self.entry_retries or self.requeued:
+            record['entry_retries'] = {'retries': dict(self.entry_retries), 'requeued': self.requeued,
+                                       'recovered': self.recovered}
+        if self.audio_copies or self.audio_encodes:
+            record['stream_copy'] = {
+                'copied': self.audio_copies,
+                'encoded': self.audio_encodes,
+                'cpu_seconds_saved': round(self.cpu_seconds_saved, 3),
+            }
+        self.recorder.record(record)
+        return record
+
+
+class MetricsRecorder:
+    # Writes one JSON line per finished job and, when asked, keeps a Prometheus textfile with the
+    # totals per stage up to date for the node exporter textfile collector.
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.stage_totals = {}
+        self.job_totals = {}
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def start_job(self, kind, url, aggregate_spans=False):
+        return JobMetrics(self, kind, url, aggregate_spans)
+
+    def record(self, record):
+        with self.lock:
+            self.job_totals[record['status']] = self.job_totals.get(record['status'], 0) + 1
+            self.retries += record['retries']
+            for span in record['spans']:
+                totals = self.stage_totals.setdefault(span['stage'], {'count': 0, 'seconds': 0.0, 'bytes': 0, 'cpu_seconds': 0.0})
+                totals['count'] += span.get('count', 1)  # Aggregated spans stand for several runs
+                totals['seconds'] += span['duration']
+                totals['bytes'] += span.get('bytes', 0)
+                totals['cpu_seconds'] += span.get('cpu_seconds', 0.0)
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+            if self.prometheus_path:
+                self._write_prometheus()
+
+    def _write_prometheus(self):
+        lines = [
+            '# HELP horizon_jobs_total Finished download jobs by status.',
+            '# TYPE horizon_jobs_total counter',
+        ]
+        lines += [f'horizon_jobs_total{{status="{status}"}} {count}' for status, count in sorted(self.job_totals.items())]
+        lines += [
+            '# HELP horizon_retries_total Retries reported by yt-dlp.',
+            '# TYPE horizon_retries_total counter',
+            f'horizon_retries_total {self.retries}',
+        ]
+        for name, field, help_text in (
+            ('horizon_stage_runs_total', 'count', 'Completed spans per stage.'),
+            ('horizon_stage_seconds_total', 'seconds', 'Time spent per stage.'),
+            ('horizon_stage_bytes_total', 'bytes', 'Bytes moved per stage.'),
+            ('horizon_stage_cpu_seconds_total', 'cpu_seconds', 'CPU time of the ffmpeg processes per stage.'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [f'{name}{{stage="{stage}"}} {totals[field]}' for stage, totals in sorted(self.stage_totals.items())]
+
+        # Written next to the target and renamed so the collector never reads half a file
+        temporary_path = self.prometheus_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temporary_path, self.prometheus_path)
+
+
+_metrics_recorder = None
+_metrics_recorder_lock = threading.Lock()
+
+
+def get_metrics_recorder(**kwargs):
+    global _metrics_recorder
+    with _metrics_recorder_lock:
+        if _metrics_recorder is None:
+            _metrics_recorder = MetricsRecorder(**kwargs)
+        return _metrics_recorder
+
+
+class QueuedReporter:
+    # Used by the GUI: message boxes may only be opened from the Tk main loop, which drains the bus
+    def __init__(self, progress_bus):
+        self.progress_bus = progress_bus
+
+    def error(self, message):
+        self.progress_bus.post_message(messagebox.showerror, "Error", message)
+
+    def info(self, message):
+        self.progress_bus.post_message(messagebox.showinfo, "Success", message)
+
+
+class ProgressBus:
+    # Download threads must not touch Tk widgets. They post here instead and the main loop applies
+    # the updates with after() at a fixed frame rate. Only the latest update of each job is kept,
+    # so a burst of yt-dlp chunk callbacks costs one widget update per frame.
+    def __init__(self, root, apply_progress, fps=15):
+        self.root = root
+        self.apply_progress = apply_progress
+        self.interval = max(1, int(1000 / fps))
+        self.latest = {}
+        self.messages = queue.Queue()
+        self.showing_message = False
+        self.lock = threading.Lock()
+
+    def post_progress(self, key, label, progress_bar, text, value):
+        with self.lock:
+            self.latest[key] = (label, progress_bar, text, value)
+
+    def post_message(self, show, title, message):
+        self.messages.put((show, title, message))
+
+    def start(self):
+        self.root.after(self.interval, self.drain)
+
+    def drain(self):
+        # Rescheduled first so progress keeps flowing while a message box runs its own event loop
+        self.root.after(self.interval, self.drain)
+        with self.lock:
+            latest, self.latest = self.latest, {}
+        for label, progress_bar, text, value in latest.values():
+            self.apply_progress(label, progress_bar, text, value)
+
+        if self.showing_message:
+            return
+        try:
+            show, title, message = self.messages.get_nowait()
+        except queue.Empty:
+            return
+        self.showing_message = True
+        try:
+            show(title, message)
+        finally:
+            self.showing_message = False
+
+
+class ConsoleReporter:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.errors = []
+        self.messages = []
+
+    def error(self, message):
+        self.errors.append(message)
+        print(f"Error: {message}", file=self.stream)
+
+    def info(self, message):
+        self.messages.append(message)
+        print(message, file=self.stream)
 
 class VideoDownloader:
-    def __init__(self, url, format, save_location, include_subtitles, progress_callback):
+    def __init__(self, url, format, save_location, include_subtitles, progress_callback, connections=1, reporter=None,
+                 checkpoint=None, subtitle_languages=None):
         self.url = url
         self.format = format
         self.save_location = save_location
         self.include_subtitles = include_subtitles
         self.progress_callback = progress_callback
+        self.connections = connections
+        self.reporter = reporter or MessageBoxReporter()
+        self.checkpoint = checkpoint
+        self.subtitle_languages = list(subtitle_languages or SUBTITLE_LANGUAGES)
+
+    def checkpoint_params(self):
+        return {'url': self.url, 'format': self.format, 'save_location': self.save_location,
+                'include_subtitles': self.include_subtitles, 'connections': self.connections,
+                'subtitle_languages': self.subtitle_languages}
 
     def download_video(self):
-        # Debug prints
-        print(f"Debug - URL: {self.url}")
-        print(f"Debug - Save location: {self.save_location}")
+        log.debug("URL: %s", self.url)
+        log.debug("Save location: %s", self.save_location)
 
         # Input validation
         if not self.url:
-            messagebox.showerror("Error", "Please enter a valid YouTube URL.")
-            return
+            self.reporter.error("Please enter a valid YouTube URL.")
+            return False
 
         if not self.save_location:
-            messagebox.showerror("Error", "Please choose a save location.")
-            return
+            self.reporter.error("Please choose a save location.")
+            return False
 
         # Progress hook function
         def progress_hook(d):
@@ -60,93 +458,118 @@ class VideoDownloader:
             'format': video_format,
             'outtmpl': os.path.join(self.save_location, '%(title)s.%(ext)s'),
             'progress_hooks': [progress_hook],
-            'merge_output_format': 'mp4',
+            'merge_output_format': MERGE_OUTPUT_FORMATS,
+            # More than one connection per stream: parallel fragments for DASH/HLS, parallel byte ranges otherwise
+            'concurrent_fragment_downloads': self.connections,
+            'segmented_connections': self.connections,
         }
 
         # Add subtitle options if requested
         if self.include_subtitles:
-            ydl_opts.update({
-                'writesubtitles': True,
-                'subtitleslangs': ['en'],
-                'subtitlesformat': 'vtt',
-                'writeautomaticsub': True,
-            })
+            ydl_opts.update(subtitle_options(self.subtitle_languages))
 
-        try:
-            print("Video download options:", ydl_opts)  # Debug print
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(self.url, download=True)
-                video_file = ydl.prepare_filename(info_dict)
-                video_file = os.path.splitext(video_file)[0] + '.mp4'
+        checkpoint = self.checkpoint or get_checkpoint_store().create('video', self.checkpoint_params())
+        metrics = get_metrics_recorder().start_job('video', self.url)
+        metrics.instrument(ydl_opts)
+        checkpoint.instrument(ydl_opts)
+        get_bandwidth_governor().share().instrument(ydl_opts)
 
-                # Check if subtitles are available
-                if self.include_subtitles and 'requested_subtitles' in info_dict:
-                    vtt_subtitles_file = os.path.join(self.save_location, f"{os.path.splitext(video_file)[0]}.en.vtt")
-                    srt_subtitles_file = os.path.join(self.save_location, f"{os.path.splitext(video_file)[0]}.en.srt")
-                    if os.path.exists(vtt_subtitles_file):
-                        self.convert_vtt_to_srt(vtt_subtitles_file, srt_subtitles_file)
-                        self.merge_subtitles_with_video(video_file, srt_subtitles_file)
-
-            messagebox.showinfo("Success", "Video downloaded successfully!")
+        try:
+            log.debug("Video download options: %s", ydl_opts)
+            with checkout_youtube_dl(ydl_opts) as ydl:
+                with get_job_manager().network_lane:
+                    checkpoint.set_stage('extract')
+                    with metrics.span('extract'):
+                        info_dict = extract_info_cached(ydl, self.url)
+                reservation = reserve_disk_space(ydl, info_dict, self.save_location, self.include_subtitles,
+                                                 self.progress_callback)
+                try:
+                    with get_job_manager().network_lane:
+                        checkpoint.set_stage('download')
+                        info_dict = ydl.process_ie_result(info_dict, download=True)
+                    video_file = downloaded_filepath(ydl, info_dict, info_dict.get('ext', 'mp4'))
+
+                    # Check if subtitles are available
+                    plan = PostprocessPlan(video_file)
+                    if self.include_subtitles:
+                        for language, vtt_subtitles_file in downloaded_subtitles(info_dict):
+                            srt_subtitles_file = os.path.splitext(vtt_subtitles_file)[0] + '.srt'
+                            with metrics.span('subtitles'):
+                                converted = self.convert_vtt_to_srt(vtt_subtitles_file, srt_subtitles_file)
+                            if converted:
+                                plan.add_subtitles(srt_subtitles_file, subtitle_language_code(language))
+                    checkpoint.set_stage('postprocess')
+                    with metrics.span('postprocess'):
+                        self.run_postprocess_plan(plan, info_dict, checkpoint)
+                finally:
+                    reservation.release()
+
+            metrics.finish('ok')
+            checkpoint.finish()
+            self.reporter.info("Video downloaded successfully!")
+            return True
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            metrics.finish('failed')
+            checkpoint.finish()
+            self.reporter.error(f"An error occurred: {str(e)}")
+            return False
 
     def convert_vtt_to_srt(self, vtt_file, srt_file):
-        command = ['ffmpeg', '-i', vtt_file, srt_file]
         try:
             self.progress_callback("Converting subtitles...", 0)
-            print(f"Running command: {' '.join(command)}")  # Debug print
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            print(f"Command output: {result.stdout}")  # Debug print
-            print(f"Command error: {result.stderr}")  # Debug print
+            cues = convert_vtt_file_to_srt(vtt_file, srt_file)
+            log.debug("Converted %d subtitle cues to %s", cues, srt_file)
             os.remove(vtt_file)  # Remove the original VTT file
             self.progress_callback("Subtitles converted successfully!", 100)
-        except subprocess.CalledProcessError as e:
-            print(f"Command failed with error: {e.stderr}")  # Debug print
-            messagebox.showerror("Error", f"An error occurred while converting subtitles: {str(e)}")
+            return True
+        except (OSError, ValueError) as e:
+            log.warning("Subtitle conversion failed with error: %s", e)
+            self.reporter.error(f"An error occurred while converting subtitles: {str(e)}")
             self.progress_callback("Failed to convert subtitles.", 0)
+            return False
 
-    def merge_subtitles_with_video(self, video_file, subtitles_file):
-        output_file = os.path.splitext(video_file)[0] + '_with_subtitles.mp4'
-        command = [
-            'ffmpeg', '-i', video_file, '-i', subtitles_file,
-            '-c', 'copy', '-c:s', 'mov_text', output_file
-        ]
+    def run_postprocess_plan(self, plan, info_dict, checkpoint=None):
+        if plan.is_empty():
+            return
+        plan.add_metadata_from_info(info_dict)
         try:
             self.progress_callback("Merging subtitles with video...", 0)
-            print(f"Running command: {' '.join(command)}")  # Debug print
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            print(f"Command output: {result.stdout}")  # Debug print
-            print(f"Command error: {result.stderr}")  # Debug print
-            os.remove(video_file)  # Remove the original video file
-            os.rename(output_file, video_file)  # Rename the final file to the original name
+            plan.run(checkpoint)
             self.progress_callback("Subtitles merged successfully!", 100)
         except subprocess.CalledProcessError as e:
-            print(f"Command failed with error: {e.stderr}")  # Debug print
-            messagebox.showerror("Error", f"An error occurred while merging subtitles: {str(e)}")
+            log.warning("Command failed with error: %s", e.stderr)
+            self.reporter.error(f"An error occurred while merging subtitles: {str(e)}")
             self.progress_callback("Failed to merge subtitles.", 0)
 class AudioDownloader:
-    def __init__(self, url, format, save_location, include_subtitles, include_poster, progress_callback):
+    def __init__(self, url, format, save_location, include_subtitles, include_poster, progress_callback, reporter=None,
+                 checkpoint=None, subtitle_languages=None):
         self.url = url
         self.format = format
         self.save_location = save_location
         self.include_subtitles = include_subtitles
         self.include_poster = include_poster
         self.progress_callback = progress_callback
+        self.reporter = reporter or MessageBoxReporter()
+        self.checkpoint = checkpoint
+        self.subtitle_languages = list(subtitle_languages or SUBTITLE_LANGUAGES)
+
+    def checkpoint_params(self):
+        return {'url': self.url, 'format': self.format, 'save_location': self.save_location,
+                'include_subtitles': self.include_subtitles, 'include_poster': self.include_poster,
+                'subtitle_languages': self.subtitle_languages}
 
     def download_audio(self):
-        # Debug prints
-        print(f"Debug - URL: {self.url}")
-        print(f"Debug - Save location: {self.save_location}")
+        log.debug("URL: %s", self.url)
+        log.debug("Save location: %s", self.save_location)
 
         # Input validation
         if not self.url:
-            messagebox.showerror("Error", "Please enter a valid YouTube URL.")
-            return
+            self.reporter.error("Please enter a valid YouTube URL.")
+            return False
 
         if not self.save_location:
-            messagebox.showerror("Error", "Please choose a save location.")
-            return
+            self.reporter.error("Please choose a save location.")
+            return False
 
         # Progress hook function
         def progress_hook(d):
@@ -167,160 +590,180 @@ class AudioDownloader:
             elif d['status'] == 'finished':
                 self.progress_callback("Download completed!", 100)
 
+        # The audio is extracted after the download, outside the network lane, see TranscodePool
         ydl_opts = {
-            'format': 'bestaudio',
+            'format': audio_format_selector(self.format),
             'outtmpl': os.path.join(self.save_location, '%(title)s.%(ext)s'),
             'progress_hooks': [progress_hook],
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': self.format,
-                'preferredquality': '0',
-            }],
-            'writethumbnail': self.include_poster,
         }
 
         if self.include_subtitles:
-            ydl_opts.update({
-                'writesubtitles': True,
-                'subtitleslangs': ['en'],
-                'subtitlesformat': 'vtt',
-                'writeautomaticsub': True,
-            })
+            ydl_opts.update(subtitle_options(self.subtitle_languages))
 
-        try:
-            print("Audio download options:", ydl_opts)  # Debug print
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(self.url, download=True)
-                audio_file = ydl.prepare_filename(info_dict)
-                audio_file = os.path.splitext(audio_file)[0] + '.' + self.format
-
-                if self.include_poster:
-                    thumbnail_info = info_dict.get('thumbnails', [{}])[-1]
-                    thumbnail_url = thumbnail_info.get('url')
-                    if thumbnail_url:
-                        thumbnail_file = os.path.join(self.save_location, 'thumbnail.webp')
-                        jpeg_thumbnail_file = self.download_thumbnail(thumbnail_url, thumbnail_file)
-                        if jpeg_thumbnail_file:
-                            self.merge_poster_with_audio(audio_file, jpeg_thumbnail_file)
-
-                # Check if subtitles are available
-                if self.include_subtitles and 'requested_subtitles' in info_dict:
-                    vtt_subtitles_file = os.path.join(self.save_location, f"{os.path.splitext(audio_file)[0]}.en.vtt")
-                    srt_subtitles_file = os.path.join(self.save_location, f"{os.path.splitext(audio_file)[0]}.en.srt")
-                    if os.path.exists(vtt_subtitles_file):
-                        self.convert_vtt_to_srt(vtt_subtitles_file, srt_subtitles_file)
-                        self.merge_subtitles_with_audio(audio_file, srt_subtitles_file)
+        checkpoint = self.checkpoint or get_checkpoint_store().create('audio', self.checkpoint_params())
+        metrics = get_metrics_recorder().start_job('audio', self.url)
+        metrics.instrument(ydl_opts)
+        checkpoint.instrument(ydl_opts)
+        get_bandwidth_governor().share().instrument(ydl_opts)
 
+        try:
+            log.debug("Audio download options: %s", ydl_opts)
+            with checkout_youtube_dl(ydl_opts) as ydl:
+                with get_job_manager().network_lane:
+                    checkpoint.set_stage('extract')
+                    with metrics.span('extract'):
+                        info_dict = extract_info_cached(ydl, self.url)
+                reservation = reserve_disk_space(ydl, info_dict, self.save_location, True, self.progress_callback)
+                try:
+                    with get_job_manager().network_lane:
+                        checkpoint.set_stage('download')
+                        info_dict = ydl.process_ie_result(info_dict, download=True)
+                    info_dict['filepath'] = downloaded_filepath(ydl, info_dict, info_dict.get('ext', 'webm'))
+                    with metrics.span('extract_audio'):
+                        info_dict = ydl.run_pp(create_extract_audio_pp(ydl, self.format, metrics),
+                                               dict(info_dict, ext=os.path.splitext(info_dict['filepath'])[1][1:]))
+                    audio_file = info_dict['filepath']
+
+                    # Poster and subtitles are collected first and merged into the audio file in one pass
+                    plan = PostprocessPlan(audio_file)
+                    if self.include_poster:
+                        thumbnail_info = info_dict.get('thumbnails', [{}])[-1]
+                        thumbnail_url = thumbnail_info.get('url')
+                        if thumbnail_url:
+                            checkpoint.set_stage('thumbnail')
+                            with metrics.span('thumbnail'):
+                                jpeg_thumbnail_file = self.download_thumbnail(info_dict, thumbnail_url)
+                            if jpeg_thumbnail_file:
+                                plan.set_cover(jpeg_thumbnail_file)
+
+                    # Check if subtitles are available
+                    if self.include_subtitles:
+                        for language, vtt_subtitles_file in downloaded_subtitles(info_dict):
+                            srt_subtitles_file = os.path.splitext(vtt_subtitles_file)[0] + '.srt'
+                            with metrics.span('subtitles'):
+                                converted = self.convert_vtt_to_srt(vtt_subtitles_file, srt_subtitles_file)
+                            if converted:
+                                plan.add_subtitles(srt_subtitles_file, subtitle_language_code(language))
+                    checkpoint.set_stage('postprocess')
+                    with metrics.span('postprocess'):
+                        self.run_postprocess_plan(plan, info_dict, checkpoint)
+                finally:
+                    reservation.release()
+
+            metrics.finish('ok')
+            checkpoint.finish()
             self.progress_callback("Download completed!", 100)
-            messagebox.showinfo("Success", "Download completed successfully!")
+            self.reporter.info("Download completed successfully!")
+            return True
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            metrics.finish('failed')
+            checkpoint.finish()
+            self.reporter.error(f"An error occurred: {str(e)}")
+            return False
 
     def convert_vtt_to_srt(self, vtt_file, srt_file):
-        command = ['ffmpeg', '-i', vtt_file, srt_file]
         try:
-            print(f"Running command: {' '.join(command)}")  # Debug print
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            print(f"Command output: {result.stdout}")  # Debug print
-            print(f"Command error: {result.stderr}")  # Debug print
+            cues = convert_vtt_file_to_srt(vtt_file, srt_file)
+            log.debug("Converted %d subtitle cues to %s", cues, srt_file)
             os.remove(vtt_file)  # Remove the original VTT file
-        except subprocess.CalledProcessError as e:
-            print(f"Command failed with error: {e.stderr}")  # Debug print
-            messagebox.showerror("Error", f"An error occurred while converting subtitles: {str(e)}")
-
-    def merge_subtitles_with_audio(self, audio_file, subtitles_file):
-        output_file = os.path.splitext(audio_file)[0] + '_with_subtitles.mp4'
-        command = [
-            'ffmpeg', '-i', audio_file, '-i', subtitles_file,
-            '-c', 'copy', '-c:s', 'mov_text', output_file
-        ]
+            return True
+        except (OSError, ValueError) as e:
+            log.warning("Subtitle conversion failed with error: %s", e)
+            self.reporter.error(f"An error occurred while converting subtitles: {str(e)}")
+            return False
+
+    def download_thumbnail(self, info_dict, url):
         try:
-            print(f"Running command: {' '.join(command)}")  # Debug print
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            print(f"Command output: {result.stdout}")  # Debug print
-            print(f"Command error: {result.stderr}")  # Debug print
-            os.remove(audio_file)  # Remove the original audio file
-            os.rename(output_file, audio_file)  # Rename the final file to the original name
-        except subprocess.CalledProcessError as e:
-            print(f"Command failed with error: {e.stderr}")  # Debug print
-            messagebox.showerror("Error", f"An error occurred while merging subtitles: {str(e)}")
-
-    def download_thumbnail(self, url, path):
-        try:
-            with yt_dlp.YoutubeDL({'outtmpl': path}) as ydl:
-                ydl.download([url])
-            # Convert the downloaded thumbnail to JPEG
-            jpeg_path = os.path.splitext(path)[0] + '.jpg'
-            command = ['ffmpeg', '-i', path, jpeg_path]
-            subprocess.run(command, check=True)
-            os.remove(path)  # Remove the original webp file
-            return jpeg_path
+            return get_thumbnail_cache().cover_for(info_dict, url)
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred while downloading the thumbnail: {str(e)}")
+            self.reporter.error(f"An error occurred while downloading the thumbnail: {str(e)}")
             return None
 
-    def merge_poster_with_audio(self, audio_file, thumbnail_file):
-        output_file = os.path.splitext(audio_file)[0] + '_final.' + self.format
-        command = [
-            'ffmpeg', '-i', audio_file, '-i', thumbnail_file,
-            '-map', '0', '-map', '1', '-c', 'copy', '-id3v2_version', '3', '-metadata:s:v', 'title="Album cover"',
-            '-metadata:s:v', 'comment="Cover (front)"', output_file
-        ]
+    def run_postprocess_plan(self, plan, info_dict, checkpoint=None):
         try:
-            print(f"Running command: {' '.join(command)}")  # Debug print
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            print(f"Command output: {result.stdout}")  # Debug print
-            print(f"Command error: {result.stderr}")  # Debug print
-            os.remove(audio_file)  # Remove the original audio file
-            os.rename(output_file, audio_file)  # Rename the final file to the original name
+            if plan.is_empty():
+                return
+            plan.add_metadata_from_info(info_dict)
+            plan.run(checkpoint)
         except subprocess.CalledProcessError as e:
-            print(f"Command failed with error: {e.stderr}")  # Debug print
-            messagebox.showerror("Error", f"An error occurred while merging poster: {str(e)}")
+            log.warning("Command failed with error: %s", e.stderr)
+            self.reporter.error(f"An error occurred while merging poster and subtitles: {str(e)}")
         finally:
-            if os.path.exists(thumbnail_file):
-                os.remove(thumbnail_file)
+            plan.remove_cover()
 class PlaylistDownloader:
-    def __init__(self, url, format, save_location, include_subtitles, progress_callback):
+    def __init__(self, url, format, save_location, include_subtitles, progress_callback, max_workers=3, reporter=None,
+                 checkpoint=None, bounded_memory=False, subtitle_languages=None):
         self.url = url
         self.format = format
         self.save_location = save_location
         self.include_subtitles = include_subtitles
         self.progress_callback = progress_callback
+        self.max_workers = max_workers
+        self.reporter = reporter or MessageBoxReporter()
+        self.checkpoint = checkpoint
+        self.subtitle_languages = list(subtitle_languages or SUBTITLE_LANGUAGES)
+        # Entries are dropped once they are done, only their EntryRecord and per stage totals stay
+        self.bounded_memory = bounded_memory
+        self.records = []
+
+    def checkpoint_params(self):
+        return {'url': self.url, 'format': self.format, 'save_location': self.save_location,
+                'include_subtitles': self.include_subtitles, 'max_workers': self.max_workers,
+                'bounded_memory': self.bounded_memory, 'subtitle_languages': self.subtitle_languages}
 
     def download_playlist(self):
-        print(f"Debug - URL: {self.url}")
-        print(f"Debug - Save location: {self.save_location}")
+        log.debug("URL: %s", self.url)
+        log.debug("Save location: %s", self.save_location)
 
         # Input validation
         if not self.url:
-            messagebox.showerror("Error", "Please enter a valid YouTube URL.")
-            return
+            self.reporter.error("Please enter a valid YouTube URL.")
+            return False
         if not self.save_location:
-            messagebox.showerror("Error", "Please choose a save location.")
-            return
+            self.reporter.error("Please choose a save location.")
+            return False
 
         # Ensure the save location directory exists
         if not os.path.exists(self.save_location):
             os.makedirs(self.save_location)
 
-        # Progress hook function
-        def progress_hook(d):
-            if d['status'] == 'downloading':
-                downloaded_bytes = d.get('downloaded_bytes', 0)
-                total_bytes = d.get('total_bytes', 1)
-                speed = d.get('speed', 0)
-                eta = d.get('eta', 0)
-
-                percentage = int((downloaded_bytes / total_bytes) * 100) if total_bytes else 0
-                speed_kbps = speed / 1024 if speed else 0
-
-                self.progress_callback(
-                    f"Downloading: {percentage}% | Speed: {speed_kbps:.2f} KB/s | ETA: {eta} sec",
-                    percentage
-                )
-            elif d['status'] == 'finished':
-                self.progress_callback("Download completed!", 100)
+        # Finished entries are in the download index, so a resumed playlist only lists again and carries on
+        self.checkpoint = self.checkpoint or get_checkpoint_store().create('playlist', self.checkpoint_params())
+        self.metrics = get_metrics_recorder().start_job('playlist', self.url, aggregate_spans=self.bounded_memory)
+        self.bandwidth = get_bandwidth_governor().share()  # One share for all workers of the playlist
+        try:
+            log.debug("Playlist download options: %s", self._get_ydl_options())
+            self.checkpoint.set_stage('download')
+            progress = PlaylistProgress(0, self.progress_callback)
+            listing = PlaylistListing(self.url, self._format_key(), self.save_location, progress,
+                                      compact=self.bounded_memory)
+            entries = listing
+            if get_disk_space_governor().preflight:
+                entries = preflight_playlist(listing, self._get_ydl_options(), False, self.max_workers,
+                                             self.save_location, self.progress_callback, self.metrics)
+            download_entry = get_retry_policy().wrap(self._download_entry, self.metrics)
+            failed = run_entry_pipeline(entries, download_entry, None, progress, self.max_workers, 0)
+            failed = get_retry_policy().requeue(
+                failed, lambda retry: run_entry_pipeline(retry, download_entry, None, progress, self.max_workers, 0),
+                progress, self.metrics)
+            self.metrics.add_span('list', listing.duration)
+            self.metrics.entries = count_entry_records(self.records, failed, listing.skipped)
+
+            self.metrics.finish('failed' if failed else 'ok')
+            self.checkpoint.finish()
+            self.progress_callback("Download completed!", 100)
+            if failed:
+                self.reporter.info(f"Playlist downloaded with {len(failed)} failed item(s).")
+            else:
+                self.reporter.info("Playlist downloaded successfully!")
+            return not failed
+        except Exception as e:
+            self.metrics.finish('failed')
+            self.checkpoint.finish()
+            self.reporter.error(f"An error occurred: {str(e)}")
+            return False
 
+    def _get_ydl_options(self, filename_prefix='%(playlist_index)s', progress_hook=None):
         # Format selection logic
         if self.format == 'best':
             video_format = "bestvideo+bestaudio/best"
@@ -331,86 +774,134 @@ class PlaylistDownloader:
         # Download options
         ydl_opts = {
             'format': video_format,
-            'outtmpl': os.path.join(self.save_location, '%(playlist_index)s - %(title)s.%(ext)s'),
-            'progress_hooks': [progress_hook],
-            'merge_output_format': 'mp4',
+            'outtmpl': os.path.join(self.save_location, filename_prefix + ' - %(title)s.%(ext)s'),
+            'progress_hooks': [progress_hook] if progress_hook else [],
+            'merge_output_format': MERGE_OUTPUT_FORMATS,
         }
 
         # Add subtitle options if requested
         if self.include_subtitles:
-            ydl_opts.update({
-                'writesubtitles': True,
-                'subtitleslangs': ['en'],
-                'subtitlesformat': 'vtt',
-                'writeautomaticsub': True,
-            })
-
-        try:
-            print("Playlist download options:", ydl_opts)
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(self.url, download=False)
-                for entry in info_dict.get('entries', []):  # Use get to avoid KeyErrors
-                    pprint(entry)  # Debug entry structure
-                    video_url = entry.get('original_url') or entry.get('webpage_url')
-                    if not video_url:
-                        print(f"Skipping video due to missing URL: {entry.get('title', 'Unknown Title')}")
-                        continue
-
-                    try:
-                        print(f"Downloading video: {video_url}")
-                        ydl.download([video_url])
-                    except Exception as e:
-                        print(f"Error downloading {video_url}: {str(e)}")
-                        continue
+            ydl_opts.update(subtitle_options(self.subtitle_languages))
+        return ydl_opts
+
+    def _format_key(self):
+        # Other languages are other files, the English only key stays as it was for the existing index
+        if not self.include_subtitles:
+            return f"video:{self.format}"
+        if self.subtitle_languages == SUBTITLE_LANGUAGES:
+            return f"video:{self.format}:subtitles"
+        return f"video:{self.format}:subtitles:{','.join(self.subtitle_languages)}"
+
+    def _download_entry(self, index, entry, progress):
+        video_url = entry_url(entry)
+        if not video_url:
+            log.warning("Skipping video due to missing URL: %s", entry.get('title', 'Unknown Title'))
+            return
 
-            self.progress_callback("Download completed!", 100)
-            messagebox.showinfo("Success", "Playlist downloaded successfully!")
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+        # Subtitles are files next to the video that the media store doesn't keep, so those runs download
+        if not self.include_subtitles:
+            linked_file = link_from_media_store(entry, self._format_key(), self.save_location,
+                                                self._get_ydl_options(progress.filename_prefix(index)))
+            if linked_file:
+                self.records.append(EntryRecord(entry.get('id'), linked_file, 'linked'))
+                return
+
+        # Each worker gets its own YoutubeDL instance, they are not safe to share between threads
+        ydl_opts = self.metrics.instrument(self._get_ydl_options(progress.filename_prefix(index), progress.hook_for(index)))
+        self.checkpoint.instrument(ydl_opts)
+        self.bandwidth.instrument(ydl_opts)
+        log.info("Downloading video: %s", video_url)
+        with checkout_youtube_dl(ydl_opts) as ydl:
+            with get_job_manager().network_lane:
+                with self.metrics.span('extract'):
+                    info_dict = extract_info_cached(ydl, video_url)
+            with reserve_disk_space(ydl, info_dict, self.save_location, False, progress.notice, announce=False):
+                with get_job_manager().network_lane:
+                    info_dict = ydl.process_ie_result(info_dict, download=True)
+            video_file = downloaded_filepath(ydl, info_dict, info_dict.get('ext', 'mp4'))
+        if not self.include_subtitles:
+            get_media_store().add(info_dict['id'], self._format_key(), video_file, info_dict.get('title'))
+        get_download_index().record(info_dict['id'], self._format_key(), self.save_location, video_file)
+        self.records.append(EntryRecord(info_dict['id'], video_file, 'downloaded'))
 class AudioPlaylistDownloader:
-    def __init__(self, url, audio_format, save_location, include_poster, progress_callback):
+    def __init__(self, url, audio_format, save_location, include_poster, progress_callback, max_workers=3, reporter=None,
+                 checkpoint=None, postprocess_workers=None, bounded_memory=False):
         self.url = url
         self.audio_format = audio_format
         self.save_location = save_location
         self.include_poster = include_poster
         self.progress_callback = progress_callback
+        self.max_workers = max_workers
+        self.reporter = reporter or MessageBoxReporter()
+        self.checkpoint = checkpoint
+        self.bounded_memory = bounded_memory
+        self.records = []
+        # Threads converting and tagging finished downloads, 0 does it inside the download workers
+        self.postprocess_workers = max(1, min(max_workers, os.cpu_count() or 2)) if postprocess_workers is None \
+            else postprocess_workers
+
+    def checkpoint_params(self):
+        return {'url': self.url, 'audio_format': self.audio_format, 'save_location': self.save_location,
+                'include_poster': self.include_poster, 'max_workers': self.max_workers,
+                'bounded_memory': self.bounded_memory}
 
     def download_playlist(self):
         if not self._validate_inputs():
-            return
-
-        ydl_opts = self._get_ydl_options()
+            return False
 
+        self.checkpoint = self.checkpoint or get_checkpoint_store().create('audio-playlist', self.checkpoint_params())
+        self.metrics = get_metrics_recorder().start_job('audio-playlist', self.url, aggregate_spans=self.bounded_memory)
+        self.bandwidth = get_bandwidth_governor().share()
         try:
-            print("Debug - Starting playlist download with options:", ydl_opts)
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(self.url, download=True)
-                self._handle_playlist_entries(info_dict, ydl)
+            log.debug("Starting playlist download with options: %s", self._get_ydl_options())
+            self.checkpoint.set_stage('download')
+            progress = PlaylistProgress(0, self.progress_callback)
+            listing = PlaylistListing(self.url, self._format_key(), self.save_location, progress,
+                                      compact=self.bounded_memory)
+            entries = listing
+            if get_disk_space_governor().preflight:
+                entries = preflight_playlist(listing, self._get_ydl_options(), True, self.max_workers,
+                                             self.save_location, self.progress_callback, self.metrics)
+            download_entry = get_retry_policy().wrap(self._download_entry, self.metrics)
+            failed = run_entry_pipeline(entries, download_entry, self._postprocess_entry, progress,
+                                        self.max_workers, self.postprocess_workers)
+            failed = get_retry_policy().requeue(
+                failed, lambda retry: run_entry_pipeline(retry, download_entry, self._postprocess_entry, progress,
+                                                         self.max_workers, self.postprocess_workers),
+                progress, self.metrics)
+            self.metrics.add_span('list', listing.duration)
+            self.metrics.entries = count_entry_records(self.records, failed, listing.skipped)
+
+            self.metrics.finish('failed' if failed else 'ok')
+            self.checkpoint.finish()
             self.progress_callback("Download completed!", 100)
-            messagebox.showinfo("Success", "Playlist downloaded successfully!")
+            if failed:
+                self.reporter.info(f"Playlist downloaded with {len(failed)} failed item(s).")
+            else:
+                self.reporter.info("Playlist downloaded successfully!")
+            return not failed
         except Exception as e:
+            self.metrics.finish('failed')
+            self.checkpoint.finish()
             self._show_error(f"An error occurred during playlist download: {str(e)}")
+            return False
 
     def _validate_inputs(self):
         if not self.url:
-            messagebox.showerror("Error", "Please enter a valid YouTube URL.")
+            self.reporter.error("Please enter a valid YouTube URL.")
             return False
         if not self.save_location:
-            messagebox.showerror("Error", "Please choose a save location.")
+            self.reporter.error("Please choose a save location.")
             return False
         return True
 
-    def _get_ydl_options(self):
+    def _get_ydl_options(self, filename_prefix='%(playlist_index)s', progress_hook=None):
+        # Audio extraction is not a yt-dlp postprocessor here, it runs in the postprocessing stage
+        # of the pipeline so the download workers can move on to the next entry right away
         return {
-            'format': 'bestaudio',
-            'outtmpl': os.path.join(self.save_location, '%(playlist_index)s - %(title)s.%(ext)s'),
-            'progress_hooks': [self._progress_hook],
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': self.audio_format,
-                'preferredquality': '0',
-            }],
-            'writethumbnail': self.include_poster,
+            'format': audio_format_selector(self.audio_format),
+            'outtmpl': os.path.join(self.save_location, filename_prefix + ' - %(title)s.%(ext)s'),
+            'progress_hooks': [progress_hook or self._progress_hook],
         }
 
     def _progress_hook(self, d):
@@ -430,74 +921,2757 @@ class AudioPlaylistDownloader:
         elif d['status'] == 'finished':
             self.progress_callback("Download completed!", 100)
 
-    def _handle_playlist_entries(self, info_dict, ydl):
-        for entry in info_dict.get('entries', []):
-            audio_file = ydl.prepare_filename(entry)
-            audio_file = os.path.splitext(audio_file)[0] + '.' + self.audio_format
-
-            if self.include_poster:
-                thumbnail_url = self._get_thumbnail_url(entry)
-                if thumbnail_url:
-                    thumbnail_file = os.path.join(self.save_location, 'thumbnail.webp')
-                    jpeg_thumbnail_file = self._download_thumbnail(thumbnail_url, thumbnail_file)
-                    if jpeg_thumbnail_file:
-                        self._merge_poster_with_audio(audio_file, jpeg_thumbnail_file)
+    def _download_entry(self, index, entry, progress):
+        video_url = entry_url(entry)
+        if not video_url:
+            log.warning("Skipping audio due to missing URL: %s", entry.get('title', 'Unknown Title'))
+            return
+        linked_file = link_from_media_store(entry, self._format_key(), self.save_location,
+                                            self._get_ydl_options(progress.filename_prefix(index)))
+        if linked_file:
+            self.records.append(EntryRecord(entry.get('id'), linked_file, 'linked'))
+            return  # Already converted and tagged, nothing left for the postprocessing stage
+
+        ydl_opts = self.metrics.instrument(self._get_ydl_options(progress.filename_prefix(index), progress.hook_for(index)))
+        self.checkpoint.instrument(ydl_opts)
+        self.bandwidth.instrument(ydl_opts)
+        with checkout_youtube_dl(ydl_opts) as ydl:
+            with get_job_manager().network_lane:
+                with self.metrics.span('extract'):
+                    info_dict = extract_info_cached(ydl, video_url)
+            # Released by the postprocessing stage, the extracted audio needs room next to the download
+            reservation = reserve_disk_space(ydl, info_dict, self.save_location, True, progress.notice, announce=False)
+            try:
+                with get_job_manager().network_lane:
+                    info_dict = ydl.process_ie_result(info_dict, download=True)
+            except BaseException:
+                reservation.release()
+                raise
+            info_dict['filepath'] = downloaded_filepath(ydl, info_dict, info_dict.get('ext', 'webm'))
+        info_dict['__disk_reservation'] = reservation
+        return info_dict
+
+    def _postprocess_entry(self, index, entry, info_dict):
+        reservation = info_dict.pop('__disk_reservation', None)
+        try:
+            with checkout_youtube_dl({'quiet': True}) as ydl:
+                extract_audio = create_extract_audio_pp(ydl, self.audio_format, self.metrics)
+                with self.metrics.span('extract_audio'):
+                    info_dict = ydl.run_pp(extract_audio, dict(info_dict, ext=os.path.splitext(info_dict['filepath'])[1][1:]))
+            audio_file = self._handle_playlist_entry(info_dict)
+        finally:
+            if reservation:
+                reservation.release()
+        get_media_store().add(info_dict['id'], self._format_key(), audio_file, info_dict.get('title'))
+        get_download_index().record(info_dict['id'], self._format_key(), self.save_location, audio_file)
+        self.checkpoint.forget_postprocess(audio_file)
+        self.records.append(EntryRecord(info_dict['id'], audio_file, 'downloaded'))
+
+    def _format_key(self):
+        return f"audio:{self.audio_format}" + (":poster" if self.include_poster else "")
+
+    def _handle_playlist_entry(self, entry):
+        audio_file = entry['filepath']
+
+        if self.include_poster:
+            thumbnail_url = self._get_thumbnail_url(entry)
+            if thumbnail_url:
+                with self.metrics.span('thumbnail'):
+                    jpeg_thumbnail_file = self._download_thumbnail(entry, thumbnail_url)
+                if jpeg_thumbnail_file:
+                    plan = PostprocessPlan(audio_file)
+                    plan.set_cover(jpeg_thumbnail_file)
+                    plan.add_metadata_from_info(entry)
+                    with self.metrics.span('postprocess'):
+                        self._run_postprocess_plan(plan)
+        return audio_file
 
     def _get_thumbnail_url(self, entry):
         thumbnails = entry.get('thumbnails', [{}])
         return thumbnails[-1].get('url', None)
 
-    def _download_thumbnail(self, url, path):
+    def _download_thumbnail(self, entry, url):
+        # Workers run side by side, every entry gets its own temporary cover file
         try:
-            with yt_dlp.YoutubeDL({'outtmpl': path}) as ydl:
-                ydl.download([url])
-
-            jpeg_path = os.path.splitext(path)[0] + '.jpg'
-            self._convert_thumbnail_to_jpeg(path, jpeg_path)
-            return jpeg_path
+            return get_thumbnail_cache().cover_for(entry, url)
         except Exception as e:
             self._show_error(f"An error occurred while downloading the thumbnail: {str(e)}")
             return None
 
-    def _convert_thumbnail_to_jpeg(self, input_path, output_path):
+    def _run_postprocess_plan(self, plan):
         try:
-            command = [get_ffmpeg_path(), '-i', input_path, output_path]
-            subprocess.run(command, check=True)
-            os.remove(input_path)
+            if plan.is_empty():
+                return
+            plan.run(self.checkpoint)
         except Exception as e:
-            self._show_error(f"An error occurred during thumbnail conversion: {str(e)}")
-
-    def _merge_poster_with_audio(self, audio_file, thumbnail_file):
-        output_file = os.path.splitext(audio_file)[0] + '_final.' + self.audio_format
-        command = [
-            get_ffmpeg_path(), '-i', audio_file, '-i', thumbnail_file,
-            '-map', '0', '-map', '1', '-c', 'copy', '-id3v2_version', '3',
-            '-metadata:s:v', 'title="Album cover"', '-metadata:s:v', 'comment="Cover (front)"',
-            output_file
-        ]
+            self._show_error(f"An error occurred during merging poster with audio: {str(e)}")
+        finally:
+            plan.remove_cover()
 
+    def _show_error(self, message):
+        log.error(message)
+        self.reporter.error(message)
+
+
+class MetadataHarvester:
+    # Captions and metadata without the media, for search indexing. Every video of a channel, playlist
+    # or single URL is extracted without downloading, its subtitles in the requested languages are
+    # fetched as small text files and saved as SRT, and one compact JSON line with title, duration and
+    # chapters goes to metadata.jsonl in the save location. Harvested videos are in the download index,
+    # so a second run only picks up new uploads.
+    JSONL_NAME = 'metadata.jsonl'
+
+    def __init__(self, url, save_location, subtitle_languages, progress_callback, max_workers=8, reporter=None,
+                 checkpoint=None):
+        self.url = url
+        self.save_location = save_location
+        self.subtitle_languages = list(subtitle_languages or SUBTITLE_LANGUAGES)
+        self.progress_callback = progress_callback
+        self.max_workers = max_workers
+        self.reporter = reporter or MessageBoxReporter()
+        self.checkpoint = checkpoint
+        self.records = []
+        self.jsonl_path = os.path.join(save_location or '', self.JSONL_NAME)
+        self.jsonl_lock = threading.Lock()
+
+    def checkpoint_params(self):
+        return {'url': self.url, 'save_location': self.save_location, 'subtitle_languages': self.subtitle_languages,
+                'max_workers': self.max_workers}
+
+    def harvest(self):
+        if not self.url:
+            self.reporter.error("Please enter a valid YouTube URL.")
+            return False
+        if not self.save_location:
+            self.reporter.error("Please choose a save location.")
+            return False
+        os.makedirs(self.save_location, exist_ok=True)
+
+        self.checkpoint = self.checkpoint or get_checkpoint_store().create('harvest', self.checkpoint_params())
+        self.metrics = get_metrics_recorder().start_job('harvest', self.url, aggregate_spans=True)
+        self.bandwidth = get_bandwidth_governor().share()  # One share for all workers of the harvest
         try:
-            print(f"Debug - Merging poster with audio using command: {' '.join(command)}")
-            subprocess.run(command, check=True)
-            os.remove(audio_file)
-            os.rename(output_file, audio_file)
+            self.checkpoint.set_stage('download')
+            progress = PlaylistProgress(0, self.progress_callback)
+            listing = PlaylistListing(self.url, self._format_key(), self.save_location, progress, compact=True)
+            harvest_entry = get_retry_policy().wrap(self._harvest_entry, self.metrics)
+            self.jsonl = open(self.jsonl_path, 'a', encoding='utf-8')
+            try:
+                failed = run_entry_pipeline(listing, harvest_entry, None, progress, self.max_workers, 0)
+                failed = get_retry_policy().requeue(
+                    failed, lambda retry: run_entry_pipeline(retry, harvest_entry, None, progress, self.max_workers, 0),
+                    progress, self.metrics)
+            finally:
+                self.jsonl.close()
+            self.metrics.add_span('list', listing.duration)
+            self.metrics.entries = count_entry_records(self.records, failed, listing.skipped)
+
+            self.metrics.finish('failed' if failed else 'ok')
+            self.checkpoint.finish()
+            self.progress_callback("Harvest completed!", 100)
+            harvested = self.metrics.entries.get('harvested', 0)
+            if failed:
+                self.reporter.info(f"Harvested {harvested} video(s), {len(failed)} failed.")
+            else:
+                self.reporter.info(f"Harvested {harvested} video(s) into {self.jsonl_path}")
+            return not failed
         except Exception as e:
-            self._show_error(f"An error occurred during merging poster with audio: {str(e)}")
+            self.metrics.finish('failed')
+            self.checkpoint.finish()
+            self.reporter.error(f"An error occurred during the harvest: {str(e)}")
+            return False
+
+    def _get_ydl_options(self):
+        return dict(subtitle_options(self.subtitle_languages), **{
+            'quiet': True,
+            'skip_download': True,
+            'subtitlesformat': 'vtt/srt/best',
+            'outtmpl': os.path.join(self.save_location, '%(title)s [%(id)s].%(ext)s'),
+        })
+
+    def _format_key(self):
+        return f"harvest:{','.join(self.subtitle_languages)}"
+
+    def _harvest_entry(self, index, entry, progress):
+        video_url = entry_url(entry)
+        if not video_url:
+            log.warning("Skipping video due to missing URL: %s", entry.get('title', 'Unknown Title'))
+            return
+        # No slot of the network lane, it is sized for media transfers and these are small requests.
+        # max_workers alone limits how many run at once.
+        with checkout_youtube_dl(self._get_ydl_options()) as ydl:
+            with self.metrics.span('extract'):
+                info_dict = extract_info_cached(ydl, video_url)
+            # Picked again for these languages, a cached result may come from a run that asked for others
+            subtitles = ydl.process_subtitles(info_dict['id'], info_dict.get('subtitles'),
+                                              info_dict.get('automatic_captions')) or {}
+            base_name = os.path.splitext(ydl.prepare_filename(info_dict))[0]
+
+            # Fetched by the same instance, with its cookies, headers and proxy
+            subtitle_files = {}
+            for language, subtitle in subtitles.items():
+                with self.metrics.span('subtitles'):
+                    subtitle_files[language] = os.path.basename(self._save_subtitle(ydl, base_name, language, subtitle))
+        self._write_record(info_dict, subtitle_files)
+        get_download_index().record(info_dict['id'], self._format_key(), self.save_location, self.jsonl_path)
+        self.records.append(EntryRecord(info_dict['id'], self.jsonl_path, 'harvested'))
+
+    def _save_subtitle(self, ydl, base_name, language, subtitle):
+        data = subtitle.get('data')
+        if data is None:
+            data = self._fetch_subtitle(ydl, subtitle).decode('utf-8', 'replace')
+        if subtitle.get('ext') == 'vtt' and data.lstrip('\ufeff').startswith('WEBVTT'):
+            path = f"{base_name}.{language}.srt"
+            with open(path, 'w', encoding='utf-8') as f:
+                write_srt_cues(iter_vtt_cues(data.splitlines()), f)
+        else:
+            # Only WebVTT is converted, other formats are kept as they come
+            path = f"{base_name}.{language}.{subtitle.get('ext') or 'txt'}"
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(data)
+        return path
+
+    def _fetch_subtitle(self, ydl, subtitle):
+        # yt-dlp's HTTPError carries the status, so a 429 or 5xx is retried by the retry policy
+        response = ydl.urlopen(yt_dlp.networking.Request(subtitle['url'], headers=subtitle.get('http_headers')))
+        chunks = []
+        try:
+            while True:
+                data = response.read(64 * 1024)
+                if not data:
+                    break
+                chunks.append(data)
+                self.bandwidth.consume(len(data))
         finally:
-            if os.path.exists(thumbnail_file):
-                os.remove(thumbnail_file)
+            response.close()
+        return b''.join(chunks)
+
+    def _write_record(self, info_dict, subtitle_files):
+        record = {
+            'id': info_dict['id'],
+            'title': info_dict.get('title'),
+            'url': info_dict.get('webpage_url') or info_dict.get('original_url'),
+            'duration': info_dict.get('duration'),
+            'channel': info_dict.get('channel') or info_dict.get('uploader'),
+            'upload_date': info_dict.get('upload_date'),
+            'chapters': [[chapter.get('start_time'), chapter.get('end_time'), chapter.get('title')]
+                         for chapter in info_dict.get('chapters') or []],
+            'subtitles': subtitle_files,
+        }
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        # One write per line under the lock, a crash leaves whole lines behind
+        with self.jsonl_lock:
+            self.jsonl.write(line)
+            self.jsonl.flush()
 
-    def _show_error(self, message):
-        print("Error:", message)  # Debug print
-        messagebox.showerror("Error", message)
 
+class PlaylistListing:
+    # Lists a playlist while it is being downloaded. Without processing, yt-dlp hands out the entries
+    # of a lazy playlist as the extractor fetches its pages, so iterating yields the first new entries
+    # long before a channel with thousands of videos is listed completely. Only the flat entries are
+    # listed, the full metadata is fetched later for the new ones.
+    MAX_LOOKUP_BATCH = 500
+
+    def __init__(self, url, format_key, save_location, progress, compact=False):
+        self.url = url
+        self.format_key = format_key
+        self.save_location = save_location
+        self.progress = progress
+        self.compact = compact
+        self.listed = 0
+        self.skipped = 0
+        self.duration = 0.0
+
+    def __iter__(self):
+        started = time.perf_counter()
+        with checkout_youtube_dl({'quiet': True}) as ydl:
+            with get_job_manager().network_lane:
+                info_dict = self._resolve(ydl)
+            entries = info_dict.get('entries') or []  # Use get to avoid KeyErrors
+            if info_dict.get('_type', 'video') == 'video':
+                entries = [info_dict]  # A single video lists as a playlist of one
+            self.progress.start_listing(info_dict.get('playlist_count') or (len(entries) if isinstance(entries, list) else None))
+
+            # The download index is asked about one entry first, then about batches twice as big each
+            # time, so the first download doesn't wait for a batch to fill up
+            batch, batch_size = [], 1
+            for position, entry in enumerate(self._fetch(entries), start=1):
+                entry['playlist_index'] = entry.get('playlist_index') or position
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    yield from self._new_entries(batch)
+                    batch, batch_size = [], min(batch_size * 2, self.MAX_LOOKUP_BATCH)
+            yield from self._new_entries(batch)
+
+        self.duration = time.perf_counter() - started
+        self.progress.listing_finished()
+        if self.skipped:
+            log.info("Skipping %d entries that are already in the download index", self.skipped)
+
+    def _resolve(self, ydl):
+        info_dict = ydl.extract_info(self.url, download=False, process=False)
+        # A video page with a playlist in its URL and similar links first come back as a url result
+        while info_dict.get('_type') in ('url', 'url_transparent'):
+            info_dict = ydl.extract_info(info_dict['url'], download=False, ie_key=info_dict.get('ie_key'), process=False)
+        return info_dict
+
+    def _fetch(self, entries):
+        # The network lane is taken for every step instead of the whole listing, the steps that
+        # need the next page fetch it inside the lane and the rest return right away
+        entries = iter(entries)
+        while True:
+            with get_job_manager().network_lane:
+                entry = next(entries, StopIteration)
+            if entry is StopIteration:
+                return
+            if entry:
+                yield entry
+
+    def _new_entries(self, batch):
+        downloaded = get_download_index().downloaded_ids([entry.get('id') for entry in batch], self.format_key,
+                                                         self.save_location)
+        for entry in batch:
+            self.listed += 1
+            if entry.get('id') in downloaded:
+                self.skipped += 1
+                continue
+            self.progress.entry_listed()
+            yield compact_entry(entry) if self.compact else entry
+
+
+# What a flat entry needs to be downloaded and named, its thumbnails and the rest are fetched again
+COMPACT_ENTRY_FIELDS = ('id', 'title', 'url', 'original_url', 'webpage_url', 'ie_key', 'playlist_index')
+
+
+def compact_entry(entry):
+    return {field: entry[field] for field in COMPACT_ENTRY_FIELDS if entry.get(field) is not None}
+
+
+class EntryRecord:
+    # All a bounded memory playlist keeps of an entry once it is done with it
+    __slots__ = ('id', 'path', 'status')
+
+    def __init__(self, entry_id, path, status):
+        self.id = entry_id
+        self.path = path
+        self.status = status
+
+
+def count_entry_records(records, failed, skipped):
+    # Entries still failing after the retry queue get their record only now, a requeued one may recover
+    records.extend(EntryRecord(entry.get('id'), None, 'failed') for entry, kind in failed)
+    counts = collections.Counter(record.status for record in records)
+    if skipped:
+        counts['skipped'] = skipped
+    return dict(counts)
+
+
+def downloaded_filepath(ydl, info_dict, ext):
+    # Where the postprocessors left the file, falling back to the output template
+    for download in info_dict.get('requested_downloads') or []:
+        if download.get('filepath'):
+            return download['filepath']
+    return os.path.splitext(ydl.prepare_filename(info_dict))[0] + '.' + ext
+
+
+def run_entry_pipeline(entries, download_entry, postprocess_entry, progress, download_workers, postprocess_workers):
+    # Downloads and postprocessing run in separate thread pools joined by a bounded queue, so the
+    # network keeps busy while ffmpeg works on earlier entries. When postprocessing falls behind the
+    # queue fills up and the downloaders wait instead of piling up unconverted files on disk.
+    # With postprocess_workers=0 every download worker postprocesses its own entries.
+    downloads = queue.Queue(maxsize=max(1, download_workers) * 2)
+    handoff = queue.Queue(maxsize=max(1, postprocess_workers))
+    failed = []
+    failed_lock = threading.Lock()
+
+    def run_stage(stage, entry, *args):
+        try:
+            return stage(entry['playlist_index'], entry, *args), True
+        except Exception as e:
+            log.error("Error downloading %s: %s", entry.get('title', 'Unknown Title'), e)
+            with failed_lock:
+                # The kind decides whether the retry queue tries it again. The error itself isn't kept,
+                # its traceback would hold on to the entry's whole info dict.
+                failed.append((entry, classify_error(e)))
+            return None, False
+
+    def download_worker():
+        while True:
+            entry = downloads.get()
+            if entry is None:
+                return
+            result, succeeded = run_stage(download_entry, entry, progress)
+            if succeeded and result is not None and postprocess_workers:
+                handoff.put((entry, result))  # Blocks while the postprocessing stage is full
+                continue
+            if succeeded and result is not None:
+                run_stage(postprocess_entry, entry, result)
+            progress.entry_done()
+
+    def postprocess_worker():
+        while True:
+            item = handoff.get()
+            if item is None:
+                return
+            run_stage(postprocess_entry, *item)
+            progress.entry_done()
+
+    download_threads = [threading.Thread(target=download_worker, name=f"download-{number}")
+                        for number in range(max(1, download_workers))]
+    postprocess_threads = [threading.Thread(target=postprocess_worker, name=f"postprocess-{number}")
+                           for number in range(postprocess_workers)]
+    for thread in download_threads + postprocess_threads:
+        thread.start()
+    try:
+        # entries can be a PlaylistListing, which lists only as fast as the queue makes room
+        for entry in entries:
+            downloads.put(entry)
+    finally:
+        # A listing that fails halfway still lets the workers finish the entries they already have
+        for _ in download_threads:
+            downloads.put(None)
+        for thread in download_threads:
+            thread.join()
+        for _ in postprocess_threads:
+            handoff.put(None)
+        for thread in postprocess_threads:
+            thread.join()
+    return failed
+
+
+RATE_LIMITED = 'rate_limited'
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# 403 included: YouTube refuses media URLs that expired or were handed out to another client, a new
+# extraction usually works
+TRANSIENT_STATUSES = {403, 408, 425, 500, 502, 503, 504}
+# Matched by class name anywhere in the error's MRO, so yt-dlp doesn't have to be imported for it
+TRANSIENT_ERROR_TYPES = {'TransportError', 'ContentTooShortError', 'ConnectionError', 'TimeoutError'}
+RATE_LIMITED_MARKERS = ('too many requests', 'rate limit', 'rate-limit', "confirm you're not a bot",
+                        'confirm you\u2019re not a bot')
+PERMANENT_MARKERS = ('video unavailable', 'private video', 'has been removed', 'not available in your country',
+                     'members-only', 'confirm your age', 'unsupported url', 'is not a valid url')
+TRANSIENT_MARKERS = ('timed out', 'connection reset', 'connection refused', 'remote end closed', 'temporarily',
+                     'name resolution', 'network is unreachable', 'incomplete read')
+
+
+def error_chain(error):
+    # yt-dlp keeps the original error in DownloadError.exc_info, others chain through __cause__
+    chain = []
+    while error is not None and all(error is not item for item in chain):
+        chain.append(error)
+        exc_info = getattr(error, 'exc_info', None)
+        error = (exc_info[1] if isinstance(exc_info, tuple) else None) or error.__cause__ or error.__context__
+    return chain
+
+
+def error_status(error):
+    for item in error_chain(error):
+        status = getattr(item, 'status', None) or getattr(item, 'code', None)
+        if isinstance(status, int) and 400 <= status < 600:
+            return status
+    match = re.search(r'HTTP(?: Error)? (\d{3})\b', str(error))
+    return int(match.group(1)) if match else None
+
+
+def classify_error(error):
+    # Rate limited errors slow the host down, transient ones are retried, permanent ones (the video is
+    # gone, private or unsupported, or a bug of ours) fail the entry right away
+    status = error_status(error)
+    if status == 429:
+        return RATE_LIMITED
+    if status in TRANSIENT_STATUSES:
+        return TRANSIENT
+    if status is not None:
+        return PERMANENT
+    chain = error_chain(error)
+    text = ' '.join(str(item) for item in chain).lower()
+    if any(marker in text for marker in RATE_LIMITED_MARKERS):
+        return RATE_LIMITED
+    if any(marker in text for marker in PERMANENT_MARKERS):
+        return PERMANENT
+    if any(cls.__name__ in TRANSIENT_ERROR_TYPES for item in chain for cls in type(item).__mro__):
+        return TRANSIENT
+    if any(marker in text for marker in TRANSIENT_MARKERS):
+        return TRANSIENT
+    return PERMANENT
+
+
+def retry_after(error):
+    for item in error_chain(error):
+        headers = getattr(getattr(item, 'response', None), 'headers', None) or getattr(item, 'headers', None)
+        value = headers.get('Retry-After') if headers else None
+        if value and str(value).strip().isdigit():
+            return int(value)
+    return None
+
+
+class HostCircuitBreaker:
+    # Throttling of one host. A rate limited response opens the circuit: every worker of every job
+    # that wants the host waits out the cooldown, which doubles with each throttle in a row. Once it
+    # closes, requests to the host start at least `spacing` apart, and successes shrink the spacing
+    # again, so the pool slows down for a throttling host instead of hammering it.
+    BASE_COOLDOWN = 5.0
+    MAX_COOLDOWN = 300.0
+
+    def __init__(self, host):
+        self.host = host
+        self.cooldown = 0.0
+        self.spacing = 0.0
+        self.open_until = 0.0
+        self.next_request = 0.0
+        self.throttled_count = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.open_until, self.next_request)
+            self.next_request = start + self.spacing
+        if start > now:
+            time.sleep(start - now)
+
+    def throttled(self, retry_after_seconds=None):
+        with self.lock:
+            self.throttled_count += 1
+            now = time.monotonic()
+            if now < self.open_until:
+                return  # Sent before the circuit opened, it doesn't make the throttle any longer
+            self.cooldown = min(self.MAX_COOLDOWN, max(retry_after_seconds or 0, self.cooldown * 2 or self.BASE_COOLDOWN))
+            # Jittered, so the waiting workers don't all come back in the same instant
+            self.open_until = now + self.cooldown * random.uniform(1.0, 1.25)
+            self.spacing = self.cooldown / 4
+        log.warning("%s is rate limiting, pausing requests to it for %.0f s", self.host, self.cooldown)
+
+    def succeeded(self):
+        with self.lock:
+            if self.spacing > 0.1:
+                self.spacing /= 2
+                self.cooldown /= 2
+            else:
+                self.spacing = self.cooldown = 0.0
+
+    def stats(self):
+        with self.lock:
+            return {'throttled': self.throttled_count, 'cooldown_seconds': round(self.cooldown, 1),
+                    'spacing_seconds': round(self.spacing, 2)}
+
+
+class RetryPolicy:
+    # Retries a playlist entry after transient and rate limited errors with exponential backoff and
+    # full jitter, behind the circuit breaker of the entry's host. Entries that still fail go to the
+    # retry queue, which runs them once more at the end of the playlist.
+    def __init__(self, attempts=3, base_delay=2.0, max_delay=60.0, requeue_rounds=1):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requeue_rounds = requeue_rounds
+        self.lock = threading.Lock()
+        self._breakers = {}
+        self.retries = collections.Counter()
+        self.requeued = 0
+        self.recovered = 0
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def breaker(self, url):
+        host = urllib.parse.urlsplit(url).hostname or url
+        with self.lock:
+            if host not in self._breakers:
+                self._breakers[host] = HostCircuitBreaker(host)
+            return self._breakers[host]
+
+    def call(self, url, function, *args, metrics=None):
+        breaker = self.breaker(url)
+        for attempt in itertools.count(1):
+            breaker.wait()
+            try:
+                result = function(*args)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == RATE_LIMITED:
+                    breaker.throttled(retry_after(e))
+                if kind == PERMANENT or attempt >= self.attempts:
+                    raise
+                delay = self.backoff(attempt)
+                log.warning("Retrying %s in %.1f s after a %s error (attempt %d of %d): %s",
+                            url, delay, kind.replace('_', ' '), attempt + 1, self.attempts, e)
+                with self.lock:
+                    self.retries[kind] += 1
+                if metrics:
+                    metrics.count_entry_retry(kind)
+                # The cached metadata may hold the media URLs that just failed
+                get_metadata_cache().invalidate(url)
+                time.sleep(delay)
+                continue
+            breaker.succeeded()
+            return result
+
+    def wrap(self, stage, metrics=None):
+        def retrying_stage(index, entry, *args):
+            url = entry_url(entry)
+            if not url:
+                return stage(index, entry, *args)
+            return self.call(url, stage, index, entry, *args, metrics=metrics)
+        return retrying_stage
+
+    def requeue(self, failed, run_pass, progress, metrics=None):
+        # The retry queue: entries that failed with a transient or rate limit error go through the
+        # pipeline again after the rest of the playlist, when the hosts had time to recover
+        for round_number in range(1, self.requeue_rounds + 1):
+            retryable = [entry for entry, kind in failed if kind != PERMANENT]
+            if not retryable:
+                break
+            delay = self.backoff(self.attempts + round_number)
+            log.info("Retrying %d failed entries in %.1f s", len(retryable), delay)
+            time.sleep(delay)
+            progress.requeued(len(retryable))
+            still_failed = run_pass(retryable)
+            with self.lock:
+                self.requeued += len(retryable)
+                self.recovered += len(retryable) - len(still_failed)
+            if metrics:
+                metrics.count_requeue(len(retryable), len(retryable) - len(still_failed))
+            failed = [item for item in failed if item[1] == PERMANENT] + still_failed
+        return failed
+
+    def stats(self):
+        with self.lock:
+            breakers = dict(self._breakers)
+            stats = {'retries': dict(self.retries), 'requeued': self.requeued, 'recovered': self.recovered}
+        stats['throttled_hosts'] = {host: breaker.stats() for host, breaker in breakers.items() if breaker.throttled_count}
+        return stats
+
+
+_retry_policy = None
+_retry_policy_lock = threading.Lock()
+
+
+def get_retry_policy(**kwargs):
+    global _retry_policy
+    with _retry_policy_lock:
+        if _retry_policy is None:
+            _retry_policy = RetryPolicy(**kwargs)
+        return _retry_policy
+
+
+def entry_url(entry):
+    return entry.get('original_url') or entry.get('webpage_url') or entry.get('url')
+
+
+class PlaylistProgress:
+    UNKNOWN_SIZE_WIDTH = 4  # Index digits when a streamed listing doesn't tell its size up front
+
+    def __init__(self, total, progress_callback, playlist_size=None):
+        self.total = total
+        self.progress_callback = progress_callback
+        self.width = len(str(playlist_size or total))
+        self.completed = 0
+        self.listing = False
+        self.lock = threading.Lock()
+
+    def start_listing(self, playlist_size=None):
+        # A streamed listing only knows the total at its end, until then every new entry adds one
+        with self.lock:
+            self.listing = True
+            self.width = len(str(playlist_size)) if playlist_size else self.UNKNOWN_SIZE_WIDTH
+
+    def entry_listed(self):
+        with self.lock:
+            self.total += 1
+
+    def listing_finished(self):
+        with self.lock:
+            self.listing = False
+
+    def total_text(self):
+        return f"{self.total}+" if self.listing else str(self.total)
+
+    def filename_prefix(self, index):
+        # Zero padded so the files sort in playlist order no matter which worker finishes first
+        return f"{int(index):0{self.width}d}"
+
+    def overall_percentage(self):
+        return int((self.completed / self.total) * 100) if self.total else 100
+
+    def hook_for(self, index):
+        def progress_hook(d):
+            if d['status'] == 'downloading':
+                downloaded_bytes = d.get('downloaded_bytes', 0)
+                total_bytes = d.get('total_bytes', 1)
+                speed = d.get('speed', 0)
+
+                percentage = int((downloaded_bytes / total_bytes) * 100) if total_bytes else 0
+                speed_kbps = speed / 1024 if speed else 0
+
+                with self.lock:
+                    self.progress_callback(
+                        f"[{self.completed}/{self.total_text()}] Item {index}: {percentage}% | Speed: {speed_kbps:.2f} KB/s",
+                        self.overall_percentage()
+                    )
+        return progress_hook
+
+    def requeued(self, count):
+        # Failed entries were counted as finished, the retry queue takes them back
+        with self.lock:
+            self.completed = max(0, self.completed - count)
+
+    def notice(self, text, value=None):
+        with self.lock:
+            self.progress_callback(f"[{self.completed}/{self.total_text()}] {text}", self.overall_percentage())
+
+    def entry_done(self):
+        with self.lock:
+            self.completed += 1
+            self.progress_callback(f"Finished {self.completed}/{self.total_text()} items", self.overall_percentage())
+
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+
+class Job:
+    def __init__(self, job_id, name, target, priority):
+        self.id = job_id
+        self.name = name
+        self.target = target
+        self.priority = priority
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class JobManager:
+    # Jobs wait in a priority queue and at most max_jobs of them run at once. Inside a job, transfers
+    # take a slot from the network lane and ffmpeg work a slot from the postprocessing lane, so
+    # playlist workers and single downloads share the same global limits.
+    def __init__(self, max_jobs=2, network_slots=4, postprocess_slots=None):
+        self.max_jobs = max_jobs
+        self.network_slots = network_slots
+        self.network_lane = threading.BoundedSemaphore(network_slots)
+        self.postprocess_lane = threading.BoundedSemaphore(postprocess_slots or os.cpu_count() or 2)
+        self._queue = []
+        self._jobs = []
+        self._running = 0
+        self._counter = itertools.count(1)
+        self._condition = threading.Condition()
+        self._accepting = True
+        self._local = threading.local()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="job-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, name, target, priority=PRIORITY_NORMAL):
+        with self._condition:
+            if not self._accepting:
+                raise RuntimeError("The job manager is shutting down.")
+            job = Job(next(self._counter), name, target, priority)
+            self._jobs.append(job)
+            heapq.heappush(self._queue, (priority, job.id, job))
+            self._condition.notify_all()
+            return job
+
+    def cancel(self, job):
+        with self._condition:
+            if job.status != 'queued':
+                return False
+            self._queue = [item for item in self._queue if item[2] is not job]
+            heapq.heapify(self._queue)
+            self._finish(job, 'cancelled')
+            return True
+
+    def prioritize(self, job, priority=PRIORITY_HIGH):
+        with self._condition:
+            if job.status != 'queued':
+                return False
+            job.priority = priority
+            self._queue = [(item[2].priority, item[1], item[2]) for item in self._queue]
+            heapq.heapify(self._queue)
+            return True
+
+    def jobs(self):
+        with self._condition:
+            return list(self._jobs)
+
+    def clear_finished(self):
+        with self._condition:
+            self._jobs = [job for job in self._jobs if not job.done.is_set()]
+
+    def active_count(self):
+        with self._condition:
+            return self._running + len(self._queue)
+
+    def current_job(self):
+        # The job whose thread is calling, None outside of job threads (e.g. playlist workers)
+        return getattr(self._local, 'job', None)
+
+    def shutdown(self, wait=True, cancel_pending=True):
+        with self._condition:
+            self._accepting = False
+            if cancel_pending:
+                for _, _, job in self._queue:
+                    self._finish(job, 'cancelled')
+                self._queue = []
+            self._condition.notify_all()
+        if wait:
+            with self._condition:
+                self._condition.wait_for(lambda: self._running == 0 and not self._queue)
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue and self._running < self.max_jobs)
+                _, _, job = heapq.heappop(self._queue)
+                job.status = 'running'
+                self._running += 1
+            # Worker threads are not daemons so a closing window can't cut a download off halfway
+            threading.Thread(target=self._run, args=(job,), name=f"job-{job.id}").start()
+
+    def _run(self, job):
+        status = 'failed'
+        self._local.job = job
+        try:
+            job.result = job.target()
+            status = 'failed' if job.result is False else 'done'
+        except Exception as e:
+            job.error = str(e)
+            log.error("Job %d (%s) failed: %s", job.id, job.name, job.error)
+        with self._condition:
+            self._running -= 1
+            self._finish(job, status)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.done.set()
+        self._condition.notify_all()
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager(**kwargs):
+    # Process wide scheduler, the keyword arguments only apply when it is created
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager(**kwargs)
+        return _job_manager
+
+
+PRIORITY_WEIGHTS = {PRIORITY_HIGH: 4, PRIORITY_NORMAL: 2, PRIORITY_LOW: 1}
+
+
+class BandwidthGovernor:
+    # Process wide token bucket every transfer draws from. The allowed rate is split between the jobs
+    # that transferred something in the last ACTIVE_SECONDS by their weight, so a background playlist
+    # yields to a single download and idle jobs don't hold on to a share. The limit comes from a
+    # time of day schedule when one is set, otherwise from set_limit; None means unlimited.
+    ACTIVE_SECONDS = 2.0
+    WINDOW_SECONDS = 5.0
+
+    def __init__(self, limit=None, schedule=None, burst_seconds=1.0):
+        self.limit = limit
+        self.schedule = schedule or []
+        self.burst_seconds = burst_seconds
+        self.lock = threading.Lock()
+        self._shares = weakref.WeakSet()
+        self._window = collections.deque()
+        self._window_bytes = 0
+        self.total_bytes = 0
+
+    def set_limit(self, limit):
+        with self.lock:
+            self.limit = limit or None
+
+    def set_schedule(self, schedule):
+        # [(minute of the day, limit)], each limit holds until the next entry and wraps around midnight
+        with self.lock:
+            self.schedule = sorted(schedule)
+
+    def allowed_rate(self):
+        if not self.schedule:
+            return self.limit
+        now = time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        current = self.schedule[-1][1]
+        for start, limit in self.schedule:
+            if start <= minute:
+                current = limit
+        return current or None
+
+    def share(self, weight=None):
+        if weight is None:
+            job = get_job_manager().current_job()
+            weight = PRIORITY_WEIGHTS.get(job.priority, 1) if job else 1
+        share = BandwidthShare(self, weight)
+        with self.lock:
+            self._shares.add(share)
+        return share
+
+    def consume(self, share, size):
+        # Charges the transfer first and then sleeps off the debt, so the caller's own thread slows down
+        now = time.monotonic()
+        rate = self.allowed_rate()
+        with self.lock:
+            self._window.append((now, size))
+            self._window_bytes += size
+            self.total_bytes += size
+            share.last_active = now
+            if not rate:
+                return
+            active_weight = sum(s.weight for s in self._shares if now - s.last_active <= self.ACTIVE_SECONDS)
+            share_rate = rate * share.weight / max(active_weight, share.weight)
+            share.tokens = min(share.tokens + (now - share.updated) * share_rate, share_rate * self.burst_seconds)
+            share.updated = now
+            share.tokens -= size
+            delay = -share.tokens / share_rate if share.tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            while self._window and now - self._window[0][0] > self.WINDOW_SECONDS:
+                self._window_bytes -= self._window.popleft()[1]
+            active = sum(1 for s in self._shares if now - s.last_active <= self.ACTIVE_SECONDS)
+            actual = self._window_bytes / self.WINDOW_SECONDS
+        return {'actual': actual, 'allowed': self.allowed_rate(), 'active_jobs': active, 'total_bytes': self.total_bytes}
+
+
+class BandwidthShare:
+    # One job's handle on the governor. yt-dlp reports cumulative byte counts per file from the thread
+    # doing the transfer, so the progress hook charges the difference and throttles that very thread.
+    def __init__(self, governor, weight):
+        self.governor = governor
+        self.weight = weight
+        self.tokens = 0
+        self.updated = time.monotonic()
+        self.last_active = 0
+        self.lock = threading.Lock()
+        self._seen = {}
+
+    def instrument(self, ydl_opts):
+        ydl_opts['progress_hooks'] = list(ydl_opts.get('progress_hooks') or []) + [self.progress_hook]
+        ydl_opts['bandwidth_share'] = self  # SegmentedHttpDownloader charges its connections directly
+        return ydl_opts
+
+    def progress_hook(self, d):
+        key = d.get('filename')
+        if d['status'] == 'finished':
+            with self.lock:
+                self._seen.pop(key, None)  # A playlist has thousands of files, only running ones are kept
+            return
+        if d['status'] != 'downloading' or d.get('segmented'):
+            return
+        downloaded = d.get('downloaded_bytes') or 0
+        with self.lock:
+            size = downloaded - self._seen.get(key, 0)
+            self._seen[key] = max(downloaded, self._seen.get(key, 0))
+        if size > 0:
+            self.consume(size)
+
+    def consume(self, size):
+        self.governor.consume(self, size)
+
+
+def parse_bandwidth_setting(text):
+    # "2M" is a fixed limit, "08:00=1M,18:30=0" a schedule, an empty string or 0 means unlimited
+    text = (text or '').strip()
+    if '=' not in text:
+        return parse_rate(text), []
+    schedule = []
+    for item in text.split(','):
+        start, _, rate = item.partition('=')
+        hours, _, minutes = start.strip().partition(':')
+        schedule.append((int(hours) * 60 + int(minutes or 0), parse_rate(rate)))
+    return None, schedule
+
+
+def parse_rate(text):
+    if not text.strip() or text.strip() == '0':
+        return None
+    rate = load_yt_dlp().utils.parse_bytes(text.strip())
+    if rate is None:
+        raise ValueError(f"Not a transfer rate: {text}")
+    return rate
+
+
+_bandwidth_governor = None
+_bandwidth_governor_lock = threading.Lock()
+
+
+def get_bandwidth_governor(**kwargs):
+    global _bandwidth_governor
+    with _bandwidth_governor_lock:
+        if _bandwidth_governor is None:
+            _bandwidth_governor = BandwidthGovernor(**kwargs)
+        return _bandwidth_governor
+
+
+def estimate_download_size(ydl, info_dict, postprocess=False):
+    # Size of the formats the job's options select, from filesize, filesize_approx or the bitrate.
+    # The selection runs on a copy, the download processes the extracted info again. Merging writes
+    # the output next to its parts and every later rewrite (subtitles, cover, tags, audio extraction)
+    # next to the previous file, so the peak on disk is two copies whenever anything follows the download.
+    selected = ydl.process_ie_result(json.loads(json.dumps(info_dict)), download=False)
+    formats = selected.get('requested_formats') or [selected]
+    size, known = 0, True
+    for fmt in formats:
+        fmt_size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not fmt_size and fmt.get('tbr') and selected.get('duration'):
+            fmt_size = fmt['tbr'] * 1000 / 8 * selected['duration']
+        if not fmt_size:
+            known = False
+        size += int(fmt_size or 0)
+    peak = size * 2 if postprocess or len(formats) > 1 else size
+    return size, peak, known
+
+
+def estimated_download_rate():
+    # For ETAs: the bandwidth limit, else what is transferring right now, else the average speed of
+    # the transfers finished so far times the transfers that can run at once
+    governor = get_bandwidth_governor()
+    stats = governor.stats()
+    if stats['allowed']:
+        return stats['allowed']
+    if stats['actual']:
+        return stats['actual']
+    totals = get_metrics_recorder().stage_totals.get('transfer')
+    if totals and totals['seconds'] > 0:
+        return totals['bytes'] / totals['seconds'] * get_job_manager().network_slots
+    return None
+
+
+def reserve_disk_space(ydl, info_dict, save_location, postprocess, progress_callback, announce=True):
+    # Holds the job back until its peak size fits on the disk, the reservation shrinks as yt-dlp writes
+    size, peak, known = estimate_download_size(ydl, info_dict, postprocess)
+    if announce:
+        rate = estimated_download_rate()
+        eta = f", ETA {format_duration(size / rate)}" if rate and known else ""
+        progress_callback(f"Size: {format_bytes(size) if known else 'unknown'}{eta}", 0)
+    reservation = get_disk_space_governor().reserve(save_location, peak, lambda message: progress_callback(message, 0))
+    ydl.add_progress_hook(reservation.progress_hook)
+    return reservation
+
+
+class PreflightPlan:
+    # Totals of a planning pass over the entries of a playlist, before anything is downloaded
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.items = 0
+        self.size = 0
+        self.unknown = 0
+        self.largest_headroom = 0
+
+    def add(self, size, peak, known):
+        self.items += 1
+        self.size += size
+        self.unknown += not known
+        self.largest_headroom = max(self.largest_headroom, peak - size)
+
+    def space_needed(self):
+        # The finished files plus the postprocessing headroom of the entries worked on side by side
+        return self.size + self.largest_headroom * self.workers
+
+    def as_dict(self, free=None, rate=None):
+        return {
+            'items': self.items,
+            'bytes': self.size,
+            'bytes_needed': self.space_needed(),
+            'unknown_size': self.unknown,
+            'free_bytes': free,
+            'eta_seconds': round(self.size / rate) if rate else None,
+        }
+
+    def describe(self, free=None, rate=None):
+        text = f"Plan: {self.items} items, {format_bytes(self.size)} to download"
+        if self.unknown:
+            text += f" ({self.unknown} of unknown size)"
+        text += f", {format_bytes(self.space_needed())} needed on disk"
+        if free is not None:
+            text += f", {format_bytes(free)} free"
+        text += f", ETA {format_duration(self.size / rate)}" if rate else ", ETA after the first transfer"
+        return text
+
+
+def preflight_playlist(listing, ydl_opts, postprocess, workers, save_location, progress_callback, metrics):
+    # Lists the whole playlist and estimates every new entry before the first download starts. The
+    # extracted metadata lands in the metadata cache, so the downloads don't fetch it again.
+    def estimate(entry):
+        video_url = entry_url(entry)
+        if not video_url:
+            return 0, 0, False
+        with checkout_youtube_dl(dict(ydl_opts, quiet=True)) as ydl:
+            with get_job_manager().network_lane:
+                info_dict = extract_info_cached(ydl, video_url)
+            return estimate_download_size(ydl, info_dict, postprocess)
+
+    progress_callback("Planning the playlist...", 0)
+    with metrics.span('plan'):
+        entries = list(listing)
+        plan = PreflightPlan(workers)
+        with concurrent.futures.ThreadPoolExecutor(max(1, workers)) as executor:
+            for entry, future in zip(entries, [executor.submit(estimate, entry) for entry in entries]):
+                try:
+                    plan.add(*future.result())
+                except Exception as e:
+                    log.warning("Could not estimate %s: %s", entry.get('title', 'Unknown Title'), e)
+                    plan.add(0, 0, False)
+
+    free, rate = get_disk_space_governor().free_space(save_location), estimated_download_rate()
+    text = plan.describe(free, rate)
+    if plan.space_needed() > free - get_disk_space_governor().min_free:
+        text += ", the downloads will pause when the disk runs full"
+    log.info(text)
+    progress_callback(text, 0)
+    metrics.plan = plan.as_dict(free, rate)
+    return entries
+
+
+class DiskReservation:
+    # Space held for one admitted download. yt-dlp's progress hook reports what the download already
+    # wrote, which the filesystem's free space shows by then, so only the rest stays reserved.
+    def __init__(self, governor, device, size):
+        self.governor = governor
+        self.device = device
+        self.size = size
+        self.written = {}
+
+    def progress_hook(self, d):
+        if d.get('filename'):
+            self.written[d['filename']] = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+
+    def outstanding(self):
+        return max(0, self.size - sum(list(self.written.values())))
+
+    def release(self):
+        self.governor.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class DiskSpaceGovernor:
+    # Admits downloads only while the filesystem they are saved to has room for their estimated peak
+    # size. Admitted downloads hold their reservation until their postprocessing is done, so workers
+    # running side by side don't all count the same free space. When space runs low the workers wait
+    # here, and with them the playlist queue, instead of failing halfway through a file. They go on
+    # once other downloads release their headroom or space is freed on the disk.
+    POLL_SECONDS = 5
+
+    def __init__(self, min_free=512 * 1024 * 1024, preflight=False):
+        self.min_free = min_free
+        self.preflight = preflight  # Playlists plan sizes and ETA before they start downloading
+        self._reservations = []
+        self._condition = threading.Condition()
+        self.paused = 0
+        self.paused_seconds = 0.0
+
+    def free_space(self, path):
+        return shutil.disk_usage(existing_parent(path)).free
+
+    def reserve(self, path, size, on_pause=None):
+        path = existing_parent(path)
+        reservation = DiskReservation(self, os.stat(path).st_dev, size)
+        if size > shutil.disk_usage(path).total - self.min_free:
+            raise OSError(f"{format_bytes(size)} will never fit on the disk of {path}")
+        paused_at = None
+        with self._condition:
+            while True:
+                available = self._available(path, reservation.device)
+                if available >= size:
+                    break
+                if paused_at is None:
+                    paused_at = time.monotonic()
+                    self.paused += 1
+                    message = (f"Paused: waiting for disk space, {format_bytes(size)} needed and "
+                               f"{format_bytes(max(0, available))} available")
+                    log.warning("%s in %s", message, path)
+                    if on_pause:
+                        on_pause(message)
+                self._condition.wait(self.POLL_SECONDS)
+            self._reservations.append(reservation)
+            if paused_at is not None:
+                self.paused_seconds += time.monotonic() - paused_at
+                log.info("Disk space available again in %s, resuming", path)
+        return reservation
+
+    def release(self, reservation):
+        with self._condition:
+            if reservation in self._reservations:
+                self._reservations.remove(reservation)
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {'min_free_bytes': self.min_free, 'reserved_bytes': sum(r.outstanding() for r in self._reservations),
+                    'pauses': self.paused, 'paused_seconds': round(self.paused_seconds, 3)}
+
+    def _available(self, path, device):
+        reserved = sum(r.outstanding() for r in self._reservations if r.device == device)
+        return shutil.disk_usage(path).free - self.min_free - reserved
+
+
+def existing_parent(path):
+    # Save locations are created by the download, until then the space of the parent counts
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+_disk_space_governor = None
+_disk_space_governor_lock = threading.Lock()
+
+
+def get_disk_space_governor(**kwargs):
+    global _disk_space_governor
+    with _disk_space_governor_lock:
+        if _disk_space_governor is None:
+            _disk_space_governor = DiskSpaceGovernor(**kwargs)
+        return _disk_space_governor
+
+
+CACHE_DIR = os.environ.get('HORIZON_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.horizon_vid_downloader')
+
+# Query parameters that only track where a link was shared from
+TRACKING_QUERY_PARAMS = {'si', 'feature', 'pp', 'ab_channel', 'utm_source', 'utm_medium', 'utm_campaign'}
+
+
+def normalize_url(url):
+    parsed = urllib.parse.urlsplit(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+    query = urllib.parse.parse_qs(parsed.query)
+
+    # Different spellings of the same YouTube video or playlist share one key
+    if host == 'youtu.be' and parsed.path.strip('/'):
+        return f"youtube:{parsed.path.strip('/')}"
+    if host in ('youtube.com', 'music.youtube.com'):
+        if parsed.path.startswith('/shorts/'):
+            return f"youtube:{parsed.path.split('/')[2]}"
+        if 'v' in query:
+            return f"youtube:{query['v'][0]}"
+        if 'list' in query:
+            return f"youtube:playlist:{query['list'][0]}"
+
+    params = sorted((key, value) for key, values in query.items() if key not in TRACKING_QUERY_PARAMS for value in values)
+    return urllib.parse.urlunsplit((parsed.scheme.lower(), host, parsed.path.rstrip('/'), urllib.parse.urlencode(params), ''))
+
+
+class MetadataCache:
+    # extract_info results stored in SQLite. Entries expire after ttl seconds, because the media URLs
+    # inside them stop working after a few hours, and the least recently used ones are evicted once
+    # the cache grows past max_bytes.
+    def __init__(self, path=None, ttl=3 * 3600, max_bytes=256 * 1024 * 1024, enabled=True):
+        self.path = path or os.path.join(CACHE_DIR, 'metadata.sqlite3')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = None
+        if enabled:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS info ('
+                'key TEXT PRIMARY KEY, info TEXT NOT NULL, size INTEGER NOT NULL, '
+                'fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            self.connection.execute('CREATE INDEX IF NOT EXISTS info_accessed_at ON info (accessed_at)')
+            self.connection.commit()
+
+    def get(self, url):
+        info = self._load(normalize_url(url)) if self.enabled else None
+        if info is not None and info.get('_type') == 'playlist' and 'entry_keys' in info:
+            # Playlists only store the keys of their entries, every entry has to still be cached
+            entries = [self._load(key) for key in info.pop('entry_keys')]
+            info = None if any(entry is None for entry in entries) else dict(info, entries=entries)
+        with self.lock:
+            if info is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return info
+
+    def put(self, url, info):
+        if not self.enabled:
+            return
+        if info.get('_type') == 'playlist':
+            entry_keys = []
+            for entry in info.get('entries') or []:
+                if entry:
+                    entry_url = entry.get('webpage_url') or entry.get('original_url') or entry.get('url')
+                    self._store(normalize_url(entry_url), entry)
+                    entry_keys.append(normalize_url(entry_url))
+            info = dict(info, entries=None, entry_keys=entry_keys)
+        self._store(normalize_url(url), info)
+        self._evict()
+
+    def invalidate(self, url):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.connection.execute('DELETE FROM info WHERE key = ?', (normalize_url(url),))
+            self.connection.commit()
+
+    def stats(self):
+        with self.lock:
+            entries, size = (0, 0)
+            if self.enabled:
+                entries, size = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM info').fetchone()
+            return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+    def _load(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT info FROM info WHERE key = ? AND fetched_at >= ?', (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute('UPDATE info SET accessed_at = ? WHERE key = ?', (now, key))
+            self.connection.commit()
+        return json.loads(row[0])
+
+    def _store(self, key, info):
+        data = json.dumps(info, default=str)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO info (key, info, size, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, data, len(data), now, now)
+            )
+            self.connection.commit()
+
+    def _evict(self):
+        with self.lock:
+            self.connection.execute('DELETE FROM info WHERE fetched_at < ?', (time.time() - self.ttl,))
+            total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM info').fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self.connection.execute('SELECT key, size FROM info ORDER BY accessed_at').fetchall():
+                    self.connection.execute('DELETE FROM info WHERE key = ?', (key,))
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+            self.connection.commit()
+
+
+_metadata_cache = None
+_metadata_cache_lock = threading.Lock()
+
+
+def get_metadata_cache(**kwargs):
+    global _metadata_cache
+    with _metadata_cache_lock:
+        if _metadata_cache is None:
+            _metadata_cache = MetadataCache(**kwargs)
+        return _metadata_cache
+
+
+def extract_info_cached(ydl, url):
+    cache = get_metadata_cache()
+    info = cache.get(url)
+    if info is None:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        cache.put(url, info)
+    return info
+
+
+class HttpConnectionPool:
+    # Keep-alive connections per host for small fetches like thumbnails, which don't need a YoutubeDL
+    # instance of their own. Idle connections are reused; a connection the server closed in the
+    # meantime is replaced once.
+    def __init__(self, timeout=30, max_idle_per_host=4, max_redirects=5):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.max_redirects = max_redirects
+        self.lock = threading.Lock()
+        self._idle = {}
+
+    def get(self, url):
+        for _ in range(self.max_redirects + 1):
+            status, headers, body = self._request(url)
+            if status in (301, 302, 303, 307, 308) and headers.get('Location'):
+                url = urllib.parse.urljoin(url, headers['Location'])
+                continue
+            if status != 200:
+                # An OSError like before, carrying the status so classify_error can tell 429 and 503 apart
+                raise urllib.error.HTTPError(url, status, f"HTTP {status} for {url}", headers, None)
+            return body
+        raise OSError(f"Too many redirects for {url}")
+
+    def _request(self, url):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        for attempt in range(2):
+            connection = self._checkout(key)
+            try:
+                connection.request('GET', path, headers={'User-Agent': HTTP_USER_AGENT, 'Accept-Encoding': 'identity'})
+                response = connection.getresponse()
+                body = response.read()
+            except (ConnectionResetError, BrokenPipeError):  # RemoteDisconnected is a ConnectionResetError
+                connection.close()
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(key, connection)
+            return response.status, response.headers, body
+
+    def _checkout(self, key):
+        with self.lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        import http.client  # Only imported once a thumbnail is fetched, it pulls in most of the email package
+        scheme, host = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, timeout=self.timeout)
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    def _checkin(self, key, connection):
+        with self.lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+
+HTTP_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+_http_pool = None
+_http_pool_lock = threading.Lock()
+
+
+def get_http_pool(**kwargs):
+    global _http_pool
+    with _http_pool_lock:
+        if _http_pool is None:
+            _http_pool = HttpConnectionPool(**kwargs)
+        return _http_pool
+
+
+class ThumbnailCache:
+    # Cover art already converted to JPEG, one file per video under CACHE_DIR/thumbnails, so re-runs and
+    # other formats of the same video don't fetch and convert the poster again. Every caller gets its
+    # own temporary copy, which it may hand to ffmpeg and delete without racing other workers.
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024, enabled=True):
+        self.directory = directory or os.path.join(CACHE_DIR, 'thumbnails')
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def cover_for(self, info_dict, url):
+        key = re.sub(r'[^\w.-]', '_', f"{info_dict.get('extractor_key', 'video')}-{info_dict['id']}")
+        cached_file = os.path.join(self.directory, key + '.jpg')
+        if self.enabled and os.path.exists(cached_file):
+            os.utime(cached_file)  # Eviction drops the least recently used posters first
+            with open(cached_file, 'rb') as f:
+                jpeg = f.read()
+        else:
+            with get_job_manager().network_lane:
+                data = get_http_pool().get(url)
+            jpeg = convert_image_to_jpeg(data)
+            if self.enabled:
+                self._store(cached_file, jpeg)
+
+        handle, cover_file = tempfile.mkstemp(prefix=key + '-', suffix='.jpg')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(jpeg)
+        return cover_file
+
+    def _store(self, cached_file, jpeg):
+        temporary_file = f'{cached_file}.{threading.get_ident()}.tmp'
+        with open(temporary_file, 'wb') as f:
+            f.write(jpeg)
+        os.replace(temporary_file, cached_file)
+        self._evict()
+
+    def _evict(self):
+        with self.lock:
+            files = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith('.jpg'):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                os.remove(path)
+                total -= size
+
+
+_thumbnail_cache = None
+_thumbnail_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache(**kwargs):
+    global _thumbnail_cache
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = ThumbnailCache(**kwargs)
+        return _thumbnail_cache
+
+
+def convert_image_to_jpeg(data):
+    if data[:3] == b'\xff\xd8\xff':
+        return data  # Already JPEG, nothing to decode
+    Image = load_pillow()
+    if Image is not None:
+        with Image.open(io.BytesIO(data)) as image:
+            output = io.BytesIO()
+            image.convert('RGB').save(output, 'JPEG', quality=92)
+            return output.getvalue()
+    # Without Pillow ffmpeg converts through pipes, still without any files on disk
+    with get_job_manager().postprocess_lane:
+        result = subprocess.run([get_ffmpeg_path(), '-loglevel', 'error', '-i', 'pipe:0', '-f', 'image2pipe',
+                                 '-c:v', 'mjpeg', '-q:v', '2', 'pipe:1'], input=data, capture_output=True, check=True)
+    return result.stdout
+
+
+class DownloadIndex:
+    # Which video ids were already downloaded in which format into which folder. Playlist runs
+    # check it before any network work, so a re-sync only handles entries that are new.
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, 'downloads.sqlite3')
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS downloads ('
+            'video_id TEXT NOT NULL, format TEXT NOT NULL, directory TEXT NOT NULL, path TEXT NOT NULL, '
+            'size INTEGER NOT NULL, downloaded_at REAL NOT NULL, PRIMARY KEY (video_id, format, directory))'
+        )
+        self.connection.commit()
+
+    def downloaded_ids(self, video_ids, format, directory):
+        video_ids = [video_id for video_id in video_ids if video_id]
+        directory = os.path.abspath(directory)
+        found = set()
+        with self.lock:
+            # SQLite limits the number of bound parameters, so large playlists are looked up in chunks
+            for start in range(0, len(video_ids), 500):
+                chunk = video_ids[start:start + 500]
+                rows = self.connection.execute(
+                    f'SELECT video_id FROM downloads WHERE format = ? AND directory = ? '
+                    f'AND video_id IN ({", ".join("?" * len(chunk))})',
+                    [format, directory] + chunk
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def record(self, video_id, format, directory, path):
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO downloads (video_id, format, directory, path, size, downloaded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (video_id, format, os.path.abspath(directory), os.path.abspath(path), size, time.time())
+            )
+            self.connection.commit()
+
+    def rows(self):
+        with self.lock:
+            return self.connection.execute('SELECT video_id, format, path FROM downloads').fetchall()
+
+    def reconcile(self, directory=None):
+        # Drop rows whose file is gone and refresh sizes of files that changed on disk
+        query = 'SELECT video_id, format, directory, path, size FROM downloads'
+        params = []
+        if directory:
+            query += ' WHERE directory = ?'
+            params.append(os.path.abspath(directory))
+        summary = {'checked': 0, 'removed': 0, 'updated': 0}
+        with self.lock:
+            for video_id, format, row_directory, path, size in self.connection.execute(query, params).fetchall():
+                summary['checked'] += 1
+                key = (video_id, format, row_directory)
+                if not os.path.exists(path):
+                    self.connection.execute(
+                        'DELETE FROM downloads WHERE video_id = ? AND format = ? AND directory = ?', key
+                    )
+                    summary['removed'] += 1
+                elif os.path.getsize(path) != size:
+                    self.connection.execute(
+                        'UPDATE downloads SET size = ? WHERE video_id = ? AND format = ? AND directory = ?',
+                        (os.path.getsize(path),) + key
+                    )
+                    summary['updated'] += 1
+            self.connection.commit()
+        return summary
+
+
+_download_index = None
+_download_index_lock = threading.Lock()
+
+
+def get_download_index(**kwargs):
+    global _download_index
+    with _download_index_lock:
+        if _download_index is None:
+            _download_index = DownloadIndex(**kwargs)
+        return _download_index
+
+
+FICLONE = 0x40049409  # Linux ioctl behind cp --reflink
+
+
+def link_file(source, target):
+    # A reflink shares the blocks like a hardlink but stays a file of its own, so tagging one copy
+    # later doesn't change the others. Filesystems without reflinks get a hardlink, and a copy is
+    # the last resort across filesystems.
+    temporary_file = f'{target}.{threading.get_ident()}.link'
+    try:
+        try:
+            import fcntl
+            with open(source, 'rb') as src, open(temporary_file, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            method = 'reflink'
+        except (ImportError, OSError):
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            try:
+                os.link(source, temporary_file)
+                method = 'hardlink'
+            except OSError:
+                shutil.copyfile(source, temporary_file)
+                method = 'copy'
+        os.replace(temporary_file, target)
+        return method
+    except BaseException:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+        raise
+
+
+class MediaStore:
+    # One copy of every downloaded playlist entry, addressed by its video id and format key. When a
+    # video shows up in another playlist, that playlist's folder gets a link to the stored file
+    # instead of another download. A blob is kept as long as a download index row points at an
+    # existing file of that video id and format, collect_garbage drops the rest. The store should
+    # be on the same filesystem as the save locations, otherwise the links become copies.
+    GRACE_SECONDS = 3600  # Blobs this new may belong to a download that isn't in the index yet
+    TITLE_SUFFIX = '.title'  # Next to every blob, the title of the full extraction it was downloaded with
+
+    def __init__(self, directory=None, enabled=False):
+        self.directory = directory or os.path.join(CACHE_DIR, 'store')
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.linked = 0
+        self.added = 0
+        self.bytes_saved = 0
+
+    def key(self, video_id, format_key):
+        return hashlib.sha256(f"{video_id}\0{format_key}".encode('utf-8')).hexdigest()[:32]
+
+    def find(self, video_id, format_key):
+        if not self.enabled or not video_id:
+            return None
+        key = self.key(video_id, format_key)
+        try:
+            names = os.listdir(os.path.join(self.directory, key[:2]))
+        except FileNotFoundError:
+            return None
+        for name in names:
+            if name.startswith(key + '.') and not name.endswith(('.link', '.tmp', self.TITLE_SUFFIX)):
+                return os.path.join(self.directory, key[:2], name)
+        return None
+
+    def add(self, video_id, format_key, path, title=None):
+        if not self.enabled or not video_id or not os.path.isfile(path):
+            return
+        key = self.key(video_id, format_key)
+        os.makedirs(os.path.join(self.directory, key[:2]), exist_ok=True)
+        if title is not None:
+            title_file = os.path.join(self.directory, key[:2], key + self.TITLE_SUFFIX)
+            with open(title_file + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(title)
+            os.replace(title_file + '.tmp', title_file)
+        link_file(path, os.path.join(self.directory, key[:2], key + os.path.splitext(path)[1]))
+        with self.lock:
+            self.added += 1
+
+    def title(self, blob):
+        try:
+            with open(blob.rsplit('.', 1)[0] + self.TITLE_SUFFIX, encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def link(self, blob, target):
+        method = link_file(blob, target)
+        with self.lock:
+            self.linked += 1
+            self.bytes_saved += os.path.getsize(blob)
+        return method
+
+    def stats(self):
+        with self.lock:
+            return {'enabled': self.enabled, 'linked': self.linked, 'added': self.added, 'bytes_saved': self.bytes_saved}
+
+    def collect_garbage(self, grace_seconds=None):
+        grace_seconds = self.GRACE_SECONDS if grace_seconds is None else grace_seconds
+        referenced = {self.key(video_id, format_key)
+                      for video_id, format_key, path in get_download_index().rows() if os.path.exists(path)}
+        summary = {'blobs': 0, 'removed': 0, 'freed_bytes': 0}
+        if not os.path.isdir(self.directory):
+            return summary
+        for prefix in os.listdir(self.directory):
+            folder = os.path.join(self.directory, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                stat = os.stat(path)
+                # ctime instead of mtime, yt-dlp sets the mtime of a download to the upload date
+                if name.split('.')[0] in referenced or time.time() - stat.st_ctime < grace_seconds:
+                    summary['blobs'] += not name.endswith(self.TITLE_SUFFIX)
+                    continue
+                os.remove(path)
+                if name.endswith(self.TITLE_SUFFIX):
+                    continue  # Goes with its blob, not counted on its own
+                summary['blobs'] += 1
+                summary['removed'] += 1
+                # A hardlinked blob only frees its blocks when the last other link is gone too
+                if stat.st_nlink == 1:
+                    summary['freed_bytes'] += stat.st_size
+        return summary
+
+
+_media_store = None
+_media_store_lock = threading.Lock()
+
+
+def get_media_store(**kwargs):
+    global _media_store
+    with _media_store_lock:
+        if _media_store is None:
+            _media_store = MediaStore(**kwargs)
+        return _media_store
+
+
+def link_from_media_store(entry, format_key, save_location, ydl_opts):
+    # Names the link the way yt-dlp would have named the download, with the stored file's extension.
+    # Flat listings can carry another title than the full extraction downloads are named after, so the
+    # title stored with the blob wins, then the one in the metadata cache.
+    store = get_media_store()
+    blob = store.find(entry.get('id'), format_key)
+    if blob is None:
+        return None
+    title = store.title(blob)
+    if title is None:
+        info_dict = get_metadata_cache().get(entry_url(entry))
+        title = (info_dict or entry).get('title')
+    with checkout_youtube_dl(ydl_opts) as ydl:
+        target = ydl.prepare_filename(dict(entry, title=title, ext=os.path.splitext(blob)[1][1:]))
+    method = store.link(blob, target)
+    get_download_index().record(entry['id'], format_key, save_location, target)
+    log.info("Linked %s from the media store (%s)", target, method)
+    return target
+
+
+class JobCheckpoint:
+    # Manifest of one running job under CACHE_DIR/jobs. It records the stage the job reached, the byte
+    # offset of every transfer and the state of every ffmpeg rewrite, so a job cut off by a crash can be
+    # picked up again: transfers continue from their .part file with range requests and interrupted
+    # postprocessing is rolled back or completed.
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.lock = threading.Lock()
+        self.last_saved = 0
+
+    @property
+    def kind(self):
+        return self.data['kind']
+
+    @property
+    def params(self):
+        return self.data['params']
+
+    def set_stage(self, stage):
+        with self.lock:
+            self.data['stage'] = stage
+            self._save()
+
+    def instrument(self, ydl_opts):
+        # yt-dlp only sends a range request for an existing .part file when continuedl is set
+        ydl_opts['continuedl'] = True
+        ydl_opts['progress_hooks'] = list(ydl_opts.get('progress_hooks') or []) + [self.progress_hook]
+        return ydl_opts
+
+    def progress_hook(self, d):
+        filename = d.get('filename')
+        with self.lock:
+            transfers = self.data['transfers']
+            if d['status'] == 'downloading':
+                transfers[filename] = {
+                    'part_file': d.get('tmpfilename') or filename,
+                    'downloaded_bytes': d.get('downloaded_bytes') or 0,
+                    'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate'),
+                }
+                # Byte offsets change constantly, writing them once a second is plenty to resume from
+                if time.monotonic() - self.last_saved >= 1:
+                    self._save()
+            elif d['status'] == 'finished' and transfers.pop(filename, None) is not None:
+                self._save()
+
+    def start_postprocess(self, media_file, temporary_file):
+        self._set_postprocess(media_file, {'state': 'running', 'temporary': temporary_file})
+
+    def commit_postprocess(self, media_file, temporary_file):
+        # ffmpeg is done, from here on a restart finishes the swap instead of throwing the output away
+        self._set_postprocess(media_file, {'state': 'commit', 'temporary': temporary_file})
+
+    def finish_postprocess(self, media_file):
+        self._set_postprocess(media_file, {'state': 'done', 'size': os.path.getsize(media_file)})
+
+    def forget_postprocess(self, media_file):
+        # Files in the download index are skipped when the job resumes, their state would only grow
+        # the manifest, which is rewritten on every change
+        with self.lock:
+            if media_file not in self.data['postprocess']:
+                return
+        self._set_postprocess(media_file, None)
+
+    def postprocess_done(self, media_file):
+        state = self.data['postprocess'].get(media_file)
+        return (state is not None and state['state'] == 'done' and os.path.exists(media_file)
+                and os.path.getsize(media_file) == state['size'])
+
+    def recover(self):
+        # Runs once before a resumed job starts again
+        for filename, transfer in self.data['transfers'].items():
+            if os.path.exists(transfer['part_file']):
+                log.info("Resuming %s from byte %d (checkpoint at %d)",
+                         filename, os.path.getsize(transfer['part_file']), transfer['downloaded_bytes'])
+        for media_file, state in list(self.data['postprocess'].items()):
+            temporary_file = state.get('temporary')
+            if state['state'] == 'commit' and os.path.exists(temporary_file):
+                log.info("Completing interrupted postprocessing of %s", media_file)
+                os.replace(temporary_file, media_file)
+                self.finish_postprocess(media_file)
+            elif state['state'] == 'running':
+                log.info("Rolling back interrupted postprocessing of %s", media_file)
+                if os.path.exists(temporary_file):
+                    os.remove(temporary_file)
+                self._set_postprocess(media_file, None)
+        return self
+
+    def finish(self):
+        # Jobs that ran to the end, successful or not, have nothing left to resume
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _set_postprocess(self, media_file, state):
+        with self.lock:
+            if state is None:
+                self.data['postprocess'].pop(media_file, None)
+            else:
+                self.data['postprocess'][media_file] = state
+            self._save()
+
+    def _save(self):
+        self.data['updated_at'] = time.time()
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f)
+        os.replace(temporary_path, self.path)  # A crash mid-write must not leave half a manifest
+        self.last_saved = time.monotonic()
+
+
+class CheckpointStore:
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(CACHE_DIR, 'jobs')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def create(self, kind, params):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        checkpoint = JobCheckpoint(os.path.join(self.directory, job_id + '.json'), {
+            'id': job_id,
+            'kind': kind,
+            'params': params,
+            'stage': 'queued',
+            'created_at': now,
+            'transfers': {},
+            'postprocess': {},
+        })
+        checkpoint.set_stage('queued')
+        return checkpoint
+
+    def pending(self):
+        checkpoints = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    checkpoints.append(JobCheckpoint(path, json.load(f)))
+            except (OSError, ValueError) as e:
+                log.warning("Dropping unreadable job checkpoint %s: %s", path, e)
+                os.remove(path)
+        return sorted(checkpoints, key=lambda checkpoint: checkpoint.data['created_at'])
+
+
+_checkpoint_store = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store(**kwargs):
+    global _checkpoint_store
+    with _checkpoint_store_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = CheckpointStore(**kwargs)
+        return _checkpoint_store
+
+
+def resume_downloader(checkpoint, progress_callback, reporter=None):
+    # Rebuilds the downloader of an interrupted job and returns the callable that runs it
+    params = dict(checkpoint.params, progress_callback=progress_callback, reporter=reporter, checkpoint=checkpoint)
+    try:
+        checkpoint.recover()
+        if checkpoint.kind == 'video':
+            return VideoDownloader(**params).download_video
+        if checkpoint.kind == 'audio':
+            return AudioDownloader(**params).download_audio
+        if checkpoint.kind == 'playlist':
+            return PlaylistDownloader(**params).download_playlist
+        if checkpoint.kind == 'harvest':
+            return MetadataHarvester(**params).harvest
+        return AudioPlaylistDownloader(**params).download_playlist
+    except (OSError, KeyError, TypeError):
+        checkpoint.finish()  # A manifest that can't be resumed would otherwise come back on every start
+        raise
+
+
+VTT_TIMING = re.compile(r'^((?:\d+:)?\d{2}:\d{2}\.\d{3})\s+-->\s+((?:\d+:)?\d{2}:\d{2}\.\d{3})')
+VTT_TAG = re.compile(r'<(?!/?[biu]>)[^>]*>')  # Every tag except the <b>, <i> and <u> that SRT understands
+VTT_ROLLING_TAG = re.compile(r'</?c[.>]|<\d+:\d{2}[:.]')  # Inline word timing of YouTube auto captions
+VTT_ROLLING_SETTINGS = re.compile(r'\balign:start\b.*\bposition:0%')
+VTT_ADJACENT_SECONDS = 0.05
+
+
+def vtt_timestamp_to_srt(timestamp):
+    if timestamp.count(':') == 1:
+        timestamp = '00:' + timestamp
+    hours, minutes, seconds = timestamp.split(':')
+    return f"{int(hours):02d}:{minutes}:{seconds.replace('.', ',')}"
+
+
+def vtt_timestamp_seconds(timestamp):
+    seconds = 0.0
+    for part in timestamp.split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def iter_vtt_cues(lines):
+    # Yields (start, end, text lines) one cue at a time, so memory use does not depend on the file size.
+    # YouTube auto captions roll: every cue repeats the line shown before it, and short transition cues
+    # repeat it once more. Only in those cues, recognised by their inline <c> and timestamp tags or their
+    # "align:start position:0%" settings, lines already on screen in the cue right before are dropped.
+    # Manual captions keep every cue, even when the same text is repeated.
+    previous_text = []
+    previous_end = None
+    timing = None
+    rolling = False
+    text = []
+    in_header = True
+    skipping_block = False
+
+    def finish_cue():
+        nonlocal previous_text, previous_end
+        adjacent = previous_end is not None and timing[2] - previous_end <= VTT_ADJACENT_SECONDS
+        if rolling and adjacent:
+            new_text = [line for line in text if line not in previous_text]
+        else:
+            new_text = text
+        if text:
+            previous_text = text if rolling else []
+            previous_end = timing[3]
+        if new_text:
+            return (timing[0], timing[1], new_text)
+        return None
+
+    for line in itertools.chain(lines, ['']):
+        line = line.rstrip('\r\n').lstrip('\ufeff')
+        # Only an empty line ends a cue, auto captions put a " " placeholder line before the text
+        if not line:
+            if timing:
+                cue = finish_cue()
+                if cue:
+                    yield cue
+            timing, text, in_header, skipping_block, rolling = None, [], False, False, False
+            continue
+        if in_header or skipping_block:
+            continue
+        if timing is None:
+            match = VTT_TIMING.match(line)
+            if match:
+                # Cue settings such as "align:start position:0%" after the timestamps are dropped
+                timing = (vtt_timestamp_to_srt(match.group(1)), vtt_timestamp_to_srt(match.group(2)),
+                          vtt_timestamp_seconds(match.group(1)), vtt_timestamp_seconds(match.group(2)))
+                rolling = bool(VTT_ROLLING_SETTINGS.search(line[match.end():]))
+            elif line.startswith(('NOTE', 'STYLE', 'REGION')):
+                skipping_block = True
+            continue
+        if VTT_ROLLING_TAG.search(line):
+            rolling = True
+        cleaned = html.unescape(VTT_TAG.sub('', line)).strip()
+        if cleaned:
+            text.append(cleaned)
+
+
+def convert_vtt_file_to_srt(vtt_file, srt_file):
+    with open(vtt_file, encoding='utf-8-sig') as source:
+        first_line = source.readline()
+        if not first_line.startswith('WEBVTT'):
+            raise ValueError(f"{vtt_file} is not a WebVTT file")
+        with open(srt_file, 'w', encoding='utf-8') as target:
+            return write_srt_cues(iter_vtt_cues(source), target)
+
+
+def write_srt_cues(cues, target):
+    count = 0
+    for count, (start, end, text) in enumerate(cues, start=1):
+        target.write(f"{count}\n{start} --> {end}\n" + '\n'.join(text) + '\n\n')
+    return count
+
+
+# Default of --sub-langs, yt-dlp language codes or regexes like "en.*", "all" takes every language
+SUBTITLE_LANGUAGES = ['en']
+
+
+def parse_subtitle_languages(text):
+    languages = [language.strip() for language in (text or '').split(',') if language.strip()]
+    return languages or list(SUBTITLE_LANGUAGES)
+
+
+def subtitle_options(languages):
+    # Uploaded subtitles first, automatic captions for the languages that have none
+    return {
+        'writesubtitles': True,
+        'subtitleslangs': list(languages),
+        'subtitlesformat': 'vtt',
+        'writeautomaticsub': True,
+    }
+
+
+def downloaded_subtitles(info_dict):
+    # yt-dlp notes where it wrote every requested language, <media name>.<language>.vtt
+    for language, subtitle in (info_dict.get('requested_subtitles') or {}).items():
+        path = subtitle.get('filepath')
+        if path and path.endswith('.vtt') and os.path.exists(path):
+            yield language, path
+
+
+def subtitle_language_code(language):
+    # ffmpeg tags subtitle streams with ISO 639-2 codes, en-US becomes eng
+    return yt_dlp.utils.ISO639Utils.short2long(language.split('-')[0]) or 'und'
+
+
+# Which side streams each output container can carry, and the subtitle codec it needs
+SUBTITLE_CODECS = {'.mp4': 'mov_text', '.m4a': 'mov_text', '.mov': 'mov_text', '.mkv': 'srt', '.webm': 'webvtt'}
+COVER_CONTAINERS = {'.mp3', '.m4a', '.flac'}
+
+
+class PostprocessPlan:
+    # Collects everything that has to be added to a downloaded file (subtitles, cover art, metadata)
+    # and writes the final container with a single ffmpeg run instead of one remux per side stream.
+    def __init__(self, media_file):
+        self.media_file = media_file
+        self.extension = os.path.splitext(media_file)[1].lower()
+        self.subtitles = []
+        self.cover = None
+        self.cover_file = None
+        self.metadata = {}
+
+    def add_subtitles(self, path, language):
+        # Containers without subtitle support keep the file as a sidecar next to the media
+        if self.extension in SUBTITLE_CODECS:
+            self.subtitles.append((path, language))
+
+    def set_cover(self, path):
+        self.cover_file = path
+        if self.extension in COVER_CONTAINERS:
+            self.cover = path
+
+    def add_metadata_from_info(self, info_dict):
+        for key, field in (('title', 'title'), ('artist', 'uploader'), ('comment', 'webpage_url')):
+            if info_dict.get(field):
+                self.metadata[key] = str(info_dict[field])
+        if info_dict.get('upload_date'):
+            self.metadata['date'] = info_dict['upload_date'][:4]
+
+    def is_empty(self):
+        # Metadata alone is not worth rewriting the whole file for
+        return not self.subtitles and not self.cover
+
+    def temporary_file(self):
+        return os.path.splitext(self.media_file)[0] + '.postprocess' + self.extension
+
+    def build_command(self, output_file):
+        command = [get_ffmpeg_path(), '-y', '-i', self.media_file]
+        for path, _ in self.subtitles:
+            command += ['-i', path]
+        if self.cover:
+            command += ['-i', self.cover]
+
+        command += ['-map', '0']
+        for index in range(len(self.subtitles)):
+            command += ['-map', str(index + 1)]
+        if self.cover:
+            command += ['-map', str(len(self.subtitles) + 1)]
+        command += ['-c', 'copy']
+
+        for index, (_, language) in enumerate(self.subtitles):
+            command += [f'-c:s:{index}', SUBTITLE_CODECS[self.extension], f'-metadata:s:s:{index}', f'language={language}']
+        if self.cover:
+            if self.extension == '.mp3':
+                command += ['-id3v2_version', '3']
+            command += ['-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)',
+                        '-disposition:v', 'attached_pic']
+        for key, value in self.metadata.items():
+            command += ['-metadata', f'{key}={value}']
+        return command + [output_file]
+
+    def run(self, checkpoint=None):
+        if checkpoint and checkpoint.postprocess_done(self.media_file):
+            log.info("Postprocessing of %s already finished before the restart", self.media_file)
+            return
+        output_file = self.temporary_file()
+        command = self.build_command(output_file)
+        log.debug("Running command: %s", ' '.join(command))
+        try:
+            if checkpoint:
+                checkpoint.start_postprocess(self.media_file, output_file)
+            with get_job_manager().postprocess_lane:
+                subprocess.run(command, check=True, capture_output=True, text=True)
+            if checkpoint:
+                checkpoint.commit_postprocess(self.media_file, output_file)
+            os.replace(output_file, self.media_file)  # Swap the finished file in for the original
+            if checkpoint:
+                checkpoint.finish_postprocess(self.media_file)
+        finally:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+
+    def remove_cover(self):
+        if self.cover_file and os.path.exists(self.cover_file):
+            os.remove(self.cover_file)
+
+
+def run_measured(command):
+    # subprocess.run with the child reaped through os.wait4, which also returns the CPU time it used.
+    # Platforms without wait4 only get the wall time.
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    with process.stderr:
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        cpu_seconds = usage.ru_utime + usage.ru_stime
+    else:
+        process.wait()
+        cpu_seconds = None
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+    return cpu_seconds
+
+
+# CPU seconds per second of audio of a single threaded encode at the quality the audio jobs use
+ENCODE_CPU_RATES = {'mp3': 0.02, 'm4a': 0.02, 'opus': 0.015, 'vorbis': 0.02, 'flac': 0.005, 'wav': 0.002}
+
+
+class TranscodeTask:
+    def __init__(self, command):
+        self.command = command
+        self.cpu_seconds = None
+        self.wall_seconds = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class TranscodePool:
+    # CPU heavy encodes run on workers of their own, one ffmpeg per core, instead of on the thread
+    # that downloaded the file, so they never hold a network slot and never outnumber the cores.
+    # The queue in front of the workers is bounded: once it is full, submit blocks, which pushes
+    # back on the postprocessing stage and through it on the downloads.
+    def __init__(self, workers=None, queue_size=None):
+        self.workers = workers or os.cpu_count() or 2
+        self._queue = queue.Queue(maxsize=queue_size or self.workers)
+        self._threads = []
+        self.lock = threading.Lock()
+        self.transcodes = 0
+        self.failed = 0
+        self.cpu_seconds = 0.0
+        self.encoded_media = {}  # codec -> [CPU seconds, seconds of audio]
+        self.copies = 0
+        self.cpu_seconds_saved = 0.0
+
+    def submit(self, command):
+        with self.lock:
+            # Started by the first transcode, most runs never need them
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"transcode-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        task = TranscodeTask(command)
+        self._queue.put(task)
+        return task
+
+    def run(self, command):
+        task = self.submit(command)
+        task.done.wait()
+        if task.error:
+            raise task.error
+        return task
+
+    def record_encode(self, codec, cpu_seconds, media_seconds):
+        if cpu_seconds is None or not media_seconds:
+            return
+        with self.lock:
+            totals = self.encoded_media.setdefault(codec, [0.0, 0.0])
+            totals[0] += cpu_seconds
+            totals[1] += media_seconds
+
+    def record_copy(self, codec, media_seconds):
+        # Returns the CPU time an encode of the same length would have taken, from the encodes this
+        # pool has timed or, before the first one, from a typical rate for the codec
+        with self.lock:
+            cpu_seconds, measured_seconds = self.encoded_media.get(codec, (0.0, 0.0))
+            rate = cpu_seconds / measured_seconds if measured_seconds else ENCODE_CPU_RATES.get(codec, 0.0)
+            saved = rate * (media_seconds or 0)
+            self.copies += 1
+            self.cpu_seconds_saved += saved
+        return saved
+
+    def stats(self):
+        with self.lock:
+            return {'workers': self.workers, 'transcodes': self.transcodes, 'failed': self.failed,
+                    'cpu_seconds': round(self.cpu_seconds, 3), 'stream_copies': self.copies,
+                    'cpu_seconds_saved': round(self.cpu_seconds_saved, 3)}
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            started = time.perf_counter()
+            try:
+                log.debug("Running command: %s", ' '.join(task.command))
+                task.cpu_seconds = run_measured(task.command)
+            except (OSError, subprocess.CalledProcessError) as e:
+                task.error = e
+            task.wall_seconds = time.perf_counter() - started
+            with self.lock:
+                self.transcodes += 1
+                self.failed += task.error is not None
+                self.cpu_seconds += task.cpu_seconds or 0.0
+            task.done.set()
+
+
+_transcode_pool = None
+_transcode_pool_lock = threading.Lock()
+
+
+def get_transcode_pool(**kwargs):
+    global _transcode_pool
+    with _transcode_pool_lock:
+        if _transcode_pool is None:
+            _transcode_pool = TranscodePool(**kwargs)
+        return _transcode_pool
+
+
+class SegmentedHttpDownloaderMixin:
+    # Downloads one progressive file over several connections, each fetching its own byte ranges into
+    # the right place of the .part file. The connection count starts at two and grows while another
+    # connection still raises the measured throughput, so per-connection throttling is worked around
+    # without opening more connections than the link needs. Servers without range support fall back
+    # to the normal single connection download.
+    FD_NAME = 'segmented'
+    MIN_SEGMENT_SIZE = 1024 * 1024
+    MAX_SEGMENT_SIZE = 32 * 1024 * 1024
+    SEGMENT_RETRIES = 3
+    GROWTH_THRESHOLD = 1.1  # A new connection has to add at least 10% throughput to be kept
+
+    def real_download(self, filename, info_dict):
+        max_connections = self.params.get('segmented_connections') or 1
+        headers = dict(info_dict.get('http_headers') or {}, **{'Accept-Encoding': 'identity'})
+        size = self._probe_size(info_dict['url'], headers)
+        tmpfilename = self.temp_name(filename)
+        if max_connections < 2 or not size or size < 2 * self.MIN_SEGMENT_SIZE:
+            if os.path.exists(tmpfilename + '.segments'):
+                # A .part file with holes in it can't be continued front to back
+                os.remove(tmpfilename + '.segments')
+                os.remove(tmpfilename)
+            return super().real_download(filename, info_dict)
+
+        segment_size = min(max(size // (max_connections * 4), self.MIN_SEGMENT_SIZE), self.MAX_SEGMENT_SIZE)
+        done = self._load_finished_segments(tmpfilename, size, segment_size)
+        transfer = SegmentedTransfer(self, info_dict['url'], headers, tmpfilename, size, segment_size, done)
+        transfer.run(max_connections, lambda: self._report(transfer, filename, tmpfilename, info_dict))
+
+        os.remove(transfer.state_file)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - transfer.started,
+            'ctx_id': info_dict.get('ctx_id'),
+        }, info_dict)
+        return True
+
+    def _probe_size(self, url, headers):
+        # A one byte range request tells both the size and whether the server honours ranges
+        try:
+            response = self.ydl.urlopen(yt_dlp.networking.Request(url, headers=dict(headers, Range='bytes=0-0')))
+        except yt_dlp.networking.exceptions.RequestError:
+            return None
+        try:
+            match = re.match(r'bytes 0-0/(\d+)', response.headers.get('Content-Range') or '')
+            return int(match.group(1)) if response.status == 206 and match else None
+        finally:
+            response.close()
+
+    def _load_finished_segments(self, tmpfilename, size, segment_size):
+        if not self.params.get('continuedl', True) or not os.path.isfile(tmpfilename):
+            return set()
+        state_file = tmpfilename + '.segments'
+        if not os.path.exists(state_file):
+            # Only a .part file that never had segment state was written front to back by a single connection
+            return set(range(os.path.getsize(tmpfilename) // segment_size))
+        try:
+            with open(state_file, encoding='utf-8') as f:
+                state = json.load(f)
+            if state['size'] == size and state['segment_size'] == segment_size:
+                return set(state['done'])
+            if state['size'] == size:
+                # Another connection count splits the file differently, the finished byte ranges still hold
+                return remap_segments(state['done'], state['segment_size'], segment_size, size)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        # The .part file is allocated to its full size up front, its size says nothing about what was
+        # written. Without usable state the download starts over.
+        log.info("Discarding %s, its segment state doesn't match the download", tmpfilename)
+        os.remove(state_file)
+        os.remove(tmpfilename)
+        return set()
+
+    def _report(self, transfer, filename, tmpfilename, info_dict):
+        elapsed = time.time() - transfer.started
+        speed = transfer.fetched / elapsed if elapsed else None
+        self._hook_progress({
+            'status': 'downloading',
+            'downloaded_bytes': transfer.downloaded,
+            'total_bytes': transfer.size,
+            'tmpfilename': tmpfilename,
+            'filename': filename,
+            'eta': (transfer.size - transfer.downloaded) / speed if speed else None,
+            'speed': speed,
+            'elapsed': elapsed,
+            'ctx_id': info_dict.get('ctx_id'),
+            'segmented': True,  # Already charged to the bandwidth governor by the connections themselves
+        }, info_dict)
+
+
+def remap_segments(done, old_segment_size, segment_size, size):
+    # The new segments lying completely inside byte ranges that were finished with the old segment size
+    ranges = []
+    for index in sorted(done):
+        start, end = index * old_segment_size, min((index + 1) * old_segment_size, size)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    remapped = set()
+    for start, end in ranges:
+        first = (start + segment_size - 1) // segment_size
+        for index in range(first, (size + segment_size - 1) // segment_size):
+            if min((index + 1) * segment_size, size) > end:
+                break
+            remapped.add(index)
+    return remapped
+
+
+class SegmentedTransfer:
+    # The shared state of one segmented download: the segments still to fetch, the workers fetching
+    # them and the bytes written so far.
+    def __init__(self, downloader, url, headers, tmpfilename, size, segment_size, done):
+        self.downloader = downloader
+        self.url = url
+        self.headers = headers
+        self.tmpfilename = tmpfilename
+        self.state_file = tmpfilename + '.segments'
+        self.size = size
+        self.segment_size = segment_size
+        self.done = set(done)
+        self.segment_count = (size + segment_size - 1) // segment_size
+        self.pending = queue.Queue()
+        for index in range(self.segment_count):
+            if index not in self.done:
+                self.pending.put(index)
+        self.bandwidth = downloader.params.get('bandwidth_share')
+        self.downloaded = sum(self._segment_range(index)[1] - self._segment_range(index)[0] + 1 for index in self.done)
+        self.fetched = 0
+        self.connections = 0
+        self.target_connections = 0
+        self.error = None
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.started = time.time()
+
+    def run(self, max_connections, report, interval=1.0):
+        # State first: once the file is truncated to its full size, its size no longer tells the progress
+        self._save_state()
+        with open(self.tmpfilename, 'r+b' if os.path.exists(self.tmpfilename) else 'wb') as f:
+            f.truncate(self.size)
+        workers = []
+        growing, last_rate, last_fetched = True, None, 0
+        self._add_worker(workers, extra_slot=False)
+        self._add_worker(workers)
+        while not self.finished.wait(interval):
+            report()
+            with self.lock:
+                rate, last_fetched = (self.fetched - last_fetched) / interval, self.fetched
+            # Hill climbing: keep adding connections while each one still pays off, drop the last one
+            # once it doesn't
+            if growing and (last_rate is None or rate > last_rate * self.downloader.GROWTH_THRESHOLD):
+                last_rate = rate
+                if self.connections < max_connections:
+                    self._add_worker(workers)
+            elif growing:
+                growing = False
+                with self.lock:
+                    self.target_connections = max(1, self.target_connections - 1)
+        for worker in workers:
+            worker.join()
+        if self.error:
+            raise self.error
+        if len(self.done) < self.segment_count:
+            raise yt_dlp.utils.ContentTooShortError(self.downloaded, self.size)
+        report()
+
+    def _add_worker(self, workers, extra_slot=True):
+        # Connections beyond the first take their own network slot so the global limit still holds
+        if extra_slot and not get_job_manager().network_lane.acquire(blocking=False):
+            return
+        with self.lock:
+            self.connections += 1
+            self.target_connections = self.connections
+        worker = threading.Thread(target=self._work, args=(extra_slot,), name=f"segment-{len(workers)}", daemon=True)
+        workers.append(worker)
+        worker.start()
+
+    def _work(self, extra_slot):
+        try:
+            with open(self.tmpfilename, 'r+b') as f:
+                while not self.finished.is_set():
+                    with self.lock:
+                        if self.connections > self.target_connections:
+                            break
+                    try:
+                        index = self.pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    self._fetch_segment(f, index)
+        except Exception as e:
+            with self.lock:
+                self.error = self.error or e
+            self.finished.set()
+        finally:
+            with self.lock:
+                self.connections -= 1
+                if self.connections == 0 or len(self.done) == self.segment_count:
+                    self.finished.set()
+            if extra_slot:
+                get_job_manager().network_lane.release()
+
+    def _fetch_segment(self, f, index):
+        start, end = self._segment_range(index)
+        for attempt in range(self.downloader.SEGMENT_RETRIES):
+            position = start
+            try:
+                response = self.downloader.ydl.urlopen(yt_dlp.networking.Request(self.url, headers=dict(self.headers, Range=f'bytes={start}-{end}')))
+                try:
+                    if response.status != 206:
+                        raise yt_dlp.utils.ContentTooShortError(0, end - start + 1)
+                    while position <= end:
+                        data = response.read(min(64 * 1024, end - position + 1))
+                        if not data:
+                            raise yt_dlp.utils.ContentTooShortError(position - start, end - start + 1)
+                        f.seek(position)
+                        f.write(data)
+                        position += len(data)
+                        with self.lock:
+                            self.downloaded += len(data)
+                            self.fetched += len(data)
+                        if self.bandwidth:
+                            self.bandwidth.consume(len(data))
+                finally:
+                    response.close()
+                break
+            except (OSError, yt_dlp.networking.exceptions.RequestError, yt_dlp.utils.ContentTooShortError) as e:
+                with self.lock:
+                    self.downloaded -= position - start  # The segment is fetched again from its start
+                if attempt + 1 == self.downloader.SEGMENT_RETRIES:
+                    raise
+                log.debug("Retrying segment %d of %s: %s", index, self.tmpfilename, e)
+        f.flush()
+        with self.lock:
+            self.done.add(index)
+            self._save_state()
+
+    def _segment_range(self, index):
+        start = index * self.segment_size
+        return start, min(start + self.segment_size, self.size) - 1
+
+    def _save_state(self):
+        # Lets a resumed job skip the segments it already has
+        temporary_path = self.state_file + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump({'size': self.size, 'segment_size': self.segment_size, 'done': sorted(self.done)}, f)
+        os.replace(temporary_path, self.state_file)
+
+
+class HorizonYoutubeDLMixin:
+    # Sends progressive http(s) downloads through SegmentedHttpDownloader when the segmented_connections
+    # option asks for more than one connection. Fragmented formats (DASH, HLS) already fetch their
+    # fragments in parallel through concurrent_fragment_downloads.
+    def dl(self, name, info, subtitle=False, test=False):
+        if ((self.params.get('segmented_connections') or 1) < 2 or subtitle or test or name == '-'
+                or not info.get('url') or yt_dlp.utils.determine_protocol(info) not in ('http', 'https')):
+            return super().dl(name, info, subtitle, test)
+        downloader = SegmentedHttpDownloader(self, self.params)
+        for hook in self._progress_hooks:
+            downloader.add_progress_hook(hook)
+        info = self._copy_infodict(info)
+        if info.get('http_headers') is None:
+            info['http_headers'] = self._calc_headers(info)
+        return downloader.download(name, info, subtitle)
+
+
+class PooledExtractAudioMixin:
+    # FFmpegExtractAudioPP still decides between stream copy and re-encoding and names the files,
+    # only its ffmpeg run goes to the transcode pool, which also measures the CPU time it takes
+    metrics = None
+
+    @classmethod
+    def pp_key(cls):
+        return 'ExtractAudio'
+
+    def run(self, information):
+        self._media_seconds = information.get('duration')
+        self._encoded = False
+        files, information = super().run(information)
+        if not self._encoded:
+            # Copied into the target container, or already in it
+            saved = get_transcode_pool().record_copy(self.mapping, self._media_seconds)
+            log.info("Stream copied %s, saved about %.1f s of CPU time", information.get('filepath'), saved)
+            if self.metrics:
+                self.metrics.count_audio_conversion(True, saved)
+        return files, information
+
+    def run_ffmpeg(self, path, out_path, codec, more_opts):
+        self.check_version()
+        command = [self.executable, '-y', '-loglevel', 'error', '-i', self._ffmpeg_filename_argument(path), '-vn']
+        if codec:
+            command += ['-acodec', codec]
+        command += list(more_opts) + [self._ffmpeg_filename_argument(out_path)]
+        try:
+            task = get_transcode_pool().run(command)
+        except subprocess.CalledProcessError as e:
+            lines = (e.stderr or '').strip().splitlines()
+            raise yt_dlp.utils.PostProcessingError(f'audio conversion failed: {lines[-1] if lines else e}')
+        if codec != 'copy':
+            self._encoded = True
+            get_transcode_pool().record_encode(self.mapping, task.cpu_seconds, self._media_seconds)
+        if self.metrics:
+            self.metrics.add_span('transcode', task.wall_seconds, cpu_seconds=task.cpu_seconds)
+            if self._encoded:
+                self.metrics.count_audio_conversion(False)
+        mtime = os.stat(path).st_mtime
+        self.try_utime(out_path, mtime, mtime)
+
+
+# The yt-dlp based classes, built from the mixins above by load_yt_dlp
+SegmentedHttpDownloader = HorizonYoutubeDL = PooledExtractAudioPP = None
+
+# Audio jobs ask for a source already in the target codec, ffmpeg then only copies the stream into
+# the new container. Without one, the best audio is downloaded and encoded.
+AUDIO_SOURCE_FORMATS = {
+    'aac': 'bestaudio[acodec^=mp4a]/bestaudio',
+    'opus': 'bestaudio[acodec=opus]/bestaudio',
+    'mp3': 'bestaudio[acodec=mp3]/bestaudio',
+    'flac': 'bestaudio[acodec=flac]/bestaudio',
+}
+# yt-dlp copies AAC into an MP4 container for its m4a codec but into a raw ADTS stream for aac
+EXTRACT_AUDIO_CODECS = {'aac': 'm4a'}
+# Containers for merged video and audio in order of preference. yt-dlp takes the first one that holds
+# the chosen codecs as they are, so VP9/Opus go into webm instead of mp4 and the merge stays a copy.
+MERGE_OUTPUT_FORMATS = 'mp4/webm/mkv'
+
+
+def audio_format_selector(codec):
+    return AUDIO_SOURCE_FORMATS.get(codec, 'bestaudio')
+
+
+def create_extract_audio_pp(ydl, codec, metrics=None):
+    load_yt_dlp()
+    extract_audio = PooledExtractAudioPP(ydl, preferredcodec=EXTRACT_AUDIO_CODECS.get(codec, codec), preferredquality='0')
+    extract_audio.metrics = metrics
+    return extract_audio
+
+
+# Extractor classes tried before yt-dlp's own, the offline benchmarks register their stub extractor here
+EXTRA_INFO_EXTRACTORS = []
+
+
+def create_youtube_dl(ydl_opts):
+    load_yt_dlp()
+    if not EXTRA_INFO_EXTRACTORS:
+        return HorizonYoutubeDL(ydl_opts)
+    ydl = HorizonYoutubeDL(ydl_opts, auto_init=False)
+    for extractor in EXTRA_INFO_EXTRACTORS:
+        ydl.add_info_extractor(extractor())
+    ydl.add_default_info_extractors()
+    return ydl
+
+
+# Options that change from job to job and are swapped into a warm instance on every checkout
+PER_JOB_YDL_OPTIONS = {'outtmpl', 'progress_hooks', 'postprocessor_hooks', 'logger', 'continuedl',
+                       'segmented_connections', 'concurrent_fragment_downloads', 'bandwidth_share'}
+
+
+class YoutubeDLPool:
+    # Warm YoutubeDL instances keyed by the options they were built with. A new instance pays for
+    # extractor setup, cookie loading and a fresh request director (and with it new connections) on
+    # every job; a pooled one only gets the per job options of PER_JOB_YDL_OPTIONS swapped in. An
+    # instance is used by one thread at a time, checkout hands it out exclusively.
+    def __init__(self, max_idle_per_key=4, max_idle_seconds=300):
+        self.max_idle_per_key = max_idle_per_key
+        self.max_idle_seconds = max_idle_seconds
+        self.lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+        self.reused = 0
+
+    @contextlib.contextmanager
+    def checkout(self, ydl_opts):
+        key = json.dumps({k: v for k, v in ydl_opts.items() if k not in PER_JOB_YDL_OPTIONS}, sort_keys=True, default=repr)
+        ydl = self._take(key)
+        if ydl is None:
+            ydl = create_youtube_dl({k: v for k, v in ydl_opts.items() if k not in PER_JOB_YDL_OPTIONS})
+            with self.lock:
+                self.created += 1
+        self._apply(ydl, ydl_opts)
+        try:
+            yield ydl
+        finally:
+            self._apply(ydl, {})  # Don't keep the job's hooks and their closures alive
+            self._give_back(key, ydl)
+
+    def close(self):
+        with self.lock:
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for _, ydl in instances:
+                ydl.close()
+
+    def _take(self, key):
+        expired = []
+        try:
+            with self.lock:
+                instances = self._idle.get(key, [])
+                while instances:
+                    returned_at, ydl = instances.pop()
+                    if time.monotonic() - returned_at > self.max_idle_seconds:
+                        expired.append(ydl)  # Its connections have most likely been dropped by now
+                        continue
+                    self.reused += 1
+                    return ydl
+                return None
+        finally:
+            for ydl in expired:
+                ydl.close()
+
+    def _give_back(self, key, ydl):
+        with self.lock:
+            instances = self._idle.setdefault(key, [])
+            if len(instances) < self.max_idle_per_key:
+                instances.append((time.monotonic(), ydl))
+                return
+        ydl.close()
+
+    def _apply(self, ydl, ydl_opts):
+        for option in PER_JOB_YDL_OPTIONS - {'outtmpl', 'progress_hooks', 'postprocessor_hooks'}:
+            if option in ydl_opts:
+                ydl.params[option] = ydl_opts[option]
+            else:
+                ydl.params.pop(option, None)
+        ydl.params['outtmpl'] = {'default': ydl_opts['outtmpl']} if ydl_opts.get('outtmpl') else {}
+        ydl._parse_outtmpl()
+        ydl._progress_hooks = list(ydl_opts.get('progress_hooks') or [])
+        ydl._postprocessor_hooks = list(ydl_opts.get('postprocessor_hooks') or [])
+        # Postprocessors copy the hooks when they are added, so the ones built with the instance need them again
+        for postprocessors in ydl._pps.values():
+            for postprocessor in postprocessors:
+                postprocessor._progress_hooks = [postprocessor.report_progress] + ydl._postprocessor_hooks
+        ydl._num_downloads = 0
+        ydl._download_retcode = 0
+
+
+_youtube_dl_pool = None
+_youtube_dl_pool_lock = threading.Lock()
+
+
+def get_youtube_dl_pool(**kwargs):
+    global _youtube_dl_pool
+    with _youtube_dl_pool_lock:
+        if _youtube_dl_pool is None:
+            _youtube_dl_pool = YoutubeDLPool(**kwargs)
+        return _youtube_dl_pool
+
+
+def checkout_youtube_dl(ydl_opts):
+    return get_youtube_dl_pool().checkout(ydl_opts)
 
 
 def get_ffmpeg_path():
+    executable = 'ffmpeg.exe' if os.name == 'nt' else 'ffmpeg'
     if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, 'ffmpeg.exe')
+        return os.path.join(sys._MEIPASS, executable)
     else:
-        return 'ffmpeg.exe'
+        return executable
 class YouTubeDownloader:
     def __init__(self, root):
         self.root = root
@@ -505,24 +3679,45 @@ class YouTubeDownloader:
         self.root.geometry("720x480")
         self.apply_dark_theme()
 
+        self.label_font = ("Arial", 14)
+        self.entry_font = ("Arial", 12)
+        self.button_font = ("Arial", 12, "bold")
+        # Read by the playlist tabs, the Queue tab that shows the checkbox may never be opened
+        self.bounded_memory_var = tk.BooleanVar(value=False)
+
+        # Tabs are only built when they are first selected, the window shows up with just the first one
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(expand=1, fill='both')
-
-        self.video_download_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.video_download_frame, text='Video Download')
-        self.create_video_download_tab(self.video_download_frame)
-
-        self.audio_download_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.audio_download_frame, text='Audio Download')
-        self.create_audio_download_tab(self.audio_download_frame)
-
-        self.playlist_download_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.playlist_download_frame, text='Playlist Download')
-        self.create_playlist_download_tab(self.playlist_download_frame)
-
-        self.audio_playlist_download_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.audio_playlist_download_frame, text='Audio Playlist Download')
-        self.create_audio_playlist_download_tab(self.audio_playlist_download_frame)
+        self.tab_builders = {}
+        self.video_download_frame = self.add_tab('Video Download', self.create_video_download_tab)
+        self.audio_download_frame = self.add_tab('Audio Download', self.create_audio_download_tab)
+        self.playlist_download_frame = self.add_tab('Playlist Download', self.create_playlist_download_tab)
+        self.audio_playlist_download_frame = self.add_tab('Audio Playlist Download', self.create_audio_playlist_download_tab)
+        self.harvest_frame = self.add_tab('Subtitles & Metadata', self.create_harvest_tab)
+        self.queue_frame = self.add_tab('Queue', self.create_queue_tab)
+        self.notebook.bind('<<NotebookTabChanged>>', lambda event: self.build_tab(self.notebook.select()))
+        self.build_tab(self.notebook.select())
+
+        self.job_manager = get_job_manager()
+        self.progress_bus = ProgressBus(self.root, self.update_progress)
+        self.reporter = QueuedReporter(self.progress_bus)
+        self.progress_bus.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.refresh_queue()
+        # Checkpoints are read once the window is up, resuming them shouldn't hold back the first paint
+        self.root.after_idle(self.resume_interrupted_jobs)
+
+    def add_tab(self, text, builder):
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=text)
+        self.tab_builders[str(frame)] = (builder, frame)
+        return frame
+
+    def build_tab(self, frame):
+        # Safe to call any number of times, a tab is only built once
+        builder, frame = self.tab_builders.pop(str(frame), (None, frame))
+        if builder is not None:
+            builder(frame)
 
     def apply_dark_theme(self):
         # Set background for the root window
@@ -552,23 +3747,19 @@ class YouTubeDownloader:
 
 
     def create_video_download_tab(self, frame):
-        self.label_font = ("Arial", 14)
-        self.entry_font = ("Arial", 12)
-        self.button_font = ("Arial", 12, "bold")
-
         self.video_url_label = tk.Label(frame, text="Enter Video URL:", bg="#333", fg="#fff", font=self.label_font)
         self.video_url_label.pack(pady=6)
         self.video_url_entry = tk.Entry(frame, width=60, bg="#444", fg="#fff", insertbackground="#fff", font=self.entry_font)
         self.video_url_entry.pack(pady=6)
         self.create_context_menu(self.video_url_entry)
 
-        self.resolution_label = tk.Label(frame, text="Select Resolution:", bg="#333", fg="#fff", font=self.label_font)
-        self.resolution_label.pack(pady=6)
-        self.resolution_var = tk.StringVar(value='best')
-        self.resolutions = ['144p', '360p','480', '720p', '1080p', '1440p', '2160p (4K)', 'best']
-        self.resolution_menu = tk.OptionMenu(frame, self.resolution_var, *self.resolutions)
-        self.resolution_menu.config(bg="#444", fg="#fff", font=self.entry_font)
-        self.resolution_menu.pack(pady=6)
+        self.video_resolution_label = tk.Label(frame, text="Select Resolution:", bg="#333", fg="#fff", font=self.label_font)
+        self.video_resolution_label.pack(pady=6)
+        self.video_resolution_var = tk.StringVar(value='best')
+        self.video_resolutions = ['144p', '360p','480', '720p', '1080p', '1440p', '2160p (4K)', 'best']
+        self.video_resolution_menu = tk.OptionMenu(frame, self.video_resolution_var, *self.video_resolutions)
+        self.video_resolution_menu.config(bg="#444", fg="#fff", font=self.entry_font)
+        self.video_resolution_menu.pack(pady=6)
 
         self.video_save_location_button = tk.Button(
             frame, text="Choose Save Location", 
@@ -585,9 +3776,9 @@ class YouTubeDownloader:
         # Define the callback function
         def on_video_subtitle_toggle():
             if self.video_subtitle_var.get():
-                print("Video subtitle will be downloaded.")
+                log.debug("Video subtitle will be downloaded.")
             else:
-                print("Video subtitle will not be downloaded.")
+                log.debug("Video subtitle will not be downloaded.")
 
         # Create the checkbox with the callback
         self.video_subtitle_check = tk.Checkbutton(
@@ -602,6 +3793,15 @@ class YouTubeDownloader:
         )
         self.video_subtitle_check.pack(pady=6)
 
+        self.video_connections_label = tk.Label(frame, text="Connections per Stream:", bg="#333", fg="#fff", font=self.label_font)
+        self.video_connections_label.pack(pady=6)
+        self.video_connections_var = tk.IntVar(value=1)
+        self.video_connections_spinbox = tk.Spinbox(
+            frame, from_=1, to=16, width=5, textvariable=self.video_connections_var,
+            bg="#444", fg="#fff", font=self.entry_font
+        )
+        self.video_connections_spinbox.pack(pady=6)
+
         self.download_button = tk.Button(
             frame, text="Download", command=self.start_video_download_thread, bg="#555", fg="#fff", font=self.button_font
         )
@@ -613,23 +3813,19 @@ class YouTubeDownloader:
         self.video_progress_bar.pack(pady=12)
 
     def create_audio_download_tab(self, frame):
-        self.label_font = ("Arial", 14)
-        self.entry_font = ("Arial", 12)
-        self.button_font = ("Arial", 12, "bold")
-
         self.audio_url_label = tk.Label(frame, text="Enter Video URL:", bg="#333", fg="#fff", font=self.label_font)
         self.audio_url_label.pack(pady=6)
         self.audio_url_entry = tk.Entry(frame, width=60, bg="#444", fg="#fff", insertbackground="#fff", font=self.entry_font)
         self.audio_url_entry.pack(pady=6)
         self.create_context_menu(self.audio_url_entry)
 
-        self.codec_label = tk.Label(frame, text="Select Audio Codec:", bg="#333", fg="#fff", font=self.label_font)
-        self.codec_label.pack(pady=6)
-        self.codec_var = tk.StringVar(value='mp3')
-        self.codecs = ['mp3', 'aac', 'wav', 'flac']
-        self.codec_menu = tk.OptionMenu(frame, self.codec_var, *self.codecs)
-        self.codec_menu.config(bg="#444", fg="#fff", font=self.entry_font)
-        self.codec_menu.pack(pady=6)
+        self.audio_codec_label = tk.Label(frame, text="Select Audio Codec:", bg="#333", fg="#fff", font=self.label_font)
+        self.audio_codec_label.pack(pady=6)
+        self.audio_codec_var = tk.StringVar(value='mp3')
+        self.audio_codecs = ['mp3', 'aac', 'opus', 'wav', 'flac']
+        self.audio_codec_menu = tk.OptionMenu(frame, self.audio_codec_var, *self.audio_codecs)
+        self.audio_codec_menu.config(bg="#444", fg="#fff", font=self.entry_font)
+        self.audio_codec_menu.pack(pady=6)
 
         self.audio_save_location_button = tk.Button(
             frame, text="Choose Save Location",
@@ -646,9 +3842,9 @@ class YouTubeDownloader:
         # Define the callback function
         def on_audio_subtitle_toggle():
             if self.audio_subtitle_var.get():
-                print("Audio subtitle will be downloaded.")
+                log.debug("Audio subtitle will be downloaded.")
             else:
-                print("Audio subtitle will not be downloaded.")
+                log.debug("Audio subtitle will not be downloaded.")
 
         # Create the checkbox with the callback
         self.audio_subtitle_check = tk.Checkbutton(
@@ -663,12 +3859,12 @@ class YouTubeDownloader:
         )
         self.audio_subtitle_check.pack(pady=6)
 
-        self.poster_var = tk.BooleanVar(value=False)
-        self.poster_check = tk.Checkbutton(
-            frame, text="Include Video Poster", variable=self.poster_var, bg="#333", fg="#fff",
+        self.audio_poster_var = tk.BooleanVar(value=False)
+        self.audio_poster_check = tk.Checkbutton(
+            frame, text="Include Video Poster", variable=self.audio_poster_var, bg="#333", fg="#fff",
             selectcolor="#555", font=self.label_font
         )
-        self.poster_check.pack(pady=6)
+        self.audio_poster_check.pack(pady=6)
 
         self.download_button = tk.Button(
             frame, text="Download", command=self.start_audio_download_thread, bg="#555", fg="#fff", font=self.button_font
@@ -681,23 +3877,19 @@ class YouTubeDownloader:
         self.audio_progress_bar.pack(pady=12)
 
     def create_playlist_download_tab(self, frame):
-        self.label_font = ("Arial", 14)
-        self.entry_font = ("Arial", 12)
-        self.button_font = ("Arial", 12, "bold")
-
         self.playlist_url_label = tk.Label(frame, text="Enter YouTube Playlist URL:", bg="#333", fg="#fff", font=self.label_font)
         self.playlist_url_label.pack(pady=6)
         self.playlist_url_entry = tk.Entry(frame, width=60, bg="#444", fg="#fff", insertbackground="#fff", font=self.entry_font)
         self.playlist_url_entry.pack(pady=6)
         self.create_context_menu(self.playlist_url_entry)
 
-        self.resolution_label = tk.Label(frame, text="Select Resolution:", bg="#333", fg="#fff", font=self.label_font)
-        self.resolution_label.pack(pady=6)
-        self.resolution_var = tk.StringVar(value='best')
-        self.resolutions = ['144p', '360p','480', '720p', '1080p', '1440p', '2160p (4K)', 'best']
-        self.resolution_menu = tk.OptionMenu(frame, self.resolution_var, *self.resolutions)
-        self.resolution_menu.config(bg="#444", fg="#fff", font=self.entry_font)
-        self.resolution_menu.pack(pady=6)
+        self.playlist_resolution_label = tk.Label(frame, text="Select Resolution:", bg="#333", fg="#fff", font=self.label_font)
+        self.playlist_resolution_label.pack(pady=6)
+        self.playlist_resolution_var = tk.StringVar(value='best')
+        self.playlist_resolutions = ['144p', '360p','480', '720p', '1080p', '1440p', '2160p (4K)', 'best']
+        self.playlist_resolution_menu = tk.OptionMenu(frame, self.playlist_resolution_var, *self.playlist_resolutions)
+        self.playlist_resolution_menu.config(bg="#444", fg="#fff", font=self.entry_font)
+        self.playlist_resolution_menu.pack(pady=6)
 
         self.playlist_save_location_button = tk.Button(
             frame, text="Choose Save Location",
@@ -714,9 +3906,9 @@ class YouTubeDownloader:
         # Define the callback function
         def on_playlist_subtitle_toggle():
             if self.playlist_subtitle_var.get():
-                print("Playlist subtitles will be downloaded.")
+                log.debug("Playlist subtitles will be downloaded.")
             else:
-                print("Playlist subtitles will not be downloaded.")
+                log.debug("Playlist subtitles will not be downloaded.")
 
         # Create the checkbox with the callback
         self.playlist_subtitle_check = tk.Checkbutton(
@@ -731,6 +3923,15 @@ class YouTubeDownloader:
         )
         self.playlist_subtitle_check.pack(pady=6)
 
+        self.playlist_workers_label = tk.Label(frame, text="Parallel Downloads:", bg="#333", fg="#fff", font=self.label_font)
+        self.playlist_workers_label.pack(pady=6)
+        self.playlist_workers_var = tk.IntVar(value=3)
+        self.playlist_workers_spinbox = tk.Spinbox(
+            frame, from_=1, to=8, width=5, textvariable=self.playlist_workers_var,
+            bg="#444", fg="#fff", font=self.entry_font
+        )
+        self.playlist_workers_spinbox.pack(pady=6)
+
         self.playlist_download_button = tk.Button(
             frame, text="Download Playlist", command=self.start_playlist_download_thread, bg="#555", fg="#fff", font=self.button_font
         )
@@ -742,23 +3943,19 @@ class YouTubeDownloader:
         self.playlist_progress_bar.pack(pady=12)
 
     def create_audio_playlist_download_tab(self, frame):
-        self.label_font = ("Arial", 14)
-        self.entry_font = ("Arial", 12)
-        self.button_font = ("Arial", 12, "bold")
-
         self.audio_playlist_url_label = tk.Label(frame, text="Enter YouTube Playlist URL:", bg="#333", fg="#fff", font=self.label_font)
         self.audio_playlist_url_label.pack(pady=6)
         self.audio_playlist_url_entry = tk.Entry(frame, width=60, bg="#444", fg="#fff", insertbackground="#fff", font=self.entry_font)
         self.audio_playlist_url_entry.pack(pady=6)
         self.create_context_menu(self.audio_playlist_url_entry)
 
-        self.codec_label = tk.Label(frame, text="Select Audio Codec:", bg="#333", fg="#fff", font=self.label_font)
-        self.codec_label.pack(pady=6)
-        self.codec_var = tk.StringVar(value='mp3')
-        self.codecs = ['mp3', 'aac', 'wav', 'flac']
-        self.codec_menu = tk.OptionMenu(frame, self.codec_var, *self.codecs)
-        self.codec_menu.config(bg="#444", fg="#fff", font=self.entry_font)
-        self.codec_menu.pack(pady=6)
+        self.audio_playlist_codec_label = tk.Label(frame, text="Select Audio Codec:", bg="#333", fg="#fff", font=self.label_font)
+        self.audio_playlist_codec_label.pack(pady=6)
+        self.audio_playlist_codec_var = tk.StringVar(value='mp3')
+        self.audio_playlist_codecs = ['mp3', 'aac', 'opus', 'wav', 'flac']
+        self.audio_playlist_codec_menu = tk.OptionMenu(frame, self.audio_playlist_codec_var, *self.audio_playlist_codecs)
+        self.audio_playlist_codec_menu.config(bg="#444", fg="#fff", font=self.entry_font)
+        self.audio_playlist_codec_menu.pack(pady=6)
 
         self.audio_playlist_save_location_button = tk.Button(
             frame, text="Choose Save Location",
@@ -769,12 +3966,21 @@ class YouTubeDownloader:
 
         self.audio_playlist_save_location_var = tk.StringVar()
 
-        self.poster_var = tk.BooleanVar(value=False)
-        self.poster_check = tk.Checkbutton(
-            frame, text="Include Video Poster", variable=self.poster_var, bg="#333", fg="#fff",
+        self.audio_playlist_poster_var = tk.BooleanVar(value=False)
+        self.audio_playlist_poster_check = tk.Checkbutton(
+            frame, text="Include Video Poster", variable=self.audio_playlist_poster_var, bg="#333", fg="#fff",
             selectcolor="#555", font=self.label_font
         )
-        self.poster_check.pack(pady=6)
+        self.audio_playlist_poster_check.pack(pady=6)
+
+        self.audio_playlist_workers_label = tk.Label(frame, text="Parallel Downloads:", bg="#333", fg="#fff", font=self.label_font)
+        self.audio_playlist_workers_label.pack(pady=6)
+        self.audio_playlist_workers_var = tk.IntVar(value=3)
+        self.audio_playlist_workers_spinbox = tk.Spinbox(
+            frame, from_=1, to=8, width=5, textvariable=self.audio_playlist_workers_var,
+            bg="#444", fg="#fff", font=self.entry_font
+        )
+        self.audio_playlist_workers_spinbox.pack(pady=6)
 
         self.audio_playlist_download_button = tk.Button(
             frame, text="Download Playlist", command=self.start_audio_playlist_download_thread, bg="#555", fg="#fff", font=self.button_font
@@ -786,6 +3992,193 @@ class YouTubeDownloader:
         self.audio_playlist_progress_bar = ttk.Progressbar(frame, length=480, mode="determinate")
         self.audio_playlist_progress_bar.pack(pady=12)
 
+    def create_harvest_tab(self, frame):
+        self.harvest_url_label = tk.Label(frame, text="Enter YouTube Video, Playlist or Channel URL:", bg="#333", fg="#fff",
+                                          font=self.label_font)
+        self.harvest_url_label.pack(pady=6)
+        self.harvest_url_entry = tk.Entry(frame, width=60, bg="#444", fg="#fff", insertbackground="#fff", font=self.entry_font)
+        self.harvest_url_entry.pack(pady=6)
+        self.create_context_menu(self.harvest_url_entry)
+
+        self.harvest_languages_label = tk.Label(frame, text="Subtitle Languages (comma separated):", bg="#333", fg="#fff",
+                                                font=self.label_font)
+        self.harvest_languages_label.pack(pady=6)
+        self.harvest_languages_entry = tk.Entry(frame, width=30, bg="#444", fg="#fff", insertbackground="#fff",
+                                                font=self.entry_font)
+        self.harvest_languages_entry.insert(0, ','.join(SUBTITLE_LANGUAGES))
+        self.harvest_languages_entry.pack(pady=6)
+
+        self.harvest_save_location_button = tk.Button(
+            frame, text="Choose Save Location",
+            command=lambda: self.choose_save_location(self.harvest_save_location_var),
+            bg="#555", fg="#fff", font=self.button_font
+        )
+        self.harvest_save_location_button.pack(pady=6)
+
+        self.harvest_save_location_var = tk.StringVar()
+
+        self.harvest_workers_label = tk.Label(frame, text="Parallel Videos:", bg="#333", fg="#fff", font=self.label_font)
+        self.harvest_workers_label.pack(pady=6)
+        self.harvest_workers_var = tk.IntVar(value=8)
+        self.harvest_workers_spinbox = tk.Spinbox(
+            frame, from_=1, to=16, width=5, textvariable=self.harvest_workers_var,
+            bg="#444", fg="#fff", font=self.entry_font
+        )
+        self.harvest_workers_spinbox.pack(pady=6)
+
+        self.harvest_button = tk.Button(
+            frame, text="Harvest Subtitles & Metadata", command=self.start_harvest_thread, bg="#555", fg="#fff",
+            font=self.button_font
+        )
+        self.harvest_button.pack(pady=12)
+
+        self.harvest_progress_label = tk.Label(frame, text="", bg="#333", fg="#fff", font=self.label_font)
+        self.harvest_progress_label.pack(pady=6)
+        self.harvest_progress_bar = ttk.Progressbar(frame, length=480, mode="determinate")
+        self.harvest_progress_bar.pack(pady=12)
+
+    def create_queue_tab(self, frame):
+        style = ttk.Style()
+        style.configure('Treeview', background='#444', fieldbackground='#444', foreground='#fff')
+        style.configure('Treeview.Heading', background='#555', foreground='#fff')
+
+        self.queue_tree = ttk.Treeview(frame, columns=('name', 'status', 'priority'), show='headings', height=14)
+        self.queue_tree.heading('name', text='Job')
+        self.queue_tree.heading('status', text='Status')
+        self.queue_tree.heading('priority', text='Priority')
+        self.queue_tree.column('name', width=460)
+        self.queue_tree.column('status', width=100, anchor='center')
+        self.queue_tree.column('priority', width=80, anchor='center')
+        self.queue_tree.pack(expand=1, fill='both', padx=6, pady=6)
+
+        buttons = tk.Frame(frame, bg="#333")
+        buttons.pack(pady=6)
+        tk.Button(buttons, text="Move to Front", command=self.prioritize_selected_jobs,
+                  bg="#555", fg="#fff", font=self.button_font).pack(side='left', padx=6)
+        tk.Button(buttons, text="Cancel Selected", command=self.cancel_selected_jobs,
+                  bg="#555", fg="#fff", font=self.button_font).pack(side='left', padx=6)
+        tk.Button(buttons, text="Clear Finished", command=lambda: self.job_manager.clear_finished(),
+                  bg="#555", fg="#fff", font=self.button_font).pack(side='left', padx=6)
+
+        self.cache_stats_label = tk.Label(frame, text="", bg="#333", fg="#fff", font=self.entry_font)
+        self.cache_stats_label.pack(pady=6)
+
+        bandwidth = tk.Frame(frame, bg="#333")
+        bandwidth.pack(pady=6)
+        tk.Label(bandwidth, text="Bandwidth limit (e.g. 2M or 08:00=1M,19:00=0):", bg="#333", fg="#fff",
+                 font=self.entry_font).pack(side='left', padx=6)
+        self.bandwidth_limit_entry = tk.Entry(bandwidth, width=22, bg="#444", fg="#fff", insertbackground="#fff",
+                                              font=self.entry_font)
+        self.bandwidth_limit_entry.pack(side='left', padx=6)
+        tk.Button(bandwidth, text="Apply", command=self.apply_bandwidth_limit,
+                  bg="#555", fg="#fff", font=self.button_font).pack(side='left', padx=6)
+        self.bandwidth_stats_label = tk.Label(frame, text="", bg="#333", fg="#fff", font=self.entry_font)
+        self.bandwidth_stats_label.pack(pady=6)
+
+        self.media_store_var = tk.BooleanVar(value=get_media_store().enabled)
+        tk.Checkbutton(
+            frame, text="Link videos other playlists already downloaded (media store)", variable=self.media_store_var,
+            command=lambda: setattr(get_media_store(), 'enabled', self.media_store_var.get()),
+            bg="#333", fg="#fff", selectcolor="#555", font=self.entry_font
+        ).pack(pady=6)
+
+        self.preflight_var = tk.BooleanVar(value=get_disk_space_governor().preflight)
+        tk.Checkbutton(
+            frame, text="Plan size and ETA of playlists before downloading", variable=self.preflight_var,
+            command=lambda: setattr(get_disk_space_governor(), 'preflight', self.preflight_var.get()),
+            bg="#333", fg="#fff", selectcolor="#555", font=self.entry_font
+        ).pack(pady=6)
+
+        tk.Checkbutton(
+            frame, text="Keep only a short record of finished playlist entries (very large playlists)",
+            variable=self.bounded_memory_var, bg="#333", fg="#fff", selectcolor="#555", font=self.entry_font
+        ).pack(pady=6)
+
+    def apply_bandwidth_limit(self):
+        try:
+            limit, schedule = parse_bandwidth_setting(self.bandwidth_limit_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        governor = get_bandwidth_governor()
+        governor.set_limit(limit)
+        governor.set_schedule(schedule)
+
+    def selected_jobs(self):
+        selected = set(self.queue_tree.selection())
+        return [job for job in self.job_manager.jobs() if str(job.id) in selected]
+
+    def prioritize_selected_jobs(self):
+        for job in self.selected_jobs():
+            self.job_manager.prioritize(job)
+
+    def cancel_selected_jobs(self):
+        for job in self.selected_jobs():
+            self.job_manager.cancel(job)
+
+    def refresh_queue(self):
+        self.root.after(500, self.refresh_queue)
+        if str(self.queue_frame) in self.tab_builders:
+            return  # Nothing to show until the Queue tab is opened
+        jobs = self.job_manager.jobs()
+        known = set(self.queue_tree.get_children())
+        for job in jobs:
+            values = (job.name, job.status, job.priority)
+            if str(job.id) in known:
+                self.queue_tree.item(str(job.id), values=values)
+            else:
+                self.queue_tree.insert('', 'end', iid=str(job.id), values=values)
+        for iid in known - {str(job.id) for job in jobs}:
+            self.queue_tree.delete(iid)
+
+        cache_stats = get_metadata_cache().stats()
+        self.cache_stats_label.config(
+            text=f"Metadata cache: {cache_stats['hits']} hits | {cache_stats['misses']} misses | {cache_stats['entries']} entries"
+        )
+        self.bandwidth_stats_label.config(text=format_bandwidth(get_bandwidth_governor().stats()))
+
+    def submit_job(self, name, target, priority=PRIORITY_NORMAL):
+        try:
+            self.job_manager.submit(name, target, priority)
+        except RuntimeError as e:
+            messagebox.showerror("Error", str(e))
+
+    def resume_interrupted_jobs(self):
+        # Jobs a crash or a killed process left behind continue where their checkpoint says they stopped
+        tabs = {
+            'video': (self.video_download_frame, 'video_progress'),
+            'audio': (self.audio_download_frame, 'audio_progress'),
+            'playlist': (self.playlist_download_frame, 'playlist_progress'),
+            'audio-playlist': (self.audio_playlist_download_frame, 'audio_playlist_progress'),
+            'harvest': (self.harvest_frame, 'harvest_progress'),
+        }
+        for checkpoint in get_checkpoint_store().pending():
+            url = checkpoint.params['url']
+            log.info("Resuming interrupted %s job for %s (stage: %s)", checkpoint.kind, url, checkpoint.data['stage'])
+            try:
+                frame, prefix = tabs[checkpoint.kind]
+                self.build_tab(frame)  # The resumed job reports its progress on that tab
+                progress_callback = self.progress_callback(getattr(self, prefix + '_label'), getattr(self, prefix + '_bar'))
+                target = resume_downloader(checkpoint, progress_callback, reporter=self.reporter)
+            except (OSError, KeyError, TypeError) as e:
+                log.warning("Could not resume job %s: %s", checkpoint.path, e)
+                continue
+            priority = PRIORITY_LOW if checkpoint.kind in ('playlist', 'audio-playlist') else PRIORITY_NORMAL
+            self.submit_job(f"Resume {checkpoint.kind}: {url}", target, priority)
+
+    def on_close(self):
+        # Drop queued jobs, let running ones finish, then close the window
+        self.job_manager.shutdown(wait=False, cancel_pending=True)
+        self.wait_for_jobs_and_close()
+
+    def wait_for_jobs_and_close(self):
+        running = self.job_manager.active_count()
+        if running:
+            self.root.title(f"Finishing {running} download(s) before closing...")
+            self.root.after(500, self.wait_for_jobs_and_close)
+        else:
+            self.root.destroy()
+
     def choose_save_location(self, var):
         directory = filedialog.askdirectory()
         if directory:
@@ -793,57 +4186,76 @@ class YouTubeDownloader:
 
     def start_video_download_thread(self):
         url = self.video_url_entry.get()
-        resolution = self.resolution_var.get()
+        resolution = self.video_resolution_var.get()
         save_location = self.video_save_location_var.get()
         include_subtitles = self.video_subtitle_var.get()
+        connections = self.video_connections_var.get()
 
         downloader = VideoDownloader(url, resolution, save_location, include_subtitles, 
-                                   lambda t, v: self.update_progress(self.video_progress_label, self.video_progress_bar, t, v))
-        thread = threading.Thread(target=downloader.download_video)
-        thread.daemon = True
-        thread.start()
+                                   self.progress_callback(self.video_progress_label, self.video_progress_bar),
+                                   connections=connections, reporter=self.reporter)
+        self.submit_job(f"Video: {url}", downloader.download_video, PRIORITY_NORMAL)
 
     def start_audio_download_thread(self):
         url = self.audio_url_entry.get()
-        codec = self.codec_var.get()
+        codec = self.audio_codec_var.get()
         save_location = self.audio_save_location_var.get()
         include_subtitles = self.audio_subtitle_var.get()
-        include_poster = self.poster_var.get()
+        include_poster = self.audio_poster_var.get()
 
         downloader = AudioDownloader(url, codec, save_location, include_subtitles, include_poster,
-                                   lambda t, v: self.update_progress(self.audio_progress_label, self.audio_progress_bar, t, v))
-        thread = threading.Thread(target=downloader.download_audio)
-        thread.daemon = True
-        thread.start()
+                                   self.progress_callback(self.audio_progress_label, self.audio_progress_bar), reporter=self.reporter)
+        self.submit_job(f"Audio: {url}", downloader.download_audio, PRIORITY_NORMAL)
 
     def start_playlist_download_thread(self):
         url = self.playlist_url_entry.get()
-        resolution = self.resolution_var.get()
+        resolution = self.playlist_resolution_var.get()
         save_location = self.playlist_save_location_var.get()
         include_subtitles = self.playlist_subtitle_var.get()
 
+        max_workers = self.playlist_workers_var.get()
+
         downloader = PlaylistDownloader(url, resolution, save_location, include_subtitles,
-                                        lambda t, v: self.update_progress(self.playlist_progress_label, self.playlist_progress_bar, t, v))
-        thread = threading.Thread(target=downloader.download_playlist)
-        thread.daemon = True
-        thread.start()
+                                        self.progress_callback(self.playlist_progress_label, self.playlist_progress_bar),
+                                        max_workers=max_workers, reporter=self.reporter,
+                                        bounded_memory=self.bounded_memory_var.get())
+        self.submit_job(f"Playlist: {url}", downloader.download_playlist, PRIORITY_LOW)
 
     def start_audio_playlist_download_thread(self):
         url = self.audio_playlist_url_entry.get()
-        codec = self.codec_var.get()
+        codec = self.audio_playlist_codec_var.get()
         save_location = self.audio_playlist_save_location_var.get()
-        include_poster = self.poster_var.get()
+        include_poster = self.audio_playlist_poster_var.get()
+
+        max_workers = self.audio_playlist_workers_var.get()
 
         downloader = AudioPlaylistDownloader(url, codec, save_location, include_poster,
-                                             lambda t, v: self.update_progress(self.audio_playlist_progress_label, self.audio_playlist_progress_bar, t, v))
-        thread = threading.Thread(target=downloader.download_playlist)
-        thread.daemon = True
-        thread.start()
+                                             self.progress_callback(self.audio_playlist_progress_label, self.audio_playlist_progress_bar),
+                                             max_workers=max_workers, reporter=self.reporter,
+                                             bounded_memory=self.bounded_memory_var.get())
+        self.submit_job(f"Audio playlist: {url}", downloader.download_playlist, PRIORITY_LOW)
+
+    def start_harvest_thread(self):
+        url = self.harvest_url_entry.get()
+        languages = parse_subtitle_languages(self.harvest_languages_entry.get())
+        save_location = self.harvest_save_location_var.get()
+
+        max_workers = self.harvest_workers_var.get()
+
+        harvester = MetadataHarvester(url, save_location, languages,
+                                      self.progress_callback(self.harvest_progress_label, self.harvest_progress_bar),
+                                      max_workers=max_workers, reporter=self.reporter)
+        self.submit_job(f"Harvest: {url}", harvester.harvest, PRIORITY_NORMAL)
+
+    def progress_callback(self, label, progress_bar):
+        # Every job gets its own key, so the bus keeps the latest update of each job
+        key = object()
+        return lambda text, value: self.progress_bus.post_progress(key, label, progress_bar, text, value)
 
     def update_progress(self, label, progress_bar, text, value):
+        # Only called from the Tk main loop, see ProgressBus.drain
         label.config(text=text)
         progress_bar['value'] = value
-        self.root.update_idletasks()
 
     def create_context_menu(self, widget):
         def paste_clipboard(event):
@@ -851,7 +4263,230 @@ class YouTubeDownloader:
 
         widget.bind("<Button-3>", paste_clipboard)
 
-if __name__ == "__main__":
+def read_batch_urls(path):
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        urls = []
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                urls.append(line)
+        return urls
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def batch_progress_callback(args, url):
+    def progress_callback(text, value):
+        if args.verbose:
+            print(f"[{url}] {text}", file=sys.stderr)
+    return progress_callback
+
+
+def create_batch_downloader(args, url, reporter):
+    progress_callback = batch_progress_callback(args, url)
+    if args.kind == 'video':
+        return VideoDownloader(url, args.format or 'best', args.output, args.subtitles, progress_callback,
+                               connections=args.connections, reporter=reporter,
+                               subtitle_languages=args.sub_langs).download_video
+    if args.kind == 'audio':
+        return AudioDownloader(url, args.format or 'mp3', args.output, args.subtitles, args.poster,
+                               progress_callback, reporter=reporter, subtitle_languages=args.sub_langs).download_audio
+    if args.kind == 'playlist':
+        return PlaylistDownloader(url, args.format or 'best', args.output, args.subtitles, progress_callback,
+                                  max_workers=args.playlist_workers, reporter=reporter,
+                                  bounded_memory=args.bounded_memory, subtitle_languages=args.sub_langs).download_playlist
+    if args.kind == 'harvest':
+        return MetadataHarvester(url, args.output, args.sub_langs, progress_callback,
+                                 max_workers=args.harvest_workers, reporter=reporter).harvest
+    return AudioPlaylistDownloader(url, args.format or 'mp3', args.output, args.poster, progress_callback,
+                                   max_workers=args.playlist_workers, reporter=reporter,
+                                   bounded_memory=args.bounded_memory).download_playlist
+
+
+def resume_batch_downloader(args, checkpoint, reporter):
+    return resume_downloader(checkpoint, batch_progress_callback(args, checkpoint.params['url']), reporter)
+
+
+def run_batch_job(kind, url, create_downloader):
+    reporter = ConsoleReporter()
+    try:
+        succeeded = create_downloader(reporter)()
+    except Exception as e:
+        reporter.error(str(e))
+        succeeded = False
+    return {
+        'url': url,
+        'kind': kind,
+        'status': 'ok' if succeeded else 'failed',
+        'errors': reporter.errors,
+    }
+
+
+def format_bytes(count):
+    # Same output as yt_dlp.utils.format_bytes, the Queue tab shows it long before yt-dlp is imported
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if count < 1024 or unit == 'GiB':
+            return f"{count:.2f}{unit}"
+        count /= 1024
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def format_bandwidth(stats):
+    allowed = format_bytes(stats['allowed']) + '/s' if stats['allowed'] else 'unlimited'
+    return f"Bandwidth: {format_bytes(stats['actual'])}/s of {allowed} ({stats['active_jobs']} active)"
+
+
+def report_bandwidth(governor, job_manager, interval=5):
+    while True:
+        time.sleep(interval)
+        if job_manager.active_count():
+            print(format_bandwidth(governor.stats()), file=sys.stderr)
+
+
+def parse_batch_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Download a batch of URLs without the GUI and print a JSON summary to stdout."
+    )
+    parser.add_argument('urls_file', nargs='?', help="file with one URL per line, '-' reads from stdin")
+    parser.add_argument('-o', '--output', help="save location")
+    parser.add_argument('--resume', action='store_true',
+                        help="first resume the jobs an earlier run left unfinished, the URL file is optional then")
+    parser.add_argument('--reconcile-index', action='store_true',
+                        help="check the download index against the files on disk (limited to --output when given) and exit")
+    parser.add_argument('--store', nargs='?', const='', metavar='DIR',
+                        help="link playlist entries other playlists already downloaded from this media store "
+                             "(default ~/.horizon_vid_downloader/store), best on the same filesystem as --output")
+    parser.add_argument('--gc-store', action='store_true',
+                        help="delete media store files no downloaded file refers to any more and exit")
+    parser.add_argument('-k', '--kind', choices=['video', 'audio', 'playlist', 'audio-playlist', 'harvest'], default='video',
+                        help="harvest saves only subtitles and metadata (title, duration, chapters) of a video, playlist or channel")
+    parser.add_argument('-f', '--format', help="resolution for video jobs (e.g. 720p, best) or codec for audio jobs (e.g. mp3)")
+    parser.add_argument('--subtitles', action='store_true', help="download subtitles in the --sub-langs languages")
+    parser.add_argument('--sub-langs', type=parse_subtitle_languages, default=list(SUBTITLE_LANGUAGES), metavar='LANGS',
+                        help="comma separated subtitle languages, e.g. en,de,fr or en.* (default en)")
+    parser.add_argument('--poster', action='store_true', help="embed the video poster into audio files")
+    parser.add_argument('-j', '--jobs', type=int, default=2, help="number of URLs downloaded at the same time")
+    parser.add_argument('--network-slots', type=int, default=4, help="transfers running at the same time across all jobs")
+    parser.add_argument('--playlist-workers', type=int, default=3, help="parallel downloads inside one playlist")
+    parser.add_argument('--harvest-workers', type=int, default=8, help="videos a harvest extracts at the same time")
+    parser.add_argument('--transcode-workers', type=int, help="audio encodes running at the same time (default: one per core)")
+    parser.add_argument('--limit-rate', type=parse_bandwidth_setting, default=(None, []), metavar='RATE',
+                        help="bandwidth shared by all jobs, e.g. 2M, or a daily schedule like 08:00=1M,19:00=0 (0 = unlimited)")
+    parser.add_argument('--min-free', type=parse_rate, default=512 * 1024 * 1024, metavar='SIZE',
+                        help="free space downloads leave on the disk, they pause below it (default 512M)")
+    parser.add_argument('--preflight', action='store_true',
+                        help="estimate size, disk space and ETA of a whole playlist before downloading it")
+    parser.add_argument('--bounded-memory', action='store_true',
+                        help="keep only id, path and status of finished playlist entries, for playlists with thousands of videos")
+    parser.add_argument('--retries', type=int, default=3,
+                        help="attempts per playlist entry on network errors, failed entries are retried once more at the end")
+    parser.add_argument('--retry-delay', type=float, default=2.0,
+                        help="seconds before the first retry, doubled with jitter for every further one")
+    parser.add_argument('--connections', type=int, default=1,
+                        help="connections per stream for video jobs, fragments or byte ranges are fetched in parallel")
+    parser.add_argument('--no-cache', action='store_true', help="always extract metadata and fetch thumbnails again")
+    parser.add_argument('--cache-ttl', type=int, default=3 * 3600, help="seconds a cached extract_info result stays valid")
+    parser.add_argument('--metrics-jsonl', help="append per-job stage timings to this JSON lines file")
+    parser.add_argument('--prometheus-textfile', help="keep per-stage totals in this Prometheus textfile")
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('-v', '--verbose', action='store_true', help="print progress to stderr")
+    return parser.parse_args(argv)
+
+
+def run_batch(argv):
+    args = parse_batch_args(argv)
+    if args.reconcile_index:
+        json.dump(get_download_index().reconcile(args.output), sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return 0
+    if args.gc_store:
+        json.dump(get_media_store(directory=args.store or None).collect_garbage(), sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return 0
+    if not args.resume and not (args.urls_file and args.output):
+        print("Both a URL file and --output are required.", file=sys.stderr)
+        return 2
+    if args.urls_file and not args.output:
+        print("--output is required with a URL file.", file=sys.stderr)
+        return 2
+    urls = read_batch_urls(args.urls_file) if args.urls_file else []
+
+    # Every job goes through the shared scheduler, chatter goes to stderr so stdout only carries the summary
+    logging.basicConfig(level=args.log_level, stream=sys.stderr, format="%(asctime)s %(levelname)s %(message)s")
+    get_metrics_recorder(jsonl_path=args.metrics_jsonl, prometheus_path=args.prometheus_textfile)
+    get_metadata_cache(ttl=args.cache_ttl, enabled=not args.no_cache)
+    get_thumbnail_cache(enabled=not args.no_cache)
+    get_media_store(directory=args.store or None, enabled=args.store is not None)
+    get_transcode_pool(workers=args.transcode_workers)
+    get_disk_space_governor(min_free=args.min_free or 0, preflight=args.preflight)
+    get_retry_policy(attempts=args.retries, base_delay=args.retry_delay)
+    job_manager = get_job_manager(max_jobs=max(1, args.jobs), network_slots=max(1, args.network_slots))
+    governor = get_bandwidth_governor(limit=args.limit_rate[0], schedule=args.limit_rate[1])
+    started = time.monotonic()
+    if args.verbose:
+        threading.Thread(target=report_bandwidth, args=(governor, job_manager), daemon=True).start()
+    with contextlib.redirect_stdout(sys.stderr):
+        jobs = []
+        if args.resume:
+            # Interrupted jobs go first, their partial files are already on disk
+            for checkpoint in get_checkpoint_store().pending():
+                url = checkpoint.params['url']
+                create_downloader = functools.partial(resume_batch_downloader, args, checkpoint)
+                jobs.append((checkpoint.kind, job_manager.submit(
+                    url, functools.partial(run_batch_job, checkpoint.kind, url, create_downloader), PRIORITY_HIGH)))
+        priority = PRIORITY_LOW if args.kind in ('playlist', 'audio-playlist') else PRIORITY_NORMAL
+        for url in urls:
+            create_downloader = functools.partial(create_batch_downloader, args, url)
+            jobs.append((args.kind, job_manager.submit(
+                url, functools.partial(run_batch_job, args.kind, url, create_downloader), priority)))
+        job_manager.shutdown(wait=True, cancel_pending=False)
+    results = [job.result or {'url': job.name, 'kind': kind, 'status': job.status, 'errors': [job.error]}
+               for kind, job in jobs]
+
+    failed = sum(1 for result in results if result['status'] != 'ok')
+    summary = {
+        'total': len(results),
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'jobs': results,
+        'metadata_cache': get_metadata_cache().stats(),
+        'media_store': get_media_store().stats(),
+        'transcodes': get_transcode_pool().stats(),
+        'disk_space': get_disk_space_governor().stats(),
+        'retries': get_retry_policy().stats(),
+        'bandwidth': {
+            'allowed_bytes_per_second': governor.allowed_rate(),
+            'average_bytes_per_second': round(governor.total_bytes / max(time.monotonic() - started, 0.001)),
+            'total_bytes': governor.total_bytes,
+        },
+    }
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_batch(argv)
+
+    logging.basicConfig(level=os.environ.get('HORIZON_LOG_LEVEL', 'INFO'), format="%(asctime)s %(levelname)s %(message)s")
+    load_tkinter()
     root = tk.Tk()
-    app = YouTubeDownloader(root)
-    root.mainloop()
\ No newline at end of file
+    YouTubeDownloader(root)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,113 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from common import load_downloader_module
+from media_server import SyntheticMediaServer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare the audio playlist pipeline with postprocessing inside the download workers."
+    )
+    parser.add_argument('--items', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=3, help="download workers")
+    parser.add_argument('--media-size', type=float, default=2, help="MiB per entry")
+    parser.add_argument('--bandwidth', type=int, default=2048, help="KiB/s per connection")
+    parser.add_argument('--postprocess-seconds', type=float, default=0.5,
+                        help="CPU time per entry of the synthetic postprocessing stage")
+    parser.add_argument('--real', action='store_true',
+                        help="run AudioPlaylistDownloader with real media and ffmpeg instead of the synthetic stages")
+    return parser.parse_args(argv)
+
+
+def calibrate_hash_rounds(seconds, block):
+    # hashlib releases the GIL on large buffers, so like ffmpeg the work really runs in parallel
+    rounds, started = 0, time.perf_counter()
+    while time.perf_counter() - started < 0.2:
+        hashlib.sha256(block).digest()
+        rounds += 1
+    return max(1, int(rounds * seconds / (time.perf_counter() - started)))
+
+
+def run_synthetic(downloader, server, args, postprocess_workers):
+    block = os.urandom(1024 * 1024)
+    rounds = calibrate_hash_rounds(args.postprocess_seconds, block)
+    size = int(args.media_size * 1024 * 1024)
+    pool = downloader.get_http_pool()
+
+    def download_entry(index, entry, progress):
+        return len(pool.get(f"{server.url}/media/item{index}.webm?size={size}"))
+
+    def postprocess_entry(index, entry, size):
+        for _ in range(rounds):
+            hashlib.sha256(block).digest()
+
+    progress = downloader.PlaylistProgress(args.items, lambda text, value: None)
+    entries = [{'playlist_index': index, 'title': f'item{index}'} for index in range(1, args.items + 1)]
+    started = time.perf_counter()
+    failed = downloader.run_entry_pipeline(entries, download_entry, postprocess_entry, progress,
+                                           args.workers, postprocess_workers)
+    return time.perf_counter() - started, len(failed)
+
+
+def run_real(downloader, server, args, postprocess_workers):
+    from fake_extractor import SyntheticIE
+
+    SyntheticIE.server_url = server.url
+    SyntheticIE.split_formats = True
+    if SyntheticIE not in downloader.EXTRA_INFO_EXTRACTORS:
+        downloader.EXTRA_INFO_EXTRACTORS.append(SyntheticIE)
+    output = tempfile.mkdtemp(prefix='horizon-pipeline-')
+    try:
+        playlist = downloader.AudioPlaylistDownloader(
+            f'synthetic://playlist/{args.items}', 'mp3', output, False, lambda text, value: None,
+            max_workers=args.workers, reporter=downloader.ConsoleReporter(stream=open(os.devnull, 'w')),
+            postprocess_workers=postprocess_workers)
+        started = time.perf_counter()
+        playlist.download_playlist()
+        # Every run needs a clean download index, otherwise the second one would skip all entries
+        downloader.get_download_index().connection.execute('DELETE FROM downloads')
+        downloader.get_download_index().connection.commit()
+        return time.perf_counter() - started, args.items - sum(1 for name in os.listdir(output) if name.endswith('.mp3'))
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='horizon-bench-')
+    os.environ['HORIZON_CACHE_DIR'] = workdir
+    downloader = load_downloader_module()
+
+    files = None
+    if args.real:
+        if not shutil.which('ffmpeg'):
+            print("--real needs ffmpeg on PATH", file=sys.stderr)
+            return 2
+        from run_benchmarks import make_sample_media
+        files = make_sample_media(workdir)
+    server = SyntheticMediaServer(bandwidth=args.bandwidth * 1024, files=files).start()
+    run = run_real if args.real else run_synthetic
+
+    try:
+        results = []
+        for label, postprocess_workers in (('inline', 0), ('pipelined', None)):
+            if postprocess_workers is None:
+                postprocess_workers = max(1, min(args.workers, os.cpu_count() or 2))
+            wall, failed = run(downloader, server, args, postprocess_workers)
+            results.append(wall)
+            print(f"{label:10} {wall:7.2f} s  {failed} failed  ({postprocess_workers} postprocess workers)")
+        print(f"speedup    {results[0] / results[1]:7.2f}x")
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
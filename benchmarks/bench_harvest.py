@@ -0,0 +1,67 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from common import load_downloader_module
+from media_server import SyntheticMediaServer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Harvest subtitles and metadata of a synthetic channel: wall time, bytes fetched, sidecar size "
+                    "and peak RSS."
+    )
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=8, help="videos harvested at the same time")
+    parser.add_argument('--languages', default='en,de', help="requested subtitle languages")
+    parser.add_argument('--extract-delay', type=int, default=300, help="ms the stub extractor takes per video")
+    parser.add_argument('--latency', type=int, default=50, help="ms before the first byte of every response")
+    parser.add_argument('--cues', type=int, default=300, help="captions per subtitle file")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='horizon-bench-')
+    os.environ['HORIZON_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    downloader = load_downloader_module()
+    from fake_extractor import SyntheticIE
+    from run_benchmarks import peak_rss_mib
+
+    server = SyntheticMediaServer(latency=args.latency / 1000).start()
+    SyntheticIE.server_url = server.url
+    SyntheticIE.extract_delay = args.extract_delay / 1000
+    SyntheticIE.subtitle_languages = ('en',)
+    SyntheticIE.caption_languages = ('en', 'de', 'fr', 'es')
+    SyntheticIE.subtitle_cues = args.cues
+    downloader.EXTRA_INFO_EXTRACTORS.append(SyntheticIE)
+    metrics_path = os.path.join(workdir, 'metrics.jsonl')
+    downloader.get_metrics_recorder(jsonl_path=metrics_path)
+    output = os.path.join(workdir, 'output')
+
+    try:
+        harvester = downloader.MetadataHarvester(
+            f'synthetic://playlist/{args.entries}', output, downloader.parse_subtitle_languages(args.languages),
+            lambda text, value: None, max_workers=args.workers,
+            reporter=downloader.ConsoleReporter(stream=io.StringIO()))
+        started = time.perf_counter()
+        succeeded = harvester.harvest()
+        wall = time.perf_counter() - started
+        with open(metrics_path, encoding='utf-8') as f:
+            entries = json.loads(f.readline()).get('entries')
+        size = sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output))
+        print(f"{args.entries} videos  {wall:7.1f} s  {entries}  fetched {server.bytes_served / 2 ** 20:.1f} MiB  "
+              f"sidecars {size / 2 ** 20:.1f} MiB in {len(os.listdir(output))} files  peak RSS {peak_rss_mib()} MiB")
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0 if succeeded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
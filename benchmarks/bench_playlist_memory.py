@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_downloader_module
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Memory ceiling of a very large playlist: peak RSS of a small and of a large synthetic playlist, "
+                    "fails when the large one grows past the ceiling."
+    )
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--baseline-entries', type=int, default=500)
+    parser.add_argument('--ceiling', type=float, default=16, help="MiB the large playlist may use on top of the small one")
+    parser.add_argument('--workers', type=int, default=4, help="playlist workers")
+    parser.add_argument('--padding', type=int, default=12, help="extra formats and thumbnails per entry")
+    parser.add_argument('--full-records', action='store_true', help="run without the bounded memory mode")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_child(args):
+    workdir = tempfile.mkdtemp(prefix='horizon-bench-')
+    os.environ['HORIZON_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    try:
+        downloader = load_downloader_module()
+        from fake_extractor import SyntheticIE
+        from media_server import SyntheticMediaServer
+        from run_benchmarks import peak_rss_mib
+
+        server = SyntheticMediaServer().start()
+        SyntheticIE.server_url = server.url
+        SyntheticIE.media_size = 2048
+        SyntheticIE.metadata_padding = args.padding
+        downloader.EXTRA_INFO_EXTRACTORS.append(SyntheticIE)
+        downloader.get_metadata_cache(enabled=False)
+        downloader.get_metrics_recorder(jsonl_path=os.path.join(workdir, 'metrics.jsonl'))
+        output = os.path.join(workdir, 'output')
+
+        playlist = downloader.PlaylistDownloader(
+            f'synthetic://playlist/{args.child}', 'best', output, False, lambda text, value: None,
+            max_workers=args.workers, reporter=downloader.ConsoleReporter(stream=open(os.devnull, 'w')),
+            bounded_memory=not args.full_records)
+        started = time.perf_counter()
+        succeeded = playlist.download_playlist()
+        wall = time.perf_counter() - started
+        server.stop()
+        print(json.dumps({'entries': args.child, 'succeeded': succeeded, 'wall_seconds': round(wall, 1),
+                          'files': len(os.listdir(output)), 'peak_rss_mib': peak_rss_mib()}), flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(entries, argv):
+    # A process per playlist, the peak RSS of a process never goes down again
+    command = [sys.executable, os.path.abspath(__file__), '--child', str(entries)] + argv
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise SystemExit(f"{entries} entries failed\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        return run_child(args)
+
+    results = [measure(entries, sys.argv[1:]) for entries in (args.baseline_entries, args.entries)]
+    for result in results:
+        print(f"{result['entries']:6d} entries  {result['files']:6d} files  {result['wall_seconds']:7.1f} s  "
+              f"peak RSS {result['peak_rss_mib']} MiB")
+    growth = results[1]['peak_rss_mib'] - results[0]['peak_rss_mib']
+    within = growth <= args.ceiling and all(result['succeeded'] for result in results)
+    print(f"growth {growth:.1f} MiB for {args.entries - args.baseline_entries} more entries, ceiling {args.ceiling} MiB: "
+          f"{'ok' if within else 'FAILED'}")
+    return 0 if within else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import argparse
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+from common import load_downloader_module
+
+
+class HeadlessRoot:
+    # Just the after() of a Tk root, run by a loop on the calling thread, so the bus can be checked without a display
+    def __init__(self):
+        self.timers = []
+        self.order = itertools.count()
+
+    def after(self, ms, function, *args):
+        heapq.heappush(self.timers, (time.perf_counter() + ms / 1000, next(self.order), function, args))
+
+    def run_until(self, deadline):
+        while self.timers and self.timers[0][0] <= deadline:
+            due, _, function, args = heapq.heappop(self.timers)
+            time.sleep(max(0.0, due - time.perf_counter()))
+            function(*args)
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Flood a ProgressBus with updates from N worker threads without Tk and check that it coalesces "
+                    "them: at most one update per job and frame, and the last update of every job always delivered."
+    )
+    parser.add_argument('--jobs', type=int, default=8, help="concurrent fake download jobs")
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--fps', type=int, default=15)
+    args = parser.parse_args()
+
+    downloader = load_downloader_module()
+    root = HeadlessRoot()
+    frames = []  # Updates applied per drain
+    applied = {}
+
+    def apply_progress(label, progress_bar, text, value):
+        frames[-1] += 1
+        applied[label] = (text, value)
+
+    bus = downloader.ProgressBus(root, apply_progress, fps=args.fps)
+    drain = bus.drain
+
+    def counted_drain():
+        frames.append(0)
+        drain()
+
+    bus.drain = counted_drain
+    stop = threading.Event()
+    posted = [0] * args.jobs
+
+    def fake_job(index):
+        # Roughly what yt-dlp does: a progress hook call for every received chunk, then the final state
+        value = 0
+        while not stop.is_set():
+            value = (value + 1) % 100
+            bus.post_progress(index, index, None, f"Job {index}: {value}%", value)
+            posted[index] += 1
+            time.sleep(0.0005)
+        bus.post_progress(index, index, None, f"Job {index}: done", 100)
+        posted[index] += 1
+
+    workers = [threading.Thread(target=fake_job, args=(index,)) for index in range(args.jobs)]
+    bus.start()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    root.run_until(started + args.seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    root.run_until(time.perf_counter() + 2 * bus.interval / 1000)  # The final updates go out with the next frame
+
+    problems = []
+    if max(frames) > args.jobs:
+        problems.append(f"a frame applied {max(frames)} updates for {args.jobs} jobs")
+    missing = [index for index in range(args.jobs) if applied.get(index) != (f"Job {index}: done", 100)]
+    if missing:
+        problems.append(f"the final update of job(s) {missing} was not delivered")
+    print(f"{args.jobs} jobs posted {sum(posted)} progress updates in {args.seconds:.1f}s, "
+          f"{len(frames)} frames applied {sum(frames)} (at most {max(frames)} per frame)")
+    for problem in problems:
+        print(f"FAILED  {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from common import load_downloader_module
+from media_server import SyntheticMediaServer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time from job start to the first downloaded byte with fresh and with pooled YoutubeDL instances."
+    )
+    parser.add_argument('--jobs', type=int, default=10, help="single video jobs run one after another")
+    parser.add_argument('--media-size', type=float, default=0.5, help="MiB per video")
+    parser.add_argument('--latency', type=int, default=0, help="ms before the first byte of every response")
+    return parser.parse_args(argv)
+
+
+def time_to_first_byte(downloader, output, args, label):
+    latencies = []
+    for index in range(args.jobs):
+        first_byte = []
+
+        def progress_callback(text, value):
+            if not first_byte and text.startswith('Downloading'):
+                first_byte.append(time.perf_counter())
+
+        url = f'synthetic://video/{label}{index}'
+        started = time.perf_counter()
+        downloader.VideoDownloader(url, 'best', output, False, progress_callback,
+                                   reporter=downloader.ConsoleReporter(stream=open(os.devnull, 'w'))).download_video()
+        if first_byte:
+            latencies.append((first_byte[0] - started) * 1000)
+    return latencies
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='horizon-bench-')
+    os.environ['HORIZON_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    downloader = load_downloader_module()
+    from fake_extractor import SyntheticIE
+
+    server = SyntheticMediaServer(latency=args.latency / 1000).start()
+    SyntheticIE.server_url = server.url
+    SyntheticIE.media_size = int(args.media_size * 1024 * 1024)
+    downloader.EXTRA_INFO_EXTRACTORS.append(SyntheticIE)
+    output = os.path.join(workdir, 'output')
+    os.makedirs(output)
+
+    try:
+        for label, max_idle in (('fresh', 0), ('pooled', 4)):
+            downloader._youtube_dl_pool = downloader.YoutubeDLPool(max_idle_per_key=max_idle)
+            latencies = time_to_first_byte(downloader, output, args, label)
+            pool = downloader.get_youtube_dl_pool()
+            print(f"{label:7} first byte after  median {statistics.median(latencies):7.1f} ms  "
+                  f"max {max(latencies):7.1f} ms  ({pool.created} created, {pool.reused} reused)")
+            pool.close()
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Cold start of the app: module import time, deferred yt-dlp import and time to the first window paint."
+    )
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes per measurement, the median is reported")
+    parser.add_argument('--child', choices=['import', 'window'], help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_child(mode):
+    started = time.perf_counter()
+    from common import load_downloader_module
+
+    downloader = load_downloader_module()
+    result = {'import': time.perf_counter() - started, 'yt_dlp_imported': 'yt_dlp' in sys.modules}
+    if mode == 'import':
+        loading = time.perf_counter()
+        downloader.load_yt_dlp()
+        result['yt_dlp'] = time.perf_counter() - loading
+    else:
+        downloader.load_tkinter()
+        try:
+            root = downloader.tk.Tk()
+        except downloader.tk.TclError as e:
+            result['error'] = str(e)
+        else:
+            downloader.YouTubeDownloader(root)
+            root.wait_visibility()
+            root.update_idletasks()
+            result['window'] = time.perf_counter() - started
+    print(json.dumps(result), flush=True)
+    os._exit(0)  # The GUI's job threads would otherwise keep the process alive
+
+
+def measure(mode, runs, env):
+    results = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode],
+                                cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['process'] = time.perf_counter() - started
+        results.append(result)
+    return results
+
+
+def median_ms(results, key):
+    return statistics.median(result[key] for result in results) * 1000
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        return run_child(args.child)
+
+    workdir = tempfile.mkdtemp(prefix='horizon-bench-')
+    env = dict(os.environ, HORIZON_CACHE_DIR=workdir)  # No checkpoints to resume at startup
+    try:
+        imports = measure('import', args.runs, env)
+        print(f"module import        {median_ms(imports, 'import'):7.1f} ms  "
+              f"(yt-dlp imported at load: {'yes' if imports[0]['yt_dlp_imported'] else 'no'})")
+        print(f"yt-dlp on first job  {median_ms(imports, 'yt_dlp'):7.1f} ms")
+        windows = measure('window', args.runs, env)
+        if 'error' in windows[0]:
+            print(f"first window paint   skipped, Tk can't open a window: {windows[0]['error']}")
+        else:
+            print(f"first window paint   {median_ms(windows, 'window'):7.1f} ms after the import started, "
+                  f"{median_ms(windows, 'process'):7.1f} ms after the process started")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import argparse
+import threading
+import time
+import tkinter as tk
+
+from common import load_downloader_module
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Flood the GUI with progress updates from N worker threads and measure how late the Tk main loop runs."
+    )
+    parser.add_argument('--jobs', type=int, default=8, help="concurrent fake download jobs")
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--max-lag-ms', type=float, default=100.0, help="fail when the worst main loop lag is above this")
+    args = parser.parse_args()
+
+    downloader = load_downloader_module()
+    root = tk.Tk()
+    app = downloader.YouTubeDownloader(root)
+    stop = threading.Event()
+    posted = [0] * args.jobs
+
+    def fake_job(index):
+        # Roughly what yt-dlp does: a progress hook call for every received chunk
+        callback = app.progress_callback(app.video_progress_label, app.video_progress_bar)
+        value = 0
+        while not stop.is_set():
+            value = (value + 1) % 100
+            callback(f"Job {index}: {value}%", value)
+            posted[index] += 1
+            time.sleep(0.0005)
+
+    lags = []
+    tick = 0.01
+
+    def heartbeat(expected):
+        now = time.perf_counter()
+        lags.append(max(0.0, now - expected))
+        if not stop.is_set():
+            root.after(int(tick * 1000), heartbeat, time.perf_counter() + tick)
+
+    workers = [threading.Thread(target=fake_job, args=(index,)) for index in range(args.jobs)]
+    for worker in workers:
+        worker.start()
+    root.after(int(tick * 1000), heartbeat, time.perf_counter() + tick)
+    root.after(int(args.seconds * 1000), lambda: (stop.set(), root.after(100, root.destroy)))
+    root.mainloop()
+    for worker in workers:
+        worker.join()
+
+    print(f"{args.jobs} jobs posted {sum(posted)} progress updates in {args.seconds:.1f}s")
+    print(f"main loop lag: p50 {percentile(lags, 0.5) * 1000:.1f} ms  "
+          f"p95 {percentile(lags, 0.95) * 1000:.1f} ms  max {max(lags) * 1000:.1f} ms")
+    if max(lags) * 1000 > args.max_lag_ms:
+        raise SystemExit(f"main loop lag above {args.max_lag_ms} ms")
+
+
+if __name__ == '__main__':
+    main()
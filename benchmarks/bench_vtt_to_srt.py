@@ -0,0 +1,132 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_downloader_module
+
+
+def write_auto_captions(path, cues):
+    # Rolling YouTube style auto captions: every cue repeats the previous line and is followed by a 10ms cue.
+    # The first cue has nothing to repeat and gets the " " placeholder line YouTube writes instead.
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\nKind: captions\nLanguage: en\n\n")
+        previous = " "
+        for index in range(cues):
+            start = index * 3.0
+            line = f"<c>line</c><00:00:01.000><c> number {index}</c>"
+            f.write(f"{format_time(start)} --> {format_time(start + 3)} align:start position:0%\n{previous}\n{line}\n\n")
+            f.write(f"{format_time(start + 3)} --> {format_time(start + 3.01)} align:start position:0%\nline number {index}\n \n\n")
+            previous = f"line number {index}"
+
+
+# Manual captions may repeat a line on purpose, every cue has to survive the conversion
+MANUAL_CAPTIONS = """WEBVTT
+
+00:00:01.000 --> 00:00:02.000
+No.
+
+00:00:02.000 --> 00:00:03.000
+No.
+
+00:00:03.000 --> 00:00:05.000
+[Music]
+
+00:00:05.000 --> 00:00:07.000
+[Music]
+"""
+MANUAL_EXPECTED = ["No.", "No.", "[Music]", "[Music]"]
+
+
+def srt_cues(path):
+    # [(timing line, text)]
+    with open(path, encoding='utf-8') as f:
+        blocks = f.read().strip().split('\n\n')
+    return [(block.splitlines()[1], '\n'.join(block.splitlines()[2:])) for block in blocks if block.strip()]
+
+
+def srt_texts(path):
+    return [text for _, text in srt_cues(path)]
+
+
+def check_conversion(downloader, workdir, cues):
+    problems = []
+    vtt_file = os.path.join(workdir, 'manual.en.vtt')
+    srt_file = os.path.join(workdir, 'manual.en.srt')
+    with open(vtt_file, 'w', encoding='utf-8') as f:
+        f.write(MANUAL_CAPTIONS)
+    downloader.convert_vtt_file_to_srt(vtt_file, srt_file)
+    texts = srt_texts(srt_file)
+    if texts != MANUAL_EXPECTED:
+        problems.append(f"repeated manual cues: expected {MANUAL_EXPECTED}, got {texts}")
+
+    vtt_file = os.path.join(workdir, 'rolling.en.vtt')
+    srt_file = os.path.join(workdir, 'rolling.en.srt')
+    write_auto_captions(vtt_file, cues)
+    downloader.convert_vtt_file_to_srt(vtt_file, srt_file)
+    texts = srt_texts(srt_file)
+    expected = [f"line number {index}" for index in range(cues)]
+    if texts != expected:
+        problems.append(f"rolling auto captions: expected {expected}, got {texts}")
+    first = srt_cues(srt_file)[:1]
+    expected = [("00:00:00,000 --> 00:00:03,000", "line number 0")]
+    if first != expected:
+        problems.append(f"first rolling cue after its placeholder line: expected {expected}, got {first}")
+    return problems
+
+
+def format_time(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def time_runs(function, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the in-process VTT to SRT converter with an ffmpeg subprocess.")
+    parser.add_argument('--cues', type=int, default=1500, help="cues in the synthetic caption file")
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    downloader = load_downloader_module()
+    workdir = tempfile.mkdtemp()
+    try:
+        problems = check_conversion(downloader, workdir, 5)
+        for problem in problems:
+            print(f"conversion FAILED  {problem}")
+        if not problems:
+            print("conversion ok  repeated manual cues kept, rolling auto captions deduplicated")
+
+        vtt_file = os.path.join(workdir, 'captions.en.vtt')
+        srt_file = os.path.join(workdir, 'captions.en.srt')
+        write_auto_captions(vtt_file, args.cues)
+        print(f"Input: {args.cues} rolling cues, {os.path.getsize(vtt_file) / 1024:.0f} KiB")
+
+        best, mean = time_runs(lambda: downloader.convert_vtt_file_to_srt(vtt_file, srt_file), args.runs)
+        print(f"python  best {best * 1000:8.2f} ms  mean {mean * 1000:8.2f} ms")
+
+        ffmpeg = downloader.get_ffmpeg_path()
+        if shutil.which(ffmpeg):
+            command = [ffmpeg, '-y', '-loglevel', 'error', '-i', vtt_file, srt_file]
+            best, mean = time_runs(lambda: subprocess.run(command, check=True, capture_output=True), args.runs)
+            print(f"ffmpeg  best {best * 1000:8.2f} ms  mean {mean * 1000:8.2f} ms")
+        else:
+            print("ffmpeg not found, skipping the subprocess comparison")
+    finally:
+        shutil.rmtree(workdir)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
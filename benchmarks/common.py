@@ -0,0 +1,16 @@
+import importlib.util
+import os
+import sys
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Video Downloader.py')
+
+
+def load_downloader_module():
+    # The app is a single script with a space in its name, so it is loaded by path instead of imported
+    if 'video_downloader' in sys.modules:
+        return sys.modules['video_downloader']
+    spec = importlib.util.spec_from_file_location('video_downloader', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['video_downloader'] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,235 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_downloader_module
+from media_server import SyntheticMediaServer, filler
+
+VIDEO_URL = 'synthetic://video/crash'
+VIDEO_FILE = 'Synthetic crash.mp4'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Kill a download at each stage and check that resuming its checkpoint finishes the job."
+    )
+    parser.add_argument('--media-size', type=float, default=2, help="MiB of the synthetic video")
+    parser.add_argument('--bandwidth', type=int, default=512, help="KiB/s, slow enough to kill a transfer halfway")
+    parser.add_argument('--connections', type=int, default=1, help="connections per stream of the video job")
+    parser.add_argument('--child', choices=['run', 'resume'], help=argparse.SUPPRESS)
+    parser.add_argument('--server', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--extract-delay', type=float, default=0.0, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def run_child(args):
+    os.environ['HORIZON_CACHE_DIR'] = os.path.join(args.workdir, 'cache')
+    downloader = load_downloader_module()
+    from fake_extractor import SyntheticIE
+
+    SyntheticIE.server_url = args.server
+    SyntheticIE.media_size = int(args.media_size * 1024 * 1024)
+    SyntheticIE.extract_delay = args.extract_delay
+    downloader.EXTRA_INFO_EXTRACTORS.append(SyntheticIE)
+    reporter = downloader.ConsoleReporter()
+
+    if args.child == 'run':
+        target = downloader.VideoDownloader(VIDEO_URL, 'best', os.path.join(args.workdir, 'output'), False,
+                                            lambda text, value: None, connections=args.connections,
+                                            reporter=reporter).download_video
+        return 0 if target() else 1
+    succeeded = True
+    for checkpoint in downloader.get_checkpoint_store().pending():
+        succeeded = downloader.resume_downloader(checkpoint, lambda text, value: None, reporter)() and succeeded
+    return 0 if succeeded else 1
+
+
+class Scenario:
+    def __init__(self, args, server, name):
+        self.args = args
+        self.server = server
+        self.name = name
+        self.workdir = tempfile.mkdtemp(prefix=f'horizon-crash-{name}-')
+        self.jobs_dir = os.path.join(self.workdir, 'cache', 'jobs')
+        self.output = os.path.join(self.workdir, 'output')
+        self.video_file = os.path.join(self.output, VIDEO_FILE)
+        self.media_size = int(args.media_size * 1024 * 1024)
+        os.makedirs(self.output)
+
+    def child(self, mode, extract_delay=0.0):
+        return subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--child', mode, '--server', self.server.url,
+             '--workdir', self.workdir, '--media-size', str(self.args.media_size), '--extract-delay', str(extract_delay),
+             '--connections', str(self.args.connections)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+
+    def manifests(self):
+        manifests = []
+        for path in glob.glob(os.path.join(self.jobs_dir, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    manifests.append(json.load(f))
+            except (OSError, ValueError):
+                pass  # Caught between two writes, the next poll sees it
+        return manifests
+
+    def kill_when(self, process, condition, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if any(condition(manifest) for manifest in self.manifests()):
+                process.kill()
+                process.wait()
+                return True
+            if process.poll() is not None:
+                return False
+            time.sleep(0.05)
+        process.kill()
+        return False
+
+    def resume(self):
+        process = self.child('resume')
+        _, stderr = process.communicate(timeout=120)
+        return process.returncode, stderr
+
+    def video_is_complete(self):
+        if not os.path.exists(self.video_file) or os.path.getsize(self.video_file) != self.media_size:
+            return False
+        with open(self.video_file, 'rb') as f:
+            return self.check_filler(f)
+
+    def check_filler(self, f):
+        position = 0
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                return True
+            for start in range(0, len(chunk), 256):
+                piece = chunk[start:start + 256]
+                if piece != filler(position + start, len(piece)):
+                    return False
+            position += len(chunk)
+
+    def cleanup(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def check_extract(args, server, downloader):
+    scenario = Scenario(args, server, 'extract')
+    process = scenario.child('run', extract_delay=5)
+    if not scenario.kill_when(process, lambda manifest: manifest['stage'] == 'extract'):
+        return scenario, ["the job never reached the extract stage"]
+    problems = []
+    if not scenario.manifests():
+        problems.append("no manifest left behind by the killed job")
+    returncode, stderr = scenario.resume()
+    if returncode != 0:
+        problems.append(f"resume failed: {stderr.strip()[-500:]}")
+    return scenario, problems
+
+
+def check_download(args, server, downloader):
+    scenario = Scenario(args, server, 'download')
+    halfway = scenario.media_size // 3
+    process = scenario.child('run')
+    reached = scenario.kill_when(process, lambda manifest: any(
+        transfer['downloaded_bytes'] >= halfway for transfer in manifest['transfers'].values()))
+    if not reached:
+        return scenario, ["the transfer finished before it could be killed, lower --bandwidth"]
+    problems = []
+    part_files = glob.glob(os.path.join(scenario.output, '*.part'))
+    if not part_files:
+        problems.append("no .part file after the kill")
+    served_before = server.bytes_served
+    returncode, stderr = scenario.resume()
+    if returncode != 0:
+        problems.append(f"resume failed: {stderr.strip()[-500:]}")
+    if server.bytes_served - served_before >= scenario.media_size:
+        problems.append("the resumed transfer started again from the first byte")
+    return scenario, problems
+
+
+def fabricate_postprocess_crash(args, server, downloader, name, commit):
+    # ffmpeg runs are too short to kill reliably, so the state a kill leaves behind is written directly:
+    # a finished download, the job manifest at the postprocess stage and the ffmpeg output next to it
+    scenario = Scenario(args, server, name)
+    process = scenario.child('run')
+    process.communicate(timeout=120)
+    store = downloader.CheckpointStore(scenario.jobs_dir)
+    checkpoint = store.create('video', {'url': VIDEO_URL, 'format': 'best', 'save_location': scenario.output,
+                                        'include_subtitles': False})
+    checkpoint.set_stage('postprocess')
+    temporary_file = os.path.splitext(scenario.video_file)[0] + '.postprocess.mp4'
+    with open(scenario.video_file, 'rb') as source, open(temporary_file, 'wb') as target:
+        target.write(source.read())
+    if commit:
+        checkpoint.commit_postprocess(scenario.video_file, temporary_file)
+    else:
+        with open(temporary_file, 'r+b') as f:
+            f.truncate(scenario.media_size // 2)  # Half written by the killed ffmpeg
+        checkpoint.start_postprocess(scenario.video_file, temporary_file)
+    os.utime(temporary_file, (1, 1))
+    return scenario, temporary_file
+
+
+def check_postprocess(args, server, downloader):
+    scenario, temporary_file = fabricate_postprocess_crash(args, server, downloader, 'postprocess', commit=False)
+    problems = []
+    returncode, stderr = scenario.resume()
+    if returncode != 0:
+        problems.append(f"resume failed: {stderr.strip()[-500:]}")
+    if os.path.exists(temporary_file):
+        problems.append("the half written ffmpeg output was not rolled back")
+    return scenario, problems
+
+
+def check_commit(args, server, downloader):
+    scenario, temporary_file = fabricate_postprocess_crash(args, server, downloader, 'commit', commit=True)
+    problems = []
+    returncode, stderr = scenario.resume()
+    if returncode != 0:
+        problems.append(f"resume failed: {stderr.strip()[-500:]}")
+    if os.path.exists(temporary_file):
+        problems.append("the finished ffmpeg output was left next to the video")
+    elif os.stat(scenario.video_file).st_mtime != 1:
+        problems.append("the finished ffmpeg output was not swapped in")
+    return scenario, problems
+
+
+CHECKS = [('extract', check_extract), ('download', check_download),
+          ('postprocess', check_postprocess), ('commit', check_commit)]
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        return run_child(args)
+
+    downloader = load_downloader_module()
+    server = SyntheticMediaServer(bandwidth=args.bandwidth * 1024).start()
+    failures = 0
+    for stage, check in CHECKS:
+        scenario, problems = check(args, server, downloader)
+        if not problems:
+            if scenario.manifests():
+                problems.append("the manifest is still there after the resumed job finished")
+            if not scenario.video_is_complete():
+                problems.append("the video is missing or its bytes are wrong")
+        print(f"{stage:12} {'ok' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"    {problem}")
+        failures += bool(problems)
+        scenario.cleanup()
+    server.stop()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
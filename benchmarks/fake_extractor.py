@@ -0,0 +1,74 @@
+import time
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class SyntheticIE(InfoExtractor):
+    # Answers synthetic://video/<id> and synthetic://playlist/<count> without any network access.
+    # The formats point at the local SyntheticMediaServer, configured through the class attributes.
+    IE_NAME = 'synthetic'
+    _VALID_URL = r'synthetic://(?:video/(?P<id>[^/?#]+)|playlist/(?P<count>\d+))'
+
+    server_url = 'http://127.0.0.1:8000'
+    media_size = 4 * 1024 * 1024
+    split_formats = False
+    extract_delay = 0.0
+    page_size = 100
+    page_delay = 0.0  # Seconds per page of a playlist, like the continuation requests of a real channel
+    metadata_padding = 0  # Extra low quality formats and thumbnails per video, real ones come with dozens
+    subtitle_languages = ()  # Uploaded subtitles, served as WebVTT by the media server
+    caption_languages = ()  # Automatic captions
+    subtitle_cues = 30
+
+    def _real_extract(self, url):
+        if self.extract_delay:
+            time.sleep(self.extract_delay)  # Stands in for the page and API requests of a real extractor
+        video_id, count = self._match_valid_url(url).group('id', 'count')
+        if count is not None:
+            return self.playlist_result(self._entries(int(count)), f'playlist{count}', f'Synthetic playlist of {count}')
+        return {
+            'id': video_id,
+            'title': f'Synthetic {video_id}',
+            'duration': 60,
+            'uploader': 'Benchmark',
+            'webpage_url': url,
+            'formats': self._formats(video_id),
+            'thumbnails': [{'url': f'{self.server_url}/media/{video_id}-poster{index or ""}.jpg?size=20000',
+                            'id': str(index), 'width': 1280 - index, 'height': 720 - index}
+                           for index in range(self.metadata_padding + 1)],
+            'chapters': [{'start_time': start, 'end_time': start + 20, 'title': f'Part {start // 20 + 1}'}
+                         for start in (0, 20, 40)],
+            'subtitles': self._subtitles(video_id, self.subtitle_languages),
+            'automatic_captions': self._subtitles(video_id, self.caption_languages),
+        }
+
+    def _subtitles(self, video_id, languages):
+        return {language: [{'url': f'{self.server_url}/subtitles/{video_id}.{language}.vtt?cues={self.subtitle_cues}',
+                            'ext': 'vtt'}]
+                for language in languages}
+
+    def _entries(self, count):
+        for index in range(count):
+            if self.page_delay and index % self.page_size == 0:
+                time.sleep(self.page_delay)
+            yield self.url_result(f'synthetic://video/item{index}', SyntheticIE, f'item{index}', f'Synthetic item {index}')
+
+    def _formats(self, video_id):
+        size = self.media_size
+        padding = [{
+            'format_id': f'low{index}', 'url': f'{self.server_url}/media/{video_id}-low{index}.mp4?size={size}',
+            'ext': 'mp4', 'vcodec': 'avc1.4d400c', 'acodec': 'mp4a.40.5', 'height': 144, 'tbr': 100 + index,
+            'http_headers': {'User-Agent': 'synthetic', 'Accept-Language': 'en-us,en;q=0.5'},
+        } for index in range(self.metadata_padding)]
+        if not self.split_formats:
+            return padding + [{
+                'format_id': 'progressive', 'url': f'{self.server_url}/media/{video_id}.mp4?size={size}',
+                'ext': 'mp4', 'vcodec': 'avc1.4d401f', 'acodec': 'mp4a.40.2', 'height': 720, 'filesize': size,
+            }]
+        video_size, audio_size = size * 7 // 8, size // 8
+        return padding + [
+            {'format_id': 'video', 'url': f'{self.server_url}/media/{video_id}-video.mp4?size={video_size}',
+             'ext': 'mp4', 'vcodec': 'avc1.4d401f', 'acodec': 'none', 'height': 720, 'filesize': video_size},
+            {'format_id': 'audio', 'url': f'{self.server_url}/media/{video_id}-audio.m4a?size={audio_size}',
+             'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'filesize': audio_size},
+        ]
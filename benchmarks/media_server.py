@@ -0,0 +1,156 @@
+import http.server
+import re
+import threading
+import time
+import urllib.parse
+
+CHUNK_SIZE = 16 * 1024
+
+
+class SyntheticMediaHandler(http.server.BaseHTTPRequestHandler):
+    # Serves /media/<name>.<ext>?size=<bytes> with deterministic filler bytes, or the bytes of a real
+    # sample file registered for that extension, and /subtitles/<name>.vtt?cues=<count> with a WebVTT
+    # file of rolling captions like YouTube's. The server object carries the knobs: bandwidth per
+    # connection, latency before the first byte, range support and failing the first requests per file.
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def respond(self, send_body):
+        parsed = urllib.parse.urlsplit(self.path)
+        if parsed.path.startswith('/subtitles/'):
+            self.respond_subtitles(parsed, send_body)
+            return
+        if not parsed.path.startswith('/media/'):
+            self.send_error(404)
+            return
+        ext = parsed.path.rsplit('.', 1)[-1]
+        data = self.server.files.get(ext)
+        size = len(data) if data is not None else int(urllib.parse.parse_qs(parsed.query).get('size', ['1048576'])[0])
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.should_fail(parsed.path):
+            self.send_response(self.server.fail_status)
+            if self.server.fail_status == 429:
+                self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        start, end = 0, size - 1
+        range_header = self.headers.get('Range')
+        match = re.match(r'bytes=(\d*)-(\d*)', range_header or '')
+        if match and self.server.ranges:
+            self.server.range_requests += 1
+            start = int(match.group(1) or 0)
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'audio/mp4' if ext == 'm4a' else f'video/{ext}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes' if self.server.ranges else 'none')
+        self.end_headers()
+        if send_body:
+            self.send_body(start, end, data)
+
+    def respond_subtitles(self, parsed, send_body):
+        cues = int(urllib.parse.parse_qs(parsed.query).get('cues', ['30'])[0])
+        if self.server.should_fail(parsed.path):
+            self.send_response(self.server.fail_status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = webvtt(parsed.path.rsplit('/', 1)[-1], cues)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/vtt; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(data)
+            self.server.bytes_served += len(data)
+
+    def send_body(self, start, end, data=None):
+        position = start
+        started = time.perf_counter()
+        while position <= end:
+            length = min(CHUNK_SIZE, end - position + 1)
+            try:
+                self.wfile.write(data[position:position + length] if data is not None else filler(position, length))
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            position += length
+            self.server.bytes_served += length
+            if self.server.bandwidth:
+                # Sleep until this connection is back under its byte budget
+                ahead = (position - start) / self.server.bandwidth - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def webvtt(name, cues):
+    lines = ['WEBVTT', 'Kind: captions', '']
+    for index in range(cues):
+        start, end = index * 2, index * 2 + 2
+        lines.append(f'00:{start // 60:02d}:{start % 60:02d}.000 --> 00:{end // 60:02d}:{end % 60:02d}.000 align:start')
+        if index:
+            lines.append(f'line {index - 1} of {name}')  # Rolling captions repeat the previous line
+        lines += [f'line {index} of <c>{name}</c>', '']
+    return '\n'.join(lines).encode('utf-8')
+
+
+_FILLER = bytes(range(256)) * (CHUNK_SIZE // 256 + 1)
+
+
+def filler(position, length):
+    offset = position % 256
+    return _FILLER[offset:offset + length]
+
+
+class SyntheticMediaServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, bandwidth=None, latency=0.0, ranges=True, port=0, files=None, fail_first=0, fail_status=503):
+        super().__init__(('127.0.0.1', port), SyntheticMediaHandler)
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.ranges = ranges
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.failed_requests = {}
+        self.lock = threading.Lock()
+        self.files = {}
+        for ext, path in (files or {}).items():
+            with open(path, 'rb') as f:
+                self.files[ext] = f.read()
+        self.bytes_served = 0
+        self.range_requests = 0
+
+    def should_fail(self, path):
+        with self.lock:
+            count = self.failed_requests.get(path, 0)
+            if count >= self.fail_first:
+                return False
+            self.failed_requests[path] = count + 1
+            return True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,193 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import load_downloader_module
+
+SCENARIOS = ['video', 'audio', 'playlist', 'audio-playlist']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Drive the downloader classes end to end against a local media server and a stub extractor."
+    )
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help="run only these scenarios")
+    parser.add_argument('--jobs', type=int, default=8, help="single video/audio jobs per scenario")
+    parser.add_argument('--concurrency', type=int, default=4, help="jobs the job manager runs at once")
+    parser.add_argument('--playlist-size', type=int, default=20)
+    parser.add_argument('--playlist-workers', type=int, default=3)
+    parser.add_argument('--page-delay', type=int, default=0, help="ms the stub extractor takes per page of 100 playlist entries")
+    parser.add_argument('--connections', type=int, default=1, help="connections per stream for the video jobs")
+    parser.add_argument('--media-size', type=float, default=4, help="MiB per synthetic media file")
+    parser.add_argument('--bandwidth', type=int, default=0, help="KiB/s per connection, 0 for unlimited")
+    parser.add_argument('--latency', type=int, default=0, help="ms before the first byte of every response")
+    parser.add_argument('--limit-rate', help="global bandwidth limit of the downloader, e.g. 2M")
+    parser.add_argument('--no-ranges', action='store_true', help="ignore Range requests")
+    parser.add_argument('--fail-first', type=int, default=0, help="answer the first requests for every file with an error")
+    parser.add_argument('--fail-status', type=int, default=503, help="HTTP status of those errors, e.g. 429 or 503")
+    parser.add_argument('--real-media', action='store_true',
+                        help="serve real media made with ffmpeg, needed for the audio scenarios and merges")
+    parser.add_argument('--output', help="also write the results as JSON to this file")
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3)
+
+
+def peak_rss_mib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def make_sample_media(workdir):
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise SystemExit("--real-media needs ffmpeg on PATH")
+    video = os.path.join(workdir, 'sample.mp4')
+    audio = os.path.join(workdir, 'sample.m4a')
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc=size=1280x720:rate=30',
+                    '-f', 'lavfi', '-i', 'sine=frequency=440', '-t', '10', '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+                    '-c:a', 'aac', video], check=True)
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-i', video, '-vn', '-c:a', 'copy', audio], check=True)
+    poster = os.path.join(workdir, 'sample.jpg')
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-i', video, '-frames:v', '1', poster], check=True)
+    return {'mp4': video, 'm4a': audio, 'jpg': poster}
+
+
+def run_scenario(scenario, args):
+    workdir = tempfile.mkdtemp(prefix='horizon-bench-')
+    # Keep the metadata cache and download index of the benchmark away from the real ones
+    os.environ['HORIZON_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    try:
+        downloader = load_downloader_module()
+        from fake_extractor import SyntheticIE
+        from media_server import SyntheticMediaServer
+
+        server = SyntheticMediaServer(
+            bandwidth=args.bandwidth * 1024 or None,
+            latency=args.latency / 1000,
+            ranges=not args.no_ranges,
+            fail_first=args.fail_first,
+            fail_status=args.fail_status,
+            files=make_sample_media(workdir) if args.real_media else None,
+        ).start()
+        SyntheticIE.server_url = server.url
+        SyntheticIE.media_size = int(args.media_size * 1024 * 1024)
+        SyntheticIE.split_formats = args.real_media
+        SyntheticIE.page_delay = args.page_delay / 1000
+        downloader.EXTRA_INFO_EXTRACTORS.append(SyntheticIE)
+
+        output = os.path.join(workdir, 'output')
+        os.makedirs(output)
+        reporter = downloader.ConsoleReporter(stream=io.StringIO())
+        metrics_path = os.path.join(workdir, 'metrics.jsonl')
+        downloader.get_metrics_recorder(jsonl_path=metrics_path)
+        job_manager = downloader.get_job_manager(max_jobs=args.concurrency)
+        downloader.get_bandwidth_governor(limit=downloader.parse_rate(args.limit_rate or ''))
+        downloader.get_retry_policy(base_delay=0.2)
+
+        started = time.perf_counter()
+        latencies = []
+        if scenario in ('video', 'audio'):
+            jobs = []
+            for index in range(args.jobs):
+                url = f'synthetic://video/{scenario}{index}'
+                if scenario == 'video':
+                    target = downloader.VideoDownloader(url, 'best', output, False, lambda t, v: None,
+                                                        connections=args.connections, reporter=reporter).download_video
+                else:
+                    target = downloader.AudioDownloader(url, 'mp3', output, False, False, lambda t, v: None,
+                                                        reporter=reporter).download_audio
+                jobs.append(job_manager.submit(url, target))
+            for job in jobs:
+                job.wait()
+                latencies.append(time.perf_counter() - started)
+            items, failed = len(jobs), sum(1 for job in jobs if job.status != 'done')
+        else:
+            def progress_callback(text, value):
+                if text.startswith('Finished '):
+                    latencies.append(time.perf_counter() - started)
+
+            url = f'synthetic://playlist/{args.playlist_size}'
+            if scenario == 'playlist':
+                playlist = downloader.PlaylistDownloader(url, 'best', output, False, progress_callback,
+                                                         max_workers=args.playlist_workers, reporter=reporter)
+            else:
+                playlist = downloader.AudioPlaylistDownloader(url, 'mp3', output, False, progress_callback,
+                                                              max_workers=args.playlist_workers, reporter=reporter)
+            job_manager.submit(url, playlist.download_playlist).wait()
+            ids = [f'item{index}' for index in range(args.playlist_size)]
+            items = args.playlist_size
+            failed = items - len(downloader.get_download_index().downloaded_ids(ids, playlist._format_key(), output))
+        wall = time.perf_counter() - started
+        job_manager.shutdown()
+        server.stop()
+        with open(metrics_path, encoding='utf-8') as f:
+            first_downloads = [json.loads(line).get('time_to_first_download') for line in f]
+
+        return {
+            'scenario': scenario,
+            'items': items,
+            'failed': failed,
+            'wall_seconds': round(wall, 3),
+            'bytes': server.bytes_served,
+            'throughput_mib_s': round(server.bytes_served / wall / (1024 * 1024), 2),
+            'items_per_second': round(items / wall, 2),
+            'latency_p50': percentile(latencies, 0.50),
+            'latency_p95': percentile(latencies, 0.95),
+            'latency_p99': percentile(latencies, 0.99),
+            'first_download_seconds': percentile([value for value in first_downloads if value is not None], 0.50),
+            'peak_rss_mib': peak_rss_mib(),
+            'errors': reporter.errors[:5],
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        json.dump(run_scenario(args.child, args), sys.stdout)
+        return
+
+    results = []
+    for scenario in args.scenario or SCENARIOS:
+        if scenario.startswith('audio') and not args.real_media:
+            print(f"{scenario:15} skipped, audio extraction needs --real-media")
+            continue
+        # Every scenario runs in its own process so the peak RSS belongs to that scenario alone
+        command = [sys.executable, os.path.abspath(__file__), '--child', scenario] + sys.argv[1:]
+        completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if completed.returncode != 0:
+            print(f"{scenario:15} failed\n{completed.stderr}")
+            continue
+        result = json.loads(completed.stdout)
+        results.append(result)
+        print(f"{scenario:15} {result['items']:4d} items  {result['failed']:3d} failed  {result['wall_seconds']:8.2f} s  "
+              f"{result['throughput_mib_s']:8.2f} MiB/s  p50 {result['latency_p50']} s  p95 {result['latency_p95']} s  "
+              f"p99 {result['latency_p99']} s  first download {result['first_download_seconds']} s  "
+              f"peak RSS {result['peak_rss_mib']} MiB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()